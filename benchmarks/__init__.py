@@ -0,0 +1,4 @@
+""" OpenCV-Whiteboard benchmarks
+
+Run from the repository root, e.g. python -m benchmarks.bench_export
+"""
@@ -0,0 +1,93 @@
+""" Batch renderer scaling benchmark
+
+Records a number of scripted lessons (drawing, erasing, zooming) and renders them with the batch renderer
+at an increasing number of worker processes. Reports the throughput, the speedup over a single worker and
+the parallel efficiency, which should stay close to 100 % up to the number of cores.
+
+    python -m benchmarks.bench_batch [--sessions 8] [--frames 120] [--workers 1 2 4] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import os                               # CPU count
+import tempfile                         # Sessions and outputs
+import time                             # Timing
+
+from benchmarks.bench_boards import board_script
+from whiteboard import batch as ba
+from whiteboard import recorder as rc
+from whiteboard import synthetic as sy
+
+
+def record_lessons(directory="", sessions=8, frames=120):
+    """ Record scripted lessons and return their paths
+
+    Keyword arguments:
+        directory   - directory of the recordings
+        sessions    - number of recordings
+        frames      - number of frames of each lesson
+    """
+    paths = []
+    for number in range(sessions):
+        path = os.path.join(directory, "lesson{}{}".format(number, rc.FILE_EXTENSION))
+        source = sy.SyntheticSource(board_script(frames, seed=number))
+        recorder = rc.Recorder(path)
+        timestamp = 0.0
+        while True:
+            success, frame = source.read()
+            if not success:
+                break
+            recorder.add(timestamp, frame, rc.hands_from_results(source.process(frame)), source.gesture)
+            timestamp += 1 / 30
+        recorder.close()
+        paths.append(path)
+    return paths
+
+
+def worker_counts():
+    """ Get the default worker counts, powers of two up to the number of cores """
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scaling of the batch renderer")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--workers", type=int, nargs="+", default=worker_counts())
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = record_lessons(directory, args.sessions, args.frames)
+
+        print("  {:>8}{:>10}{:>14}{:>10}{:>12}".format("workers", "seconds", "sessions/min", "speedup",
+                                                        "efficiency"))
+        single = None
+        for workers in args.workers:
+            renderer = ba.BatchRenderer(os.path.join(directory, "out{}".format(workers)), workers)
+            start = time.perf_counter()
+            results = renderer.run(paths)
+            seconds = time.perf_counter() - start
+            failed = [result for result in results if "error" in result]
+            if failed:
+                raise RuntimeError(failed[0]["error"])
+
+            single = single or seconds * workers
+            result = {"workers": workers, "sessions": len(paths), "seconds": seconds,
+                      "sessions_per_min": len(paths) / seconds * 60, "speedup": single / seconds,
+                      "efficiency": single / seconds / workers}
+            report.append(result)
+            print("  {:>8}{:>10.2f}{:>14.1f}{:>10.2f}{:>12.0%}".format(
+                workers, seconds, result["sessions_per_min"], result["speedup"], result["efficiency"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+""" Multi-board throughput benchmark
+
+Drives several whiteboard engines in one process with scripted hand landmarks (no camera, no hand tracker)
+and reports the throughput in frames per second and boards per core at a target frame rate.
+
+    python -m benchmarks.bench_boards [--boards 1 2 4 8] [--size 1920x1080] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import os                               # CPU count
+import time                             # Timing
+
+from whiteboard import engine as en
+from whiteboard import host as hs
+from whiteboard import profiles as pf
+from whiteboard import synthetic as sy
+
+
+def board_script(frames=300, seed=0):
+    """ Get a script of drawing, erasing and zooming like in a typical lesson
+
+    Keyword arguments:
+        frames  - number of frames
+        seed    - random seed
+    """
+    points = sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, frames, seed)
+    script = []
+    for number, point in enumerate(points):
+        phase = number % 100
+        if phase < 70:
+            script += sy.stroke_script([point], "draw")
+        elif phase < 80:
+            script += sy.stroke_script([point], "erase")
+        elif phase < 90:
+            script.append(("unknown", None))
+        else:
+            script.append(("zoom", sy.zoom_landmarks((en.CAM_WIDTH // 2, en.CAM_HEIGHT // 2), 200 + phase * 4)))
+    return script
+
+
+def bench_host(count=1, width=1920, height=1080, frames=300, workers=None):
+    """ Run a number of boards on one host and measure the throughput
+
+    Keyword arguments:
+        count   - number of boards
+        width   - width of every whiteboard screen
+        height  - height of every whiteboard screen
+        frames  - frames per board
+        workers - number of worker threads
+    """
+    host = hs.BoardHost(workers=workers, tracker_factory=None)
+    for number in range(count):
+        source = sy.SyntheticSource(board_script(frames, number))
+        host.add(en.Whiteboard(width, height), source, tracker=source)
+
+    start = time.perf_counter()
+    host.run()
+    seconds = time.perf_counter() - start
+    total = sum(hosted.frames for hosted in host.boards)
+    host.close()
+
+    return {"boards": count, "frames": total, "seconds": seconds, "fps": total / seconds,
+            "fps_per_board": total / seconds / count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark boards per core of the whiteboard engine")
+    parser.add_argument("--boards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--size", type=pf.parse_size, default="1920x1080")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--target-fps", type=float, default=30.0, help="frame rate a board needs to be usable")
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    width, height = args.size
+    cores = args.workers or os.cpu_count() or 1
+
+    report = []
+    print("{}x{} boards on {} cores".format(width, height, cores))
+    print("  {:>6}{:>10}{:>14}{:>16}".format("boards", "fps", "fps/board", "boards/core"))
+    for count in args.boards:
+        result = bench_host(count, width, height, args.frames, args.workers)
+        result["size"] = "{}x{}".format(width, height)
+        result["boards_per_core"] = result["fps"] / args.target_fps / cores
+        report.append(result)
+        print("  {:>6}{:>10.1f}{:>14.1f}{:>16.2f}".format(
+            count, result["fps"], result["fps_per_board"], result["boards_per_core"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
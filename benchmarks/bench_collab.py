@@ -0,0 +1,90 @@
+""" Collaboration benchmark
+
+Draws a scripted session on a whiteboard engine with a collaboration server and a number of local
+reference viewers, and reports the step time of the board, the bandwidth per viewer and whether every
+viewer ends up with an identical board.
+
+    python -m benchmarks.bench_collab [--viewers 1 8 32] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import time                             # Timing
+
+import numpy as np                      # Board comparison
+
+from whiteboard import collab as co
+from whiteboard import engine as en
+from whiteboard import profiles as pf
+from whiteboard import synthetic as sy
+
+
+def bench_viewers(count=1, width=1920, height=1080, frames=300):
+    """ Broadcast a scripted session to a number of viewers
+
+    Keyword arguments:
+        count   - number of viewers
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+        frames  - number of frames
+    """
+    board = en.Whiteboard(width, height)
+    server = co.CollaborationServer(board, "127.0.0.1", 0)
+    viewers = [co.CollaborationClient("127.0.0.1", server.port) for _ in range(count)]
+
+    script = sy.stroke_script(sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, frames))
+    source = sy.SyntheticSource(script)
+
+    start = time.perf_counter()
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        board.step(frame, source.landmarks)
+    seconds = time.perf_counter() - start
+
+    # Wait until all viewers have received the complete stream
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline and any(v.messages < server.messages + 2 for v in viewers):
+        time.sleep(0.01)
+
+    reference = board.board()
+    identical = all(np.array_equal(v.snapshot(), reference) for v in viewers)
+    received = [v.bytes_received for v in viewers]
+
+    server.close()
+    for viewer in viewers:
+        viewer.close()
+    board.close()
+
+    return {"viewers": count, "frames": frames, "step_ms": seconds / frames * 1000,
+            "messages": server.messages, "delta_bytes": server.bytes_broadcast,
+            "bytes_per_viewer": sum(received) / count, "identical": identical}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collaboration server")
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--size", type=pf.parse_size, default="1920x1080")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    width, height = args.size
+    report = []
+    print("  {:>7}{:>10}{:>12}{:>16}{:>11}".format("viewers", "step ms", "delta KiB", "KiB per viewer", "identical"))
+    for count in args.viewers:
+        result = bench_viewers(count, width, height, args.frames)
+        result["size"] = "{}x{}".format(width, height)
+        report.append(result)
+        print("  {:>7}{:>10.2f}{:>12.1f}{:>16.1f}{:>11}".format(
+            count, result["step_ms"], result["delta_bytes"] / 1024, result["bytes_per_viewer"] / 1024,
+            str(result["identical"])))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
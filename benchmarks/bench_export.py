@@ -0,0 +1,132 @@
+""" Export benchmark
+
+Compares encoding time and file size per export format and compression level on synthetic boards,
+and measures the throughput of the process pool against serial encoding.
+
+    python -m benchmarks.bench_export [--sizes 1920x1080 3840x2160] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import os                               # CPU count
+import statistics                       # Medians
+import tempfile                         # Export target
+import time                             # Timing
+
+from benchmarks import boards
+from whiteboard import export as ex
+from whiteboard import journal as jn
+from whiteboard import profiles as pf
+
+LEVELS = {
+    "png": [1, 3, 9],
+    "jpg": [75, 95],
+    "webp": [75, 90, 101],
+    "svg": [None],
+    "pdf": [None]
+}
+
+
+def bench_formats(board=None, strokes=b"", repeat=3):
+    """ Measure encoding time and size of every format and level
+
+    Keyword arguments:
+        board   - mirrored BGR image
+        strokes - packed journal segment records
+        repeat  - number of repetitions, the median is reported
+    """
+    size = (board.shape[1], board.shape[0])
+    results = []
+    for fmt, levels in LEVELS.items():
+        for level in levels:
+            times = []
+            data = b""
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = ex.encode(fmt, board, strokes, level, size)
+                times.append(time.perf_counter() - start)
+            results.append({
+                "format": fmt,
+                "level": level,
+                "ms": statistics.median(times) * 1000,
+                "bytes": len(data)
+            })
+    return results
+
+
+def bench_pool(pages=None, formats=ex.FORMATS, workers=None):
+    """ Compare serial encoding of all pages and formats with the process pool
+
+    Keyword arguments:
+        pages   - list of (board, strokes)
+        formats - formats to export
+        workers - number of worker processes
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        base = os.path.join(directory, "board")
+
+        start = time.perf_counter()
+        for number, (board, strokes) in enumerate(pages):
+            for fmt in formats:
+                if fmt == "pdf":
+                    continue
+                ex.export_job("{}_{}.{}".format(base, number, fmt), fmt, board, strokes, None,
+                              (board.shape[1], board.shape[0]))
+        if "pdf" in formats:
+            ex.export_pdf_job(base + ".pdf", [s for _, s in pages], (pages[0][0].shape[1], pages[0][0].shape[0]))
+        serial = time.perf_counter() - start
+
+        exporter = ex.Exporter(workers=workers)
+
+        # Start the worker processes outside of the measurement
+        for future in exporter.submit_pages(base + "_warmup", pages[:1], ["svg"]):
+            future.result()
+
+        start = time.perf_counter()
+        for future in exporter.submit_pages(base, pages, list(formats)):
+            future.result()
+        parallel = time.perf_counter() - start
+        exporter.shutdown()
+
+    return {"pages": len(pages), "formats": list(formats), "serial_s": serial, "pool_s": parallel,
+            "speedup": serial / parallel if parallel else 0, "workers": workers or os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the export pipeline")
+    parser.add_argument("--sizes", nargs="+", default=["1920x1080", "3840x2160"])
+    parser.add_argument("--preset", default="typical", choices=sorted(boards.PRESETS))
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    report = {"formats": [], "pool": []}
+    for text in args.sizes:
+        width, height = pf.parse_size(text)
+        board, strokes = boards.typical_board(width, height, args.preset)
+
+        print("{}x{} ({} board, {} segments)".format(width, height, args.preset, len(strokes) // jn.SEGMENT.size))
+        print("  {:<6}{:>7}{:>12}{:>12}".format("format", "level", "ms", "KiB"))
+        for result in bench_formats(board, strokes, args.repeat):
+            result["size"] = text
+            report["formats"].append(result)
+            print("  {:<6}{:>7}{:>12.1f}{:>12.1f}".format(
+                result["format"], "-" if result["level"] is None else result["level"], result["ms"],
+                result["bytes"] / 1024))
+
+        pages = [boards.typical_board(width, height, args.preset, seed) for seed in range(args.pages)]
+        pool = bench_pool(pages, workers=args.workers)
+        pool["size"] = text
+        report["pool"].append(pool)
+        print("  {} pages x {} formats: serial {:.2f} s, pool {:.2f} s ({:.1f}x, {} workers)".format(
+            pool["pages"], len(pool["formats"]), pool["serial_s"], pool["pool_s"], pool["speedup"], pool["workers"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
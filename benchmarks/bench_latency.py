@@ -0,0 +1,211 @@
+""" Motion-to-photon latency harness
+
+Moves a synthetic fingertip along scripted strokes at the camera frame rate and records the capture time of
+every fingertip position. Every composed screen is searched for the stroke pixels of the pending positions,
+the latency of a position is the time from its capture until its pixel is part of a composed screen. The
+hand tracker is emulated with a fixed inference time. The latency distribution is reported per pipeline
+configuration:
+
+    serial          - the serial loop of opencv-whiteboard.py
+    serial-gate     - the serial loop with the motion gate
+    asyncio         - the asyncio runtime
+    asyncio-gate    - the asyncio runtime with the motion gate
+
+    python -m benchmarks.bench_latency [--configs serial asyncio] [--inference-ms 20] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import threading                        # Pending positions
+import time                             # Timing
+
+import numpy as np                      # Percentiles
+
+from benchmarks.bench_multicam import StampedSource
+from benchmarks.bench_suite import preview_size
+from whiteboard import engine as en
+from whiteboard import gestures as gs
+from whiteboard import motion as mo
+from whiteboard import profiles as pf
+from whiteboard import runtime as rt
+from whiteboard import synthetic as sy
+
+CONFIGS = ["serial", "serial-gate", "asyncio", "asyncio-gate"]
+
+
+def trajectory_script(rows=4, steps=110):
+    """ Get a script of horizontal strokes below the camera preview, separated by frames without drawing
+
+    Keyword arguments:
+        rows    - number of strokes
+        steps   - number of frames per stroke
+    """
+    script = []
+    for row in range(rows):
+        y = 250 + row * 50
+        script += [("draw", sy.hand_landmarks("draw", (100 + i * 4, y))) for i in range(steps)]
+        script += [("unknown", sy.hand_landmarks("unknown", (540, y)))] * 10
+    return script
+
+
+class LatencyProbe:
+    """ Capture times of the scripted fingertip positions and their first appearance on a composed screen """
+
+    def __init__(self, board=None, script=None):
+        """ Create the probe
+
+        Keyword arguments:
+            board   - whiteboard engine
+            script  - list of (gesture, landmarks) per frame
+        """
+        width = board.whiteboard_width
+
+        # Displayed pixel of every drawn position, the first position of a stroke is not drawn yet
+        self.pixels = {}
+        for position, (gesture, landmarks) in enumerate(script):
+            if gesture == "draw" and position and script[position - 1][0] == "draw":
+                x, y = board.scale_to_screen(landmarks[sy.INDEX_TIP])
+                self.pixels[position] = (y, width - 1 - x)
+
+        self.captured = {}
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def capture(self, position=0):
+        """ Record the capture time of a script position
+
+        Keyword arguments:
+            position    - script position
+        """
+        if position in self.pixels:
+            with self._lock:
+                self.captured[position] = time.perf_counter()
+
+    def check(self, screen=None):
+        """ Search a composed screen for the pixels of the captured positions
+
+        Keyword arguments:
+            screen  - composed whiteboard screen
+        """
+        now = time.perf_counter()
+        with self._lock:
+            pending = list(self.captured.items())
+        for position, captured in pending:
+            y, x = self.pixels[position]
+            if (screen[y, x] != 255).any():
+                self.latencies.append(now - captured)
+                with self._lock:
+                    del self.captured[position]
+
+    def summary(self):
+        """ Get the latency distribution in milliseconds """
+        ms = np.array(self.latencies or [0.0]) * 1000
+        return {"positions": len(self.pixels), "measured": len(self.latencies),
+                "missed": len(self.pixels) - len(self.latencies), "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)), "p90_ms": float(np.percentile(ms, 90)),
+                "p99_ms": float(np.percentile(ms, 99)), "max_ms": float(ms.max())}
+
+
+class ProbedSource(StampedSource):
+    """ Stamped synthetic camera recording the capture time of every position """
+
+    def __init__(self, script=None, probe=None, fps=30):
+        super().__init__(script, fps=fps, draw_hands=True)
+        self.probe = probe
+
+    def read(self, image=None):
+        success, frame = super().read(image)
+        if success:
+            self.probe.capture(self.position - 1)
+        return success, frame
+
+
+class EmulatedTracker:
+    """ Hand tracker returning the scripted results of a stamped frame after a fixed inference time """
+
+    def __init__(self, script=None, inference=0.02):
+        self.script = script
+        self.inference = inference
+
+    def process(self, image=None):
+        time.sleep(self.inference)
+
+        # The stamp is written into the blue and green channel of the BGR frame
+        position = int(image[0, 0, 2]) * 256 + int(image[0, 0, 1])
+        return sy.to_results(self.script[position][1], en.CAM_WIDTH, en.CAM_HEIGHT)
+
+    def close(self):
+        pass
+
+
+def bench_config(config="serial", width=1920, height=1080, inference=0.02, fps=30):
+    """ Run the trajectory through a pipeline configuration
+
+    Keyword arguments:
+        config      - one of CONFIGS
+        width       - width of the whiteboard screen
+        height      - height of the whiteboard screen
+        inference   - emulated inference time in seconds
+        fps         - frame rate of the camera
+    """
+    script = trajectory_script()
+    board = en.Whiteboard(width, height, preview_size=preview_size(height))
+    probe = LatencyProbe(board, script)
+    source = ProbedSource(script, probe, fps)
+    tracker = EmulatedTracker(script, inference)
+    if config.endswith("-gate"):
+        tracker = mo.MotionGate(tracker)
+
+    def track(frame=None):
+        rgb = frame[:, :, ::-1]
+        results = tracker.process(rgb)
+        return frame, gs.landmarks_from_results(results, en.CAM_WIDTH, en.CAM_HEIGHT), results
+
+    if config.startswith("serial"):
+        while True:
+            success, frame = source.read()
+            if not success:
+                break
+            frame, landmarks, _ = track(frame)
+            probe.check(board.step(frame, landmarks))
+    else:
+        runtime = rt.Runtime(board, source, track, None)
+        runtime.add_output("probe", lambda timestamp, screen: probe.check(screen))
+        runtime.run()
+
+    board.close()
+    result = probe.summary()
+    result["config"] = config
+    if isinstance(tracker, mo.MotionGate):
+        result["skip_ratio"] = tracker.skip_ratio
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the motion-to-photon latency of the pipelines")
+    parser.add_argument("--configs", nargs="+", choices=CONFIGS, default=CONFIGS)
+    parser.add_argument("--size", type=pf.parse_size, default="1920x1080")
+    parser.add_argument("--inference-ms", type=float, default=20.0, help="emulated inference time")
+    parser.add_argument("--fps", type=int, default=30, help="frame rate of the camera")
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    width, height = args.size
+    report = []
+    print("  {:<14}{:>10}{:>8}{:>9}{:>9}{:>9}{:>9}".format("config", "measured", "missed", "mean ms", "p50 ms",
+                                                          "p90 ms", "p99 ms"))
+    for config in args.configs:
+        result = bench_config(config, width, height, args.inference_ms / 1000, args.fps)
+        result["size"] = "{}x{}".format(width, height)
+        report.append(result)
+        print("  {:<14}{:>10}{:>8}{:>9.1f}{:>9.1f}{:>9.1f}{:>9.1f}".format(
+            config, result["measured"], result["missed"], result["mean_ms"], result["p50_ms"], result["p90_ms"],
+            result["p99_ms"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+""" Memory sizing benchmark
+
+Plays a scripted lesson (drawing, erasing, zooming) through a whiteboard and the viewer stream at a
+resolution matrix with the memory accounting enabled. Reports the live bytes of the canvas and frame buffers,
+their peak, the bytes allocated and the growth of the live blocks per frame and the peak resident memory of
+every resolution, so a deployment on a device with 2-4 GB can be sized. Every resolution runs in its own
+process to get its own resident peak.
+
+    python -m benchmarks.bench_memory [--sizes 1280x720 1920x1080] [--frames 300] [--json results.json]
+"""
+
+import argparse                         # Command line
+import concurrent.futures               # One process per resolution
+import json                             # Machine-readable output
+import multiprocessing                  # Fresh processes
+
+from benchmarks.bench_boards import board_script
+from benchmarks.bench_suite import preview_size
+from whiteboard import engine as en
+from whiteboard import memory as me
+from whiteboard import profiles as pf
+from whiteboard import stream as st
+from whiteboard import synthetic as sy
+
+SIZES = ["1280x720", "1920x1080", "3840x2160"]
+
+
+def bench_size(text="1920x1080", frames=300, stream=True):
+    """ Play the lesson at a resolution and return the summary of the accounting
+
+    Keyword arguments:
+        text    - resolution like 1920x1080
+        frames  - number of frames of the lesson
+        stream  - write every screen to a viewer stream without clients
+    """
+    width, height = pf.parse_size(text)
+    source = sy.SyntheticSource(board_script(frames))
+    accounting = me.MemoryAccounting(interval=0)
+    board = en.Whiteboard(width, height, preview_size=preview_size(height))
+    accounting.register("board", board)
+    viewer = None
+    if stream:
+        viewer = st.ViewerStream("127.0.0.1", 0, fps=0)
+        accounting.register("stream", viewer)
+
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        screen = board.step(frame, source.landmarks)
+        if viewer is not None:
+            viewer.write(0, screen)
+        accounting.frame()
+
+    snapshot = accounting.snapshot()
+    summary = accounting.summary(snapshot)
+    summary["size"] = text
+    summary["sites"] = accounting.sites(snapshot=snapshot)
+    if viewer is not None:
+        viewer.close()
+    board.close()
+    accounting.close()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory of the whiteboard per resolution")
+    parser.add_argument("--sizes", nargs="+", default=SIZES)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--no-stream", action="store_true", help="do not write the screens to a viewer stream")
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    report = []
+    mib = me.MIB
+    print("  {:>10}{:>12}{:>12}{:>14}{:>14}{:>14}{:>13}".format("size", "live MiB", "peak MiB", "frame avg MiB",
+                                                                "frame max MiB", "frame blocks", "peak RSS MiB"))
+    context = multiprocessing.get_context("spawn")
+    for text in args.sizes:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+            result = pool.submit(bench_size, text, args.frames, not args.no_stream).result()
+        report.append(result)
+        print("  {:>10}{:>12.1f}{:>12.1f}{:>14.1f}{:>14.1f}{:>+14.1f}{:>13.1f}".format(
+            text, result["live_bytes"] / mib, result["peak_live_bytes"] / mib, result["transient_mean_bytes"] / mib,
+            result["transient_peak_bytes"] / mib, result["blocks_per_frame"], result["peak_resident_bytes"] / mib))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
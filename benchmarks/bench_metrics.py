@@ -0,0 +1,184 @@
+""" Metrics endpoint benchmark
+
+Plays a scripted lesson through a whiteboard with the metrics enabled while a local scraper polls the
+endpoint like Prometheus. Every scrape is parsed and checked (sample syntax, cumulative histogram buckets,
+counts matching the +Inf bucket, counters never decreasing). Reports the time the metrics add to a frame,
+the time of a scrape and the final values of the main metrics.
+
+    python -m benchmarks.bench_metrics [--size 1920x1080] [--frames 300] [--interval 0.2] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import re                               # Sample syntax
+import threading                        # Scraper thread
+import time                             # Timing
+import urllib.request                   # Scraper
+
+from benchmarks.bench_boards import board_script
+from benchmarks.bench_suite import preview_size
+from whiteboard import engine as en
+from whiteboard import metrics as mt
+from whiteboard import profiles as pf
+from whiteboard import synthetic as sy
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? '
+                    r'(-?[0-9.e+-]+|\+Inf|NaN)$')
+
+
+def parse(text=""):
+    """ Parse and check a scrape, returns a dictionary sample name with labels -> value
+
+    Keyword arguments:
+        text    - response of the endpoint
+    """
+    samples = {}
+    types = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+            continue
+        if line.startswith("#"):
+            continue
+        match = SAMPLE.match(line)
+        if match is None:
+            raise ValueError("Invalid sample: " + line)
+        samples[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+
+    # Buckets are cumulative and end with the count
+    for name, kind in types.items():
+        if kind != "histogram":
+            continue
+        for key, count in samples.items():
+            if not key.startswith(name + "_count"):
+                continue
+            labels = key[len(name + "_count"):].strip("{}")
+            prefix = name + "_bucket{" + (labels + "," if labels else "")
+            buckets = [value for sample, value in samples.items() if sample.startswith(prefix)]
+            if buckets != sorted(buckets) or buckets[-1] != count:
+                raise ValueError("Invalid histogram: " + key)
+    return samples
+
+
+class Scraper:
+    """ Poll the metrics endpoint in a thread and check every scrape """
+
+    def __init__(self, port=0, interval=0.2):
+        self.url = "http://127.0.0.1:{}/metrics".format(port)
+        self.interval = interval
+        self.scrapes = 0
+        self.seconds = []
+        self.samples = {}
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def scrape(self):
+        start = time.perf_counter()
+        with urllib.request.urlopen(self.url, timeout=5) as response:
+            text = response.read().decode("utf-8")
+        self.seconds.append(time.perf_counter() - start)
+
+        samples = parse(text)
+        for key, value in self.samples.items():
+            if "_total" in key and samples.get(key, 0) < value:
+                raise ValueError("Counter decreased: " + key)
+        self.samples = samples
+        self.scrapes += 1
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.scrape()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.scrape()
+            except (OSError, ValueError) as e:
+                self.error = e
+                return
+
+
+def bench_metrics(width=1920, height=1080, frames=300, interval=0.2):
+    """ Play the lesson with and without metrics and scrape the endpoint meanwhile
+
+    Keyword arguments:
+        width       - width of the whiteboard screen
+        height      - height of the whiteboard screen
+        frames      - number of frames of the lesson
+        interval    - seconds between two scrapes
+    """
+    board = en.Whiteboard(width, height, preview_size=preview_size(height))
+    metrics = mt.Metrics()
+    mt.CanvasMetrics(metrics, board)
+    endpoint = mt.MetricsServer(metrics, port=0)
+    scraper = Scraper(endpoint.port, interval)
+
+    # Time the updates of the metrics apart from the frame, as the loop does them
+    overhead = 0.0
+    source = sy.SyntheticSource(board_script(frames))
+    while True:
+        start = time.perf_counter()
+        success, frame = source.read()
+        captured = time.perf_counter()
+        if not success:
+            break
+        board.step(frame, source.landmarks)
+        composed = time.perf_counter()
+
+        update = time.perf_counter()
+        metrics.observe("whiteboard_stage_seconds", captured - start, stage="capture")
+        metrics.observe("whiteboard_stage_seconds", 0.0, stage="inference")
+        metrics.observe("whiteboard_stage_seconds", composed - captured, stage="compose")
+        metrics.observe("whiteboard_stage_seconds", 0.0, stage="display")
+        metrics.frame(board.gesture)
+        overhead += time.perf_counter() - update
+
+    scraper.close()
+    endpoint.close()
+    board.close()
+    if scraper.error is not None:
+        raise scraper.error
+
+    samples = scraper.samples
+    count = samples['whiteboard_frames_total']
+    return {
+        "size": "{}x{}".format(width, height),
+        "frames": int(count),
+        "overhead_us": overhead / count * 1e6,
+        "scrapes": scraper.scrapes,
+        "scrape_ms": sum(scraper.seconds) / len(scraper.seconds) * 1000,
+        "dirty_pixels": int(samples.get("whiteboard_canvas_dirty_pixels_total", 0)),
+        "gestures": {key.split('"')[1]: int(value) for key, value in samples.items()
+                     if key.startswith("whiteboard_gesture_frames_total")},
+        "resident_bytes": int(samples["whiteboard_resident_bytes"])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check the metrics endpoint")
+    parser.add_argument("--size", type=pf.parse_size, default="1920x1080")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between two scrapes")
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    width, height = args.size
+    result = bench_metrics(width, height, args.frames, args.interval)
+    print("  {} frames at {}, {:.1f} us metrics per frame".format(result["frames"], result["size"],
+                                                                  result["overhead_us"]))
+    print("  {} scrapes checked, {:.2f} ms per scrape".format(result["scrapes"], result["scrape_ms"]))
+    print("  {} dirty canvas pixels, {:.1f} MiB resident".format(result["dirty_pixels"],
+                                                                result["resident_bytes"] / 2 ** 20))
+    print("  gestures: " + ", ".join("{} {}".format(*item) for item in sorted(result["gestures"].items())))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+""" Motion gate benchmark
+
+Plays a scripted session with drawn hands and camera noise: strokes, a hand holding still and an empty
+room. Reports the share of frames whose hand tracking the motion gate skipped for different thresholds, and
+how many pixels of the resulting board differ from a run that tracks every frame.
+
+    python -m benchmarks.bench_motion [--thresholds 0 4 6 10] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import time                             # Timing
+
+import cv2 as cv                        # Color conversion
+import numpy as np                      # Camera noise, board comparison
+
+from whiteboard import engine as en
+from whiteboard import gestures as gs
+from whiteboard import motion as mo
+from whiteboard import profiles as pf
+from whiteboard import synthetic as sy
+
+
+class ScriptedTracker:
+    """ Hand tracker returning the scripted results of a synthetic source, counting the tracked frames """
+
+    def __init__(self, source=None):
+        self.source = source
+        self.calls = 0
+
+    def process(self, image=None):
+        self.calls += 1
+        return self.source.process(image)
+
+    def close(self):
+        pass
+
+
+def session_script(frames=300, seed=0):
+    """ Get a script of strokes, pauses holding the hand still and frames without hands
+
+    Keyword arguments:
+        frames  - number of frames of each part
+        seed    - random seed of the strokes
+    """
+    script = sy.stroke_script(sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, frames, seed))
+    script += [script[-1]] * frames
+    script += [("unknown", None)] * frames
+    return script
+
+
+def bench_threshold(threshold=0, width=1920, height=1080, frames=300, max_skip=mo.MAX_SKIP, noise=2.0):
+    """ Play the session with a motion gate
+
+    Keyword arguments:
+        threshold   - threshold of the motion gate, 0 to track every frame
+        width       - width of the whiteboard screen
+        height      - height of the whiteboard screen
+        frames      - number of frames of each part of the session
+        max_skip    - maximum number of frames skipped in a row
+        noise       - standard deviation of the camera noise
+    """
+    rnd = np.random.default_rng(0)
+    board = en.Whiteboard(width, height)
+    source = sy.SyntheticSource(session_script(frames), draw_hands=True)
+    tracker = ScriptedTracker(source)
+    gate = mo.MotionGate(tracker, threshold, max_skip)
+
+    gating = 0.0
+    start = time.perf_counter()
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        frame = cv.add(frame, rnd.normal(0, noise, frame.shape).astype(np.int8), dtype=cv.CV_8U)
+        rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+
+        gate_start = time.perf_counter()
+        results = gate.process(rgb)
+        gating += time.perf_counter() - gate_start
+        board.step(frame, gs.landmarks_from_results(results, en.CAM_WIDTH, en.CAM_HEIGHT))
+    seconds = time.perf_counter() - start
+
+    result = board.board()
+    board.close()
+    return {"threshold": threshold, "frames": gate.frames, "tracked": tracker.calls, "skip_ratio": gate.skip_ratio,
+            "gate_ms": gating / gate.frames * 1000, "step_ms": seconds / gate.frames * 1000}, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the motion gate")
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[0, 4, 6, 10])
+    parser.add_argument("--size", type=pf.parse_size, default="1920x1080")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--max-skip", type=int, default=mo.MAX_SKIP)
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    width, height = args.size
+    reference = bench_threshold(0, width, height, args.frames, args.max_skip)[1]
+
+    report = []
+    print("  {:>9}{:>9}{:>9}{:>7}{:>10}{:>14}".format("threshold", "frames", "tracked", "skip", "gate ms",
+                                                     "diff pixels"))
+    for threshold in args.thresholds:
+        result, board = bench_threshold(threshold, width, height, args.frames, args.max_skip)
+        result["size"] = "{}x{}".format(width, height)
+        result["diff_pixels"] = int(np.count_nonzero((board != reference).any(axis=2)))
+        report.append(result)
+        print("  {:>9}{:>9}{:>9}{:>7.0%}{:>10.3f}{:>14}".format(
+            threshold, result["frames"], result["tracked"], result["skip_ratio"], result["gate_ms"],
+            result["diff_pixels"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
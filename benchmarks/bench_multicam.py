@@ -0,0 +1,116 @@
+""" Multi-camera benchmark
+
+Draws scripted sessions from a number of synthetic cameras on one shared whiteboard and reports the total
+number of tracked frames per second. Every camera has its own capture and inference thread, the hand
+tracker is emulated by an image processing workload that releases the GIL like MediaPipe does, so the
+throughput grows with the number of cameras as long as there are free cores.
+
+    python -m benchmarks.bench_multicam [--cameras 1 2 3] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import os                               # CPU count
+import time                             # Timing
+
+import cv2 as cv                        # Emulated inference
+
+from whiteboard import engine as en
+from whiteboard import multicam as mc
+from whiteboard import profiles as pf
+from whiteboard import synthetic as sy
+
+
+class StampedSource(sy.SyntheticSource):
+    """ Synthetic camera stamping the script position into every frame, so the tracker runs on its own thread """
+
+    def read(self, image=None):
+        success, frame = super().read(image)
+        if success:
+            frame[0, 0, :2] = divmod(self.position - 1, 256)
+        return success, frame
+
+
+def emulated_tracker(source=None, work=4):
+    """ Create a tracker function returning the scripted landmarks of a stamped frame
+
+    Keyword arguments:
+        source  - StampedSource the frames come from
+        work    - number of blur passes emulating the inference time
+    """
+    def track(frame=None):
+        rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+        for _ in range(work):
+            cv.GaussianBlur(rgb, (15, 15), 0)
+        position = int(frame[0, 0, 0]) * 256 + int(frame[0, 0, 1])
+        return frame, source.script[position][1], None
+
+    return track
+
+
+def bench_cameras(count=1, width=1920, height=1080, frames=300, layout=mc.LAYOUT_SHARED, fps=30):
+    """ Run a number of synthetic cameras on one whiteboard
+
+    Keyword arguments:
+        count   - number of cameras
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+        frames  - number of frames per camera
+        layout  - camera layout
+        fps     - frame rate of the cameras
+    """
+    board = en.Whiteboard(width, height)
+    sources = [StampedSource(sy.stroke_script(sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, frames, seed=i)),
+                             fps=fps) for i in range(count)]
+    cameras = mc.MultiCamera(board, sources, [emulated_tracker(s) for s in sources], layout)
+
+    steps = 0
+    start = time.perf_counter()
+    cameras.start()
+    while not cameras.finished:
+        items = cameras.poll()
+        if items:
+            cameras.step(items)
+            steps += 1
+    seconds = time.perf_counter() - start
+
+    tracked = sum(worker.tracked for worker in cameras.workers)
+    dropped = sum(worker.dropped for worker in cameras.workers)
+    cameras.close()
+    board.close()
+
+    return {"cameras": count, "frames": frames, "tracked": tracked, "dropped": dropped, "steps": steps,
+            "tracked_fps": tracked / seconds, "step_fps": steps / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multiple cameras on one whiteboard")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--size", type=pf.parse_size, default="1920x1080")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--layout", choices=[mc.LAYOUT_SHARED, mc.LAYOUT_SPLIT], default=mc.LAYOUT_SHARED)
+    parser.add_argument("--fps", type=int, default=30, help="frame rate of every camera")
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    # One thread per OpenCV call, the parallelism comes from the cameras
+    cv.setNumThreads(1)
+
+    width, height = args.size
+    report = []
+    print("  {} cores".format(os.cpu_count()))
+    print("  {:>7}{:>10}{:>10}{:>14}{:>11}".format("cameras", "tracked", "dropped", "tracked fps", "step fps"))
+    for count in args.cameras:
+        result = bench_cameras(count, width, height, args.frames, args.layout, args.fps)
+        result["size"] = "{}x{}".format(width, height)
+        report.append(result)
+        print("  {:>7}{:>10}{:>10}{:>14.1f}{:>11.1f}".format(
+            count, result["tracked"], result["dropped"], result["tracked_fps"], result["step_fps"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
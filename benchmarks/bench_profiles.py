@@ -0,0 +1,138 @@
+""" Performance profile benchmark
+
+Plays the motion gate session (strokes, a hand holding still, an empty room) with the settings of every
+performance profile: canvas size, preview and button size, start level and target frame rate of the adaptive
+quality and the motion gate. Every profile runs in its own process restricted to the cores of its hardware.
+The hand tracker is emulated by blur passes over the scaled frame (more for the full model), so the frame
+time follows the inference settings without mediapipe. Reports frames per second, frame time percentiles, the
+share of skipped tracking, the final quality level and the peak resident memory of every profile.
+
+    python -m benchmarks.bench_profiles [--profiles desktop jetson] [--frames 300] [--json results.json]
+"""
+
+import argparse                         # Command line
+import concurrent.futures               # One process per profile
+import json                             # Machine-readable output
+import multiprocessing                  # Fresh processes
+import time                             # Timing
+
+import cv2 as cv                        # Color conversion, emulated inference
+import numpy as np                      # Camera noise, percentiles
+
+from benchmarks.bench_motion import session_script
+from whiteboard import engine as en
+from whiteboard import gestures as gs
+from whiteboard import memory as me
+from whiteboard import motion as mo
+from whiteboard import profiles as pf
+from whiteboard import quality as qa
+from whiteboard import synthetic as sy
+
+# Blur passes emulating the inference of the lite (0) and the full (1) hand landmark model
+INFERENCE_PASSES = {0: 2, 1: 5}
+
+
+class EmulatedTracker:
+    """ Hand tracker returning the scripted results of a synthetic source after blur passes over the frame """
+
+    def __init__(self, source=None, model_complexity=0, max_num_hands=2):
+        self.source = source
+        self.passes = INFERENCE_PASSES[model_complexity] * max_num_hands
+        self.calls = 0
+
+    def process(self, image=None):
+        self.calls += 1
+        for _ in range(self.passes):
+            cv.GaussianBlur(image, (9, 9), 0)
+        return self.source.process(image)
+
+    def close(self):
+        pass
+
+
+def bench_profile(name="desktop", frames=300, noise=2.0):
+    """ Play the session with the settings of a profile and return the results
+
+    Keyword arguments:
+        name    - name of the profile
+        frames  - number of frames of each part of the session
+        noise   - standard deviation of the camera noise
+    """
+    profile = pf.load_profile(name)
+    pf.restrict_cpus(profile.cpus)
+
+    width, height = pf.parse_size(profile.size)
+    level = qa.LEVELS[profile.level]
+    board = en.Whiteboard(width, height, preview_size=level.preview_size, button_size=profile.button_size)
+    source = sy.SyntheticSource(session_script(frames), draw_hands=True)
+    tracker = qa.AdaptiveTracker(lambda *model: EmulatedTracker(source, *model), level)
+    gate = mo.MotionGate(tracker, profile.motion_threshold, profile.max_skip)
+
+    def apply_quality(current=None):
+        board.set_preview(current.preview_size, current.preview_interpolation)
+        tracker.configure(current)
+
+    quality = None
+    if profile.target_fps:
+        quality = qa.QualityController(profile.target_fps, level=profile.level, on_change=apply_quality)
+
+    rnd = np.random.default_rng(0)
+    times = []
+    start = time.perf_counter()
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        frame = cv.add(frame, rnd.normal(0, noise, frame.shape).astype(np.int8), dtype=cv.CV_8U)
+
+        frame_start = time.perf_counter()
+        results = gate.process(cv.cvtColor(frame, cv.COLOR_BGR2RGB))
+        board.step(frame, gs.landmarks_from_results(results, en.CAM_WIDTH, en.CAM_HEIGHT))
+        times.append(time.perf_counter() - frame_start)
+        if quality is not None:
+            quality.update(times[-1])
+    seconds = time.perf_counter() - start
+
+    board.close()
+    return {
+        "profile": name,
+        "size": profile.size,
+        "cpus": profile.cpus,
+        "frames": gate.frames,
+        "fps": gate.frames / seconds,
+        "p50_ms": float(np.percentile(times, 50) * 1000),
+        "p90_ms": float(np.percentile(times, 90) * 1000),
+        "skip_ratio": gate.skip_ratio,
+        "start_level": level.name,
+        "final_level": quality.current.name if quality is not None else level.name,
+        "peak_resident_bytes": me.peak_resident_bytes()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the performance profiles")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(pf.PROFILES), default=list(pf.PROFILES))
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    report = []
+    print("  {:<10}{:>10}{:>5}{:>8}{:>8}{:>8}{:>7}{:>10}{:>10}{:>13}".format(
+        "profile", "size", "cpus", "fps", "p50 ms", "p90 ms", "skip", "start", "final", "peak RSS MiB"))
+    context = multiprocessing.get_context("spawn")
+    for name in args.profiles:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+            result = pool.submit(bench_profile, name, args.frames).result()
+        report.append(result)
+        print("  {:<10}{:>10}{:>5}{:>8.1f}{:>8.2f}{:>8.2f}{:>7.0%}{:>10}{:>10}{:>13.1f}".format(
+            name, result["size"], result["cpus"] or "all", result["fps"], result["p50_ms"], result["p90_ms"],
+            result["skip_ratio"], result["start_level"], result["final_level"],
+            result["peak_resident_bytes"] / me.MIB))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
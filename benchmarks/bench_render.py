@@ -0,0 +1,80 @@
+""" Headless rendering benchmark
+
+Renders scripted strokes with the whiteboard engine offscreen (no window, no X11) and measures the frame
+rate of compositing alone and together with every offscreen output.
+
+    python -m benchmarks.bench_render [--sizes 1920x1080 3840x2160] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import os                               # Process id
+import tempfile                         # Output targets
+import time                             # Timing
+
+from whiteboard import engine as en
+from whiteboard import output as op
+from whiteboard import profiles as pf
+from whiteboard import synthetic as sy
+
+
+def bench_output(width=1920, height=1080, frames=200, target=None):
+    """ Render a scripted session and write every frame to an output
+
+    Keyword arguments:
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+        frames  - number of frames
+        target  - output description (see output.open_output), None for compositing only
+    """
+    board = en.Whiteboard(width, height)
+    source = sy.SyntheticSource(sy.stroke_script(sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, frames)))
+    output = op.open_output(target, width, height) if target else None
+
+    start = time.perf_counter()
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        screen = board.step(frame, source.landmarks)
+        if output is not None:
+            output.write(time.time(), screen)
+    seconds = time.perf_counter() - start
+
+    if output is not None:
+        output.close()
+    board.close()
+    return {"frames": frames, "seconds": seconds, "fps": frames / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless rendering and offscreen outputs")
+    parser.add_argument("--sizes", nargs="+", default=["1920x1080", "3840x2160"])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as directory:
+        targets = {
+            "none": None,
+            "shm": op.SHM_PREFIX + "wb_bench_{}".format(os.getpid()),
+            "video": os.path.join(directory, "board.avi"),
+            "sequence": os.path.join(directory, "frames")
+        }
+        for text in args.sizes:
+            width, height = pf.parse_size(text)
+            print(text)
+            for name, target in targets.items():
+                result = bench_output(width, height, args.frames, target)
+                result.update({"size": text, "output": name})
+                report.append(result)
+                print("  {:<10}{:>8.1f} fps".format(name, result["fps"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+""" Viewer stream benchmark
+
+Writes a scripted session into the HTTP viewer stream while a number of MJPEG viewers are connected, and
+reports the number of JPEG encodings and the encoding time. Both stay flat as the number of viewers grows,
+since every version is encoded only once.
+
+    python -m benchmarks.bench_stream [--viewers 1 10 50] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import threading                        # Viewers
+import time                             # Timing
+import urllib.request                   # MJPEG viewers
+
+from whiteboard import engine as en
+from whiteboard import profiles as pf
+from whiteboard import stream as st
+from whiteboard import synthetic as sy
+
+
+def viewer(url="", stop=None, counter=None):
+    """ Read an MJPEG stream until stopped
+
+    Keyword arguments:
+        url     - stream URL
+        stop    - threading.Event ending the viewer
+        counter - list collecting the number of received bytes
+    """
+    with urllib.request.urlopen(url) as response:
+        received = 0
+        while not stop.is_set():
+            data = response.read1(65536)
+            if not data:
+                break
+            received += len(data)
+    counter.append(received)
+
+
+def bench_viewers(count=1, width=1920, height=1080, frames=150):
+    """ Stream a scripted session to a number of MJPEG viewers
+
+    Keyword arguments:
+        count   - number of viewers
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+        frames  - number of frames
+    """
+    stream = st.ViewerStream("127.0.0.1", 0, fps=0)
+    stop = threading.Event()
+    counter = []
+    threads = [threading.Thread(target=viewer, args=("http://127.0.0.1:{}/stream.mjpg".format(stream.port), stop,
+                                                     counter), daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+
+    board = en.Whiteboard(width, height, preview_size=None)
+    source = sy.SyntheticSource(sy.stroke_script(sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, frames)))
+
+    write = 0.0
+    start = time.perf_counter()
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        screen = board.step(frame, source.landmarks)
+        write_start = time.perf_counter()
+        stream.write(time.time(), screen)
+        write += time.perf_counter() - write_start
+
+        # Pace the session like a camera, so the viewers can follow
+        time.sleep(max(0.0, 1 / 30 - (time.perf_counter() - start) % (1 / 30)))
+    time.sleep(0.5)
+
+    stop.set()
+    stream.close()
+    for thread in threads:
+        thread.join(5)
+    board.close()
+
+    return {"viewers": count, "frames": frames, "versions": stream.version, "encoded": stream.encoded_frames,
+            "write_ms": write / frames * 1000, "kib_per_viewer": sum(counter) / max(1, len(counter)) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTTP viewer stream")
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--size", type=pf.parse_size, default="1920x1080")
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    width, height = args.size
+    report = []
+    print("  {:>7}{:>10}{:>10}{:>11}{:>16}".format("viewers", "versions", "encoded", "write ms", "KiB per viewer"))
+    for count in args.viewers:
+        result = bench_viewers(count, width, height, args.frames)
+        result["size"] = "{}x{}".format(width, height)
+        report.append(result)
+        print("  {:>7}{:>10}{:>10}{:>11.2f}{:>16.1f}".format(
+            count, result["versions"], result["encoded"], result["write_ms"], result["kib_per_viewer"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+""" Hot path benchmark suite
+
+Times the hot paths of the whiteboard without camera, hand tracker or display:
+
+    gesture.check_user_gesture          - gesture classification over a landmark corpus
+    gesture.calc_hand_rotation_angle    - hand rotation over the landmark corpus
+    gesture.determine_right_left        - hand order over the landmark corpus
+    draw.draw / draw.erase              - Whiteboard.draw along scripted strokes
+    zoom.zoom                           - Whiteboard.zoom over pinch sequences
+    composite.render                    - composing the displayed screen like show_window
+
+The board paths run at a resolution matrix (720p, 1080p, 4K and 8K by default). Every case reports ops/sec,
+per-op latency percentiles of the fastest of several rounds and the peak of traced memory, which is measured
+in a separate pass, since tracing slows down the timed pass. The landmark corpus is synthetic unless a
+recording is given.
+
+    python -m benchmarks.bench_suite [--sizes 1280x720 1920x1080] [--corpus session.wbrec] [--json results.json]
+"""
+
+import argparse                         # Command line
+import functools                        # Operations
+import json                             # Machine-readable output
+import os                               # CPU count
+import platform                         # Machine description
+import random                           # Landmark corpus
+import resource                         # Process peak memory
+import time                             # Timing
+import tracemalloc                      # Traced peak memory
+
+import cv2 as cv                        # Frames
+import numpy as np                      # Percentiles
+
+from whiteboard import engine as en
+from whiteboard import gestures as gs
+from whiteboard import profiles as pf
+from whiteboard import recorder as rc
+from whiteboard import synthetic as sy
+
+SIZES = ["1280x720", "1920x1080", "3840x2160", "7680x4320"]
+
+GESTURE_CASES = ["gesture.check_user_gesture", "gesture.calc_hand_rotation_angle", "gesture.determine_right_left"]
+BOARD_CASES = ["draw.draw", "draw.erase", "zoom.zoom", "composite.render"]
+
+# Operations of the separate memory pass
+MEMORY_OPS = 20
+
+# Timed rounds of every case after a warm-up round, the round with the lowest median counts, since a single
+# median of sub-millisecond operations is dominated by scheduler and cache noise
+ROUNDS = 5
+
+
+def synthetic_corpus(count=2000, seed=0):
+    """ Get a list of landmarks of all gestures at different positions, rotations and hands with jitter
+
+    Keyword arguments:
+        count   - number of landmark sets
+        seed    - random seed
+    """
+    rnd = random.Random(seed)
+    gestures = list(sy.POSES)
+    corpus = []
+    for _ in range(count):
+        if rnd.random() < 0.1:
+            landmarks = sy.zoom_landmarks((rnd.uniform(200, 440), rnd.uniform(150, 330)), rnd.uniform(100, 400))
+        else:
+            landmarks = sy.hand_landmarks(rnd.choice(gestures), (rnd.uniform(100, 540), rnd.uniform(80, 400)),
+                                          rnd.uniform(70, 130), rnd.uniform(-1.0, 1.0), rnd.random() < 0.5)
+        corpus.append([[round(x + rnd.gauss(0, 1.5)), round(y + rnd.gauss(0, 1.5))] for x, y in landmarks])
+    return corpus
+
+
+def recorded_corpus(path=""):
+    """ Get the landmarks of all frames with hands of a recording
+
+    Keyword arguments:
+        path    - recording file (see recorder.Recorder)
+    """
+    player = rc.Player(path, rc.SPEED_MAX)
+    corpus = []
+    while True:
+        item = player.next()
+        if item is None:
+            break
+        landmarks = gs.landmarks_from_results(rc.RecordedResults(item[2]), en.CAM_WIDTH, en.CAM_HEIGHT)
+        if landmarks:
+            corpus.append(landmarks)
+    player.release()
+    return corpus
+
+
+def preview_size(height=1080):
+    """ Get the camera preview size for a whiteboard height, the buttons have to fit below the preview
+
+    Keyword arguments:
+        height  - height of the whiteboard screen
+    """
+    return round(en.SCALED_CAM[0] * height / 1080), round(en.SCALED_CAM[1] * height / 1080)
+
+
+def gesture_ops(case="", corpus=None):
+    """ Get the operations of a gesture case
+
+    Keyword arguments:
+        case    - name of the case
+        corpus  - list of landmarks
+    """
+    if case == "gesture.check_user_gesture":
+        return [functools.partial(gs.check_user_gesture, lm) for lm in corpus]
+    if case == "gesture.calc_hand_rotation_angle":
+        return [functools.partial(gs.calc_hand_rotation_angle, *zip(*lm), 0) for lm in corpus]
+    return [functools.partial(gs.determine_right_left, lm) for lm in corpus]
+
+
+def board_ops(case="", board=None, count=200, seed=0):
+    """ Get the operations of a board case
+
+    Keyword arguments:
+        case    - name of the case
+        board   - whiteboard engine
+        count   - number of operations
+        seed    - random seed of the strokes
+    """
+    if case in ("draw.draw", "draw.erase"):
+        col, thickness = (board.color_options[1][1], 2) if case == "draw.draw" else (en.WHITE, 20)
+        points = [board.scale_to_screen(p) for p in sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, count, seed)]
+        return [functools.partial(board.draw, p, col, thickness) for p in points]
+
+    if case == "zoom.zoom":
+        def start_pinch():
+            board.first_zoom = True
+            board.first_in_zoom = True
+            board.in_zoom = board.zoom_factor != 100
+
+        ops = []
+        while len(ops) < count:
+            ops.append(start_pinch)
+            ops += [functools.partial(board.zoom, lm) for _, lm in sy.pinch_script(steps=30)]
+            ops.append(start_pinch)
+            ops += [functools.partial(board.zoom, lm) for _, lm in sy.pinch_script(start=400, end=150, steps=30)]
+        return ops[:count]
+
+    # Compose with camera preview and fingertip like every displayed frame
+    capture = np.full((en.CAM_HEIGHT, en.CAM_WIDTH, 3), 127, np.uint8)
+    tip = board.scale_to_screen((320, 240))
+
+    def composite():
+        board.render(capture, tip, "draw")
+        board.restore_screen()
+
+    return [composite] * count
+
+
+def run_ops(ops=None):
+    """ Run operations and return the seconds of each
+
+    Keyword arguments:
+        ops - list of callables
+    """
+    samples = []
+    for op in ops:
+        start = time.perf_counter()
+        op()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_rounds(ops=None, rounds=ROUNDS):
+    """ Run operations in a warm-up round and several timed rounds, returns the seconds of each operation of the
+    round with the lowest median
+
+    Keyword arguments:
+        ops     - list of callables, run repeatedly
+        rounds  - number of timed rounds
+    """
+    run_ops(ops)
+    return min((run_ops(ops) for _ in range(rounds)), key=lambda s: float(np.median(s)))
+
+
+def summarize(name="", size="", samples=None, peak=0):
+    """ Get the result of a case
+
+    Keyword arguments:
+        name    - name of the case
+        size    - resolution, "-" for cases independent of it
+        samples - seconds of every operation
+        peak    - peak of traced memory in bytes
+    """
+    ms = np.array(samples) * 1000
+    return {
+        "name": name,
+        "size": size,
+        "ops": len(samples),
+        "ops_per_sec": len(samples) / max(sum(samples), 1e-9),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "peak_bytes": peak
+    }
+
+
+def traced_peak(create=None):
+    """ Get the peak of traced memory while creating and running a few operations
+
+    Keyword arguments:
+        create  - called without arguments, returns a tuple (operations, cleanup)
+    """
+    tracemalloc.start()
+    try:
+        ops, cleanup = create()
+        run_ops(ops[:MEMORY_OPS])
+        peak = tracemalloc.get_traced_memory()[1]
+        cleanup()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_gestures(corpus=None):
+    """ Run the gesture cases
+
+    Keyword arguments:
+        corpus  - list of landmarks
+    """
+    results = []
+    for case in GESTURE_CASES:
+        samples = run_rounds(gesture_ops(case, corpus))
+        peak = traced_peak(lambda: (gesture_ops(case, corpus), lambda: None))
+        results.append(summarize(case, "-", samples, peak))
+    return results
+
+
+def bench_board(text="1920x1080", count=200):
+    """ Run the board cases at a resolution
+
+    Keyword arguments:
+        text    - resolution like 1920x1080
+        count   - number of operations per case
+    """
+    width, height = pf.parse_size(text)
+    results = []
+    for case in BOARD_CASES:
+        def create():
+            board = en.Whiteboard(width, height, preview_size=preview_size(height))
+            return board_ops(case, board, count), board.close
+
+        ops, cleanup = create()
+        samples = run_rounds(ops)
+        cleanup()
+        results.append(summarize(case, text, samples, traced_peak(create)))
+    return results
+
+
+def machine():
+    """ Get a description of the machine running the suite """
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.system(),
+        "python": platform.python_version(),
+        "opencv": cv.__version__,
+        "numpy": np.__version__,
+        "cpus": os.cpu_count()
+    }
+
+
+def run_suite(sizes=None, count=200, corpus_path=""):
+    """ Run all cases and return the report
+
+    Keyword arguments:
+        sizes       - list of resolutions like 1920x1080
+        count       - number of operations per board case
+        corpus_path - recording providing the landmark corpus, empty for a synthetic corpus
+    """
+    corpus = recorded_corpus(corpus_path) if corpus_path else synthetic_corpus()
+    results = bench_gestures(corpus)
+    for text in sizes or SIZES:
+        results += bench_board(text, count)
+
+    return {
+        "machine": machine(),
+        "corpus": corpus_path or "synthetic",
+        "corpus_size": len(corpus),
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "results": results
+    }
+
+
+def print_results(results=None):
+    """ Print the results as a table
+
+    Keyword arguments:
+        results - list of case results
+    """
+    print("  {:<34}{:>10}{:>12}{:>9}{:>9}{:>9}{:>11}".format("case", "size", "ops/sec", "p50 ms", "p90 ms", "p99 ms",
+                                                          "peak MiB"))
+    for r in results:
+        print("  {:<34}{:>10}{:>12.1f}{:>9.3f}{:>9.3f}{:>9.3f}{:>11.1f}".format(
+            r["name"], r["size"], r["ops_per_sec"], r["p50_ms"], r["p90_ms"], r["p99_ms"], r["peak_bytes"] / 2 ** 20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the whiteboard")
+    parser.add_argument("--sizes", nargs="+", default=SIZES)
+    parser.add_argument("--ops", type=int, default=200, help="operations per board case")
+    parser.add_argument("--corpus", default="", help="recording providing the landmark corpus")
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.ops, args.corpus)
+    print_results(report["results"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+""" Hand tracking backend benchmark
+
+Plays a scripted session of strokes with a colored marker at the fingertip (green while drawing, blue while
+erasing, magenta to switch the color) over drawn hands and camera noise. Reports the time per frame of the
+marker tracker at several capture sizes, the share of frames whose gesture is recognized like the script
+and the mean distance of the tracked fingertip from the scripted one.
+
+    python -m benchmarks.bench_tracking [--sizes 640x480 1280x720] [--frames 300] [--json results.json]
+"""
+
+import argparse                         # Command line
+import json                             # Machine-readable output
+import math                             # Fingertip distance
+import time                             # Timing
+
+import cv2 as cv                        # Markers, color conversion
+import numpy as np                      # Camera noise
+
+from whiteboard import gestures as gs
+from whiteboard import profiles as pf
+from whiteboard import synthetic as sy
+from whiteboard import tracking as tr
+
+SIZES = ["640x480", "1280x720", "1920x1080"]
+
+# BGR color of the marker shown for a gesture
+MARKER_COLORS = {"draw": (0, 200, 0), "erase": (230, 60, 0), "switch color": (200, 0, 220)}
+
+
+def marker_script(width=640, height=480, frames=300, seed=0):
+    """ Get a script of strokes with the gestures of the markers and pauses without hands
+
+    Keyword arguments:
+        width   - width of the capture device
+        height  - height of the capture device
+        frames  - number of frames
+        seed    - random seed of the strokes
+    """
+    size = sy.HAND_SIZE * height / 480
+    points = sy.scribble_points(width, height, frames, seed)
+    script = []
+    for number, point in enumerate(points):
+        gesture = list(MARKER_COLORS)[number // 40 % len(MARKER_COLORS)]
+        script.append((gesture, sy.hand_landmarks(gesture, point, size)) if number % 100 < 90 else ("unknown", None))
+    return script
+
+
+def bench_size(text="640x480", frames=300, noise=2.0):
+    """ Track the marker session at a capture size
+
+    Keyword arguments:
+        text    - capture size like 640x480
+        frames  - number of frames
+        noise   - standard deviation of the camera noise
+    """
+    width, height = pf.parse_size(text)
+    rnd = np.random.default_rng(0)
+    source = sy.SyntheticSource(marker_script(width, height, frames), width, height, draw_hands=True)
+    tracker = tr.MarkerTracker()
+
+    seconds = 0.0
+    correct = 0
+    errors = []
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        if source.landmarks:
+            tip = tuple(source.landmarks[sy.INDEX_TIP])
+            cv.circle(frame, tip, max(6, height // 40), MARKER_COLORS[source.gesture], -1, cv.LINE_AA)
+        frame = cv.add(frame, rnd.normal(0, noise, frame.shape).astype(np.int8), dtype=cv.CV_8U)
+        rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
+
+        start = time.perf_counter()
+        results = tracker.process(rgb)
+        seconds += time.perf_counter() - start
+
+        # The gesture tolerances are calibrated for a 640 x 480 capture device
+        landmarks = gs.landmarks_from_results(results, width, height)
+        pose = gs.landmarks_from_results(results, *tr.POSE_SIZE)
+        gesture = gs.check_user_gesture(pose) if pose else "unknown"
+        correct += gesture == source.gesture
+        if landmarks and source.landmarks:
+            errors.append(math.dist(landmarks[sy.INDEX_TIP], source.landmarks[sy.INDEX_TIP]))
+
+    count = source.position
+    return {"size": text, "frames": count, "ms": seconds / count * 1000, "fps": count / seconds,
+            "gesture_accuracy": correct / count, "tip_error_px": float(np.mean(errors)) if errors else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the marker hand tracker")
+    parser.add_argument("--sizes", nargs="+", default=SIZES)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--json", default="", help="write results to this file")
+    args = parser.parse_args()
+
+    report = []
+    print("  {:>10}{:>8}{:>9}{:>10}{:>10}{:>10}".format("size", "frames", "ms", "fps", "gestures", "tip px"))
+    for text in args.sizes:
+        result = bench_size(text, args.frames)
+        report.append(result)
+        print("  {:>10}{:>8}{:>9.2f}{:>10.0f}{:>10.0%}{:>10.1f}".format(
+            text, result["frames"], result["ms"], result["fps"], result["gesture_accuracy"], result["tip_error_px"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+""" Synthetic whiteboard content for benchmarks
+
+Boards are generated from scripted strokes: handwriting-like random walks in the palette colors with a
+few erased passages, which is what our saved boards typically look like.
+"""
+
+import random                           # Reproducible strokes
+
+import numpy as np                      # Boards
+
+from whiteboard import journal as jn    # Stroke records
+
+PALETTE = [(0, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255)]
+WHITE = (255, 255, 255)
+
+# Stroke count of a typical board per preset
+PRESETS = {
+    "sparse": 40,
+    "typical": 200,
+    "dense": 1000
+}
+
+
+def scripted_strokes(width=1920, height=1080, count=200, seed=0, erase_ratio=0.05):
+    """ Generate packed journal segment records of handwriting-like strokes
+
+    Keyword arguments:
+        width       - width of the board
+        height      - height of the board
+        count       - number of strokes
+        seed        - random seed
+        erase_ratio - share of strokes that are erased passages
+    """
+    rnd = random.Random(seed)
+    records = bytearray()
+    step = max(2, width // 300)
+
+    for _ in range(count):
+        erase = rnd.random() < erase_ratio
+        op = jn.OP_ERASE if erase else jn.OP_DRAW
+        col = WHITE if erase else rnd.choice(PALETTE)
+        thickness = 20 if erase else 2
+        x = rnd.randrange(width)
+        y = rnd.randrange(height)
+        angle = rnd.uniform(0, 2 * np.pi)
+
+        for _ in range(rnd.randint(10, 60)):
+            angle += rnd.uniform(-0.6, 0.6)
+            nx = min(width - 1, max(0, int(x + np.cos(angle) * step)))
+            ny = min(height - 1, max(0, int(y + np.sin(angle) * step)))
+            records += jn.pack_segment(op, (x, y), (nx, ny), col, thickness)
+            x, y = nx, ny
+
+    return bytes(records)
+
+
+def render_strokes(strokes=b"", width=1920, height=1080):
+    """ Render packed journal segment records onto a blank board
+
+    Keyword arguments:
+        strokes - packed journal segment records
+        width   - width of the board
+        height  - height of the board
+    """
+    board = np.full((height, width, 3), WHITE, np.uint8)
+    for op, payload in jn.iter_records(strokes):
+        board = jn.apply_record(board, op, payload)
+    return board
+
+
+def typical_board(width=1920, height=1080, preset="typical", seed=0):
+    """ Get a tuple (board, strokes) of a synthetic board
+
+    Keyword arguments:
+        width   - width of the board
+        height  - height of the board
+        preset  - one of PRESETS
+        seed    - random seed
+    """
+    strokes = scripted_strokes(width, height, PRESETS[preset], seed)
+    return render_strokes(strokes, width, height), strokes
@@ -0,0 +1,160 @@
+""" Performance regression gate
+
+Runs the hot path benchmark suite with a machine profile and compares it with the committed baseline of the
+profile in benchmarks/baselines. A case regresses, if its median latency or its peak memory grows beyond the
+tolerance. All regressions are printed as a table and the command fails, so a change of the gesture logic,
+the drawing or the compositing cannot silently cost frames.
+
+    desktop - all cores, 720p to 4K
+    jetson  - a single core and a single OpenCV thread like a busy Jetson Nano, 720p and 1080p
+
+    python -m benchmarks.regress --profile desktop            # compare, exit code 1 on a regression
+    python -m benchmarks.regress --profile desktop --update   # store the current run as the new baseline
+"""
+
+import argparse                         # Command line
+import json                             # Baselines
+import os                               # Paths
+import sys                              # Exit code
+
+from benchmarks import bench_suite
+from whiteboard import profiles as pf
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+PROFILES = {
+    "desktop": {"sizes": ["1280x720", "1920x1080", "3840x2160"], "ops": 200, "cpus": 0},
+    "jetson": {"sizes": ["1280x720", "1920x1080"], "ops": 100, "cpus": 1}
+}
+
+# Allowed growth of the median latency and the peak memory
+TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.10
+
+# Differences below this many milliseconds are noise, even the fastest of several rounds of a sub-millisecond
+# operation varies by tens of percent on a shared machine
+SLACK_MS = 0.25
+
+
+def apply_profile(profile=None):
+    """ Restrict the process to the resources of a profile
+
+    Keyword arguments:
+        profile - entry of PROFILES
+    """
+    pf.restrict_cpus(profile["cpus"])
+
+
+def baseline_path(name=""):
+    """ Get the path of the baseline of a profile
+
+    Keyword arguments:
+        name    - name of the profile
+    """
+    return os.path.join(BASELINE_DIR, name + ".json")
+
+
+def compare(baseline=None, current=None, tolerance=TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """ Compare two suite reports, returns a list of rows (case, size, metric, baseline, current, change, status)
+
+    Keyword arguments:
+        baseline            - stored suite report
+        current             - suite report of the current run
+        tolerance           - allowed growth of the median latency
+        memory_tolerance    - allowed growth of the peak memory
+    """
+    stored = {(r["name"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = (result["name"], result["size"])
+        if key not in stored:
+            rows.append(key + ("p50_ms", None, result["p50_ms"], None, "new"))
+            continue
+
+        old = stored.pop(key)
+        for metric, allowed, slack in (("p50_ms", tolerance, SLACK_MS), ("peak_bytes", memory_tolerance, 0)):
+            change = result[metric] / old[metric] - 1 if old[metric] else 0.0
+            regressed = change > allowed and result[metric] - old[metric] > slack
+            rows.append(key + (metric, old[metric], result[metric], change, "REGRESSED" if regressed else "ok"))
+
+    for key in stored:
+        rows.append(key + ("p50_ms", stored[key]["p50_ms"], None, None, "missing"))
+    return rows
+
+
+def format_value(metric="", value=None):
+    if value is None:
+        return "-"
+    if metric == "peak_bytes":
+        return "{:.1f} MiB".format(value / 2 ** 20)
+    return "{:.3f} ms".format(value)
+
+
+def print_rows(rows=None, only_failed=False):
+    """ Print comparison rows as a table
+
+    Keyword arguments:
+        rows        - rows returned by compare
+        only_failed - print only regressed, new and missing cases
+    """
+    if only_failed:
+        rows = [row for row in rows if row[-1] != "ok"]
+    if not rows:
+        return
+
+    print("  {:<34}{:>10}{:>12}{:>13}{:>13}{:>9}  {}".format("case", "size", "metric", "baseline", "current",
+                                                            "change", "status"))
+    for name, size, metric, old, new, change, status in rows:
+        print("  {:<34}{:>10}{:>12}{:>13}{:>13}{:>9}  {}".format(
+            name, size, metric, format_value(metric, old), format_value(metric, new),
+            "-" if change is None else "{:+.0%}".format(change), status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the benchmark suite with a stored baseline")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="desktop")
+    parser.add_argument("--update", action="store_true", help="store the current run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed growth of the median latency")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE,
+                        help="allowed growth of the peak memory")
+    parser.add_argument("--current", default="", help="compare this suite report instead of running the suite")
+    parser.add_argument("--verbose", action="store_true", help="print all cases, not only the failed ones")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        apply_profile(profile)
+        current = bench_suite.run_suite(profile["sizes"], profile["ops"])
+    current["profile"] = args.profile
+
+    path = baseline_path(args.profile)
+    if args.update:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        bench_suite.print_results(current["results"])
+        print("Baseline written to " + path)
+        return
+
+    if not os.path.exists(path):
+        print("No baseline for profile {}, create it with --update".format(args.profile))
+        sys.exit(2)
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    rows = compare(baseline, current, args.tolerance, args.memory_tolerance)
+    failed = [row for row in rows if row[-1] == "REGRESSED"]
+    print_rows(rows, only_failed=not args.verbose)
+
+    if failed:
+        print("{} of {} checks regressed beyond the tolerance (profile {})".format(len(failed), len(rows),
+                                                                                 args.profile))
+        sys.exit(1)
+    print("No regression in {} checks (profile {})".format(len(rows), args.profile))
+
+
+if __name__ == "__main__":
+    main()
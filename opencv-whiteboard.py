@@ -24,16 +24,37 @@ __status__ = "Production"
 # IMPORTS                                                                                         #
 ###################################################################################################
 
-import copy                             # Deep copies
-import math                             # Calculations
+import argparse                         # Command line
+import concurrent.futures as cf         # Broken export pool
+import contextlib                       # Trackers of several cameras
 import os                               # Filesystem
-import tkinter                          # GUI-Toolkit
-from tkinter import filedialog as fd    # GUI for save/load functionality
+import time                             # Timestamps
 
 import cv2 as cv                        # Image processing
-import mediapipe as mp                  # Hand tracking
-import numpy as np                      # Calculations
-import screeninfo as si                 # Screen resolution
+
+from whiteboard import buffers as bf    # Frame buffer pool
+from whiteboard import collab as co     # Live collaboration
+from whiteboard import engine as en     # Whiteboard engine
+from whiteboard import export as ex     # Export pipeline
+from whiteboard import gallery as gl    # Gallery of saved images
+from whiteboard import gestures as gs   # Gesture recognition
+from whiteboard import idle as il       # Idle mode
+from whiteboard import memory as me     # Memory accounting
+from whiteboard import metrics as mt    # Metrics endpoint
+from whiteboard import motion as mo     # Motion gate
+from whiteboard import multicam as mc   # Multi-camera input
+from whiteboard import output as op     # Offscreen outputs
+from whiteboard import profiles as pf   # Performance profiles
+from whiteboard import quality as qa    # Adaptive quality
+from whiteboard import recorder as rc   # Session recording and playback
+from whiteboard import runtime as rt    # asyncio runtime
+from whiteboard import session as ss    # Native session files
+from whiteboard import startup as su    # Model warm-up and startup timing
+from whiteboard import stream as st     # HTTP viewer stream
+from whiteboard import tracking as tr   # Hand tracking backends
+
+# MediaPipe (hand tracking), screeninfo (screen resolution) and tkinter (file dialogs) take long to import, they
+# are imported on first use
 
 
 ###################################################################################################
@@ -49,108 +70,115 @@ whiteboard_off_y = 0
 whiteboard_width = 0
 window_name = "OpenCV-Whiteboard"
 
-# Text properties
-FONT = cv.FONT_HERSHEY_SIMPLEX
-LINE_TYPE = cv.LINE_AA
+# Whiteboard engine holding the complete board state
+board = None
 
-# Button execution
-cleared = None
-loaded = None
+# Gallery overlay of the "Saves" subdirectory
+GALLERY_MARGIN = 20
 
 # Function called when clicking the appropriate button
 execute = ""
 
-# Color variables
-DARK_GRAY = (63, 63, 63)
-GRAY = (127, 127, 127)
-WHITE = (255, 255, 255)
-
-color = None
-color_key = 0
-color_options = [
-    ["Black", (0, 0, 0)],
-    ["Blue", (255, 0, 0)],
-    ["Green", (0, 255, 0)],
-    ["Red", (0, 0, 255)]
-]
-color_label = color_options[0][0]
-COLORS_NUMBER = len(color_options)
-NUMBER_OF_COLOR_CHANNELS = 3
-
-# Calculations
-BUG_TOL = 50
-COLOR_TOL = 25
-ERASE_TOL = 40
-HAND_INDICES = 21
-SELECT_TOL = 40
-
 # Image saving
 FILE_FORMAT = ".jpg"
 SEPARATOR = "_"
+SESSION_FORMAT = ss.FILE_EXTENSION
+
+# Export in worker processes with the compression levels of export.DEFAULT_LEVELS
+exporter = None
+
+# Stroke journal for crash recovery
+JOURNAL_SUB_FOLDER = "/Saves/.journal"
+JOURNAL_KEEP_ON_EXIT = False
+
+# Live collaboration server broadcasting the strokes to remote viewers
+collab_server = None
+collab_port = 0
+
+# Local HTTP endpoint streaming the whiteboard screen to read-only viewers
+stream_port = 0
+
+# Performance profile of the hardware, providing the defaults of the settings below
+profile = None
 
 # Image variables
 cam = None
-cam_height = 480
-cam_width = 640
+cam_height = en.CAM_HEIGHT
+cam_width = en.CAM_WIDTH
+capture_fps = 0
+
+# Capture devices (index or path/URL), several cameras draw on the shared whiteboard with a pen each
+camera_devices = [-1]
+camera_layout = mc.LAYOUT_SHARED
+cams = []
 
 exit_program = 0
 
-SCALED_CAM = (480, 360)
-
-w_screen = None
-w_screen_cached = np.full((whiteboard_height, whiteboard_width, NUMBER_OF_COLOR_CHANNELS), WHITE, np.uint8)
-w_screen_before_zoomed = None
-
-# ----- Manipulation ----
-
-# Draw
-draw_end = None
-draw_start = None
-first_draw = True
-
-# Save
-first_save = True
-
-# Color
-first_color_change = True
-
-# Hand tracking
-latest_index_tip_position = []
-scale = [0, 0]
-
-# Button
-first_append = True
-
-# Zoom
-first_zoom = True
-first_in_zoom = True
-in_zoom = False
-off_height = 0
-off_width = 0
-zoom_factor = 100
-zoom_initial_distance = 0
-
-# Image filters
-kernel_filter = True
-kernel_gb = np.array([
-    [1 / 9, 1 / 9, 1 / 9],
-    [1 / 9, 1 / 9, 1 / 9],
-    [1 / 9, 1 / 9, 1 / 9]
-])
-kernel_s = np.array([
-    [0, -1, 0],
-    [-1, 5, -1],
-    [0, -1, 0]
-])
-
-# Mouse coordinates and interaction list
-layers = []
+# Recording of frames, landmarks and gestures, and playback of a recording instead of the camera
+player = None
+recorder = None
+
+# asyncio runtime running capture, inference, compositing and display as separate tasks, None for the serial loop
+runtime = None
+run_mode = "serial"
+queue_size = rt.QUEUE_SIZE
+RUNTIME_SERIAL = pf.RUNTIME_SERIAL
+RUNTIME_ASYNCIO = pf.RUNTIME_ASYNCIO
+
+SCALED_CAM = en.SCALED_CAM
+BUTTON_SIZE = en.BUTTON_SIZE
+
+# Headless mode renders offscreen into the outputs instead of a window
+headless = False
+output_targets = []
+outputs = []
+
+# Hand tracking backend, see tracking.BACKENDS
+tracker_backend = tr.DEFAULT_BACKEND
+
+# Adaptive quality holding a target frame rate, None for the fixed settings of the start level
+quality = None
+start_level = qa.DEFAULT_LEVEL
+target_fps = 0
+quality_log = ""
+trackers = []
+draw_landmarks = True
+
+# Motion gate reusing the hand landmarks of the last tracked frame while there is no motion, 0 to track all frames
+motion_threshold = mo.THRESHOLD
+max_skip = mo.MAX_SKIP
+gates = []
+
+# Idle mode entered after a number of frames without hands, the screen is only refreshed on change
+idle_after = il.IDLE_AFTER
+screen_changed = False
+
+# Memory accounting of the buffers and the allocations per frame, reported every number of seconds, 0 for none
+memory_report = 0
+accounting = None
+
+# Prometheus metrics endpoint for monitoring long-running boards, port 0 for none
+metrics_port = 0
+metrics = None
+metrics_server = None
+
+# Set once the variables have been released, the Exit button and the end of main() both release them
+released = False
+
+# Mouse coordinates
 mouse = [0, 0]
 
+# Hidden root window of the file dialogs, created on the first dialog
+dialog_root = None
+
+# Startup milestones and the hand tracker warmed up in the background, while the window is already shown
+startup_timer = su.StartupTimer()
+warmup = None
+
 # ----- Mediapipe -----
-mp_drawing = mp.solutions.drawing_utils
-mp_drawing_styles = mp.solutions.drawing_styles
-mp_hands = mp.solutions.hands
+mp_drawing = None
+mp_drawing_styles = None
+mp_hands = None
 
 
 ###################################################################################################
@@ -158,16 +186,18 @@ mp_hands = mp.solutions.hands
 ###################################################################################################
 
 def get_screen_resolution():
-    """
-    Get the resolution and offset of the primary monitor,
-    as well as the scaling factor for the index fingertip point
-    """
-    global scale
+    """ Get the resolution and offset of the primary monitor """
     global whiteboard_height
     global whiteboard_off_x
     global whiteboard_off_y
     global whiteboard_width
 
+    # The canvas size of the headless mode is given on the command line
+    if headless:
+        return
+
+    import screeninfo as si
+
     # Get the primary monitor values
     for m in si.get_monitors():
         if m.is_primary:
@@ -176,94 +206,96 @@ def get_screen_resolution():
             whiteboard_off_x = m.x
             whiteboard_off_y = m.y
 
-    # Set the scale according to width and height of whiteboard and capture device
-    scale[0] = whiteboard_width / cam_width
-    scale[1] = whiteboard_height / cam_height
 
+def start_warmup():
+    """ Import the hand tracking backend and warm up a hand tracker with the start settings in the background """
+    global warmup
 
-def distance(pos1=None, pos2=None):
-    """ Calculate the euclidean distance between two hand landmarks
-
-    Keyword arguments:
-        pos1    - hand landmark with x- and y-coordinates
-        pos2    - hand landmark with x- and y-coordinates
-    """
-    return math.sqrt((pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2)
+    # A recording provides its own hand landmarks
+    if player is not None:
+        return
 
-
-def point_is_in_rectangle(coord=None, x=0, y=0, width=0, height=0):
-    """ Calculate if a given point @ref coord is inside a given rectangle shaped area
-
-    Keyword arguments:
-        coord   - current mouse position
-        x       - absolute x-offset of the rectangle according to the whiteboard screen
-        y       - absolute y-offset of the rectangle according to the whiteboard screen
-        width   - width of the rectangle
-        height  - height of the rectangle
-    """
-    return (x <= coord[0] <= (x + width)) and (y <= coord[1] <= (y + height))
+    level = qa.LEVELS[start_level]
+    warmup = su.ModelWarmup(create_hands, (level.model_complexity, level.max_num_hands), (cam_width, cam_height),
+                            startup_timer)
 
 
 def setup_windows():
-    """ Initialize global variables cam and w_screen for the capture device and the whiteboard screen """
+    """ Initialize global variables cam and board for the capture device and the whiteboard engine """
+    global accounting
+    global board
     global cam
-    global cam_width
-    global cam_height
-    global w_screen
-    global whiteboard_off_x
-    global whiteboard_off_y
+    global cams
+    global exporter
+    global metrics
+    global metrics_server
+    global quality
     global window_name
 
     # Setup main window
-    cv.namedWindow(window_name, cv.WND_PROP_FULLSCREEN)
-    cv.setWindowProperty(window_name, cv.WND_PROP_FULLSCREEN, cv.WINDOW_FULLSCREEN)
-    cv.moveWindow(window_name, whiteboard_off_x, whiteboard_off_y)
-    cv.setMouseCallback(window_name, check_mouse_event)
-
-    # Setup whiteboard screen
-    clear_screen()
-
-    # Setup capture device
-    cam = cv.VideoCapture(-1)
-    cam.set(cv.CAP_PROP_FRAME_WIDTH, cam_width)
-    cam.set(cv.CAP_PROP_FRAME_HEIGHT, cam_height)
-
-    # Setup buttons
-    create_button("Save")
-    create_button("Load")
-    create_button("Clear")
-    create_button("Exit")
-
-
-def create_button(label="", size_x=125, size_y=50):
-    """ Create button with label and size and append it to layers array
-
-    Keyword arguments:
-        label   - label of the button
-        size_x  - width of the button
-        size_y  - height of the button
-    """
-    global color_options
-    global first_append
-    global layers
+    if not headless:
+        cv.namedWindow(window_name, cv.WND_PROP_FULLSCREEN)
+        cv.setWindowProperty(window_name, cv.WND_PROP_FULLSCREEN, cv.WINDOW_FULLSCREEN)
+        cv.moveWindow(window_name, whiteboard_off_x, whiteboard_off_y)
+        cv.setMouseCallback(window_name, check_mouse_event)
+
+    # Setup whiteboard screen and buttons
+    board = en.Whiteboard(whiteboard_width, whiteboard_height, cam_width, cam_height, SCALED_CAM,
+                          button_size=BUTTON_SIZE)
+    board.start_image_loader()
+    board.on_action = handle_gallery_action
+    if target_fps:
+        quality = qa.QualityController(target_fps, level=start_level, on_change=apply_quality, log_path=quality_log)
+    else:
+        apply_quality(qa.LEVELS[start_level])
+    exporter = ex.Exporter()
+
+    # Setup gallery and build missing thumbnails in the background
+    board.gallery = gl.Gallery(
+        gl.ThumbnailCache(os.getcwd() + "/Saves"),
+        whiteboard_width - SCALED_CAM[0] - GALLERY_MARGIN * 2,
+        whiteboard_height - GALLERY_MARGIN * 2,
+        SCALED_CAM[0] + GALLERY_MARGIN,
+        GALLERY_MARGIN
+    )
+    board.gallery.cache.refresh()
 
-    # Set initial colors
-    btn = np.full((size_y, size_x, NUMBER_OF_COLOR_CHANNELS), color_options[0][1], np.uint8)
-    btn[2:size_y - 2, 2:size_x - 2] = GRAY
+    # Setup offscreen outputs
+    for target in output_targets:
+        outputs.append(op.open_output(target, whiteboard_width, whiteboard_height))
 
-    # Get boundary of text as well as x and y coordinates
-    label_size = cv.getTextSize(label, FONT, 1, 2)[0]
-    label_x = int((size_x - label_size[0]) / 2)
-    label_y = int((size_y + label_size[1]) / 2)
+    # The viewer stream is written like an offscreen output
+    if stream_port:
+        outputs.append(st.ViewerStream(port=stream_port))
+        print("Viewer stream on http://localhost:{}/".format(outputs[-1].port))
 
-    cv.putText(btn, label, (label_x, label_y), FONT, 1, WHITE, 2, LINE_TYPE)
+    # Show the blank whiteboard screen before the camera and the hand tracker are ready
+    show_window(board.step(None, None))
+    startup_timer.mark("first screen")
 
-    # Append buttons to layer array with additional x- and y-offset according to the main window
-    if first_append:
-        first_append = False
-        layers.append([btn, 50, size_y, label])
+    # Setup capture device, a recording replaces the camera
+    if player is not None:
+        cam = player
     else:
-        layers.append([btn, 50, layers[-1][2] + (size_y * 2) if layers else (size_y * 2), label])
+        cams = [mc.open_camera(*profile.capture_source(device), cam_width, cam_height, capture_fps)
+                for device in camera_devices]
+        cam = cams[0]
+
+    # Account the canvas layers and the buffers of the outputs
+    if memory_report:
+        accounting = me.MemoryAccounting(memory_report)
+        accounting.register("board", board)
+        for number, output in enumerate(outputs):
+            if hasattr(output, "memory_buffers"):
+                accounting.register("output {}".format(number), output)
+
+    # Serve the metrics, the loop only counts, everything else is collected on every scrape
+    if metrics_port:
+        metrics = mt.Metrics()
+        metrics.collectors.append(collect_metrics)
+        mt.CanvasMetrics(metrics, board)
+        metrics_server = mt.MetricsServer(metrics, port=metrics_port)
+        print("Metrics on http://localhost:{}/metrics".format(metrics_server.port))
 
 
 def check_mouse_event(event=0, mouse_x=0, mouse_y=0, flags=None, userdata=None):
@@ -276,12 +308,24 @@ def check_mouse_event(event=0, mouse_x=0, mouse_y=0, flags=None, userdata=None):
         flags       - additional flags for mouse events
         userdata    - additional userdata
     """
-    global cleared
+    # Buttons and gallery are part of the engine, the display thread must not wait for the running step
+    run_on_compose(handle_mouse_event, event, mouse_x, mouse_y, wait=False)
+
+
+def handle_mouse_event(event=0, mouse_x=0, mouse_y=0):
+    """ Execute a mouse interaction on the thread stepping the whiteboard engine
+
+    Keyword arguments:
+        event       - mouse event
+        mouse_x     - x coordinate of current mouse position
+        mouse_y     - y coordinate of current mouse position
+    """
     global execute
-    global layers
     global mouse
-    global w_screen
-    global window_name
+    global screen_changed
+
+    # Mouse interactions change the whiteboard screen, also in the idle state
+    screen_changed = True
 
     # Analyze button highlighting for mouse movement
     if event == cv.EVENT_MOUSEMOVE:
@@ -290,404 +334,165 @@ def check_mouse_event(event=0, mouse_x=0, mouse_y=0, flags=None, userdata=None):
         mouse[1] = mouse_y
 
         # Check if mouse hovers over button
-        for lay in layers:
-            if point_is_in_rectangle(mouse, lay[1], lay[2] + SCALED_CAM[1], lay[0].shape[1], lay[0].shape[0]):
-                # Change appearance for highlighted button
-                lay[0][2:lay[0].shape[0] - 2, 2:lay[0].shape[1] - 2] = DARK_GRAY
-                execute = lay[3]
-            else:
-                # Set button to initial color state
-                lay[0][2:lay[0].shape[0] - 2, 2:lay[0].shape[1] - 2] = GRAY
-
-            # Put text on button again
-            label_size = cv.getTextSize(lay[3], FONT, 1, 2)[0]
-            label_x = int((lay[0].shape[1] - label_size[0]) / 2)
-            label_y = int((lay[0].shape[0] + label_size[1]) / 2)
-
-            cv.putText(lay[0], lay[3], (label_x, label_y), FONT, 1, WHITE, 2, LINE_TYPE)
+        hovered = board.hover(mouse)
+        if hovered:
+            execute = hovered
 
     # Check if a button has been clicked
     if event == cv.EVENT_LBUTTONDOWN:
+        if execute == "" and board.gallery.is_open:
+            board.handle_gallery_action(board.gallery.click(mouse))
         if execute == "Save":
-            save_screen()
+            run_command(save_screen)
         if execute == "Load":
-            load_image()
+            board.gallery.open()
         if execute == "Clear":
-            cleared = np.full((whiteboard_height, whiteboard_width, NUMBER_OF_COLOR_CHANNELS), WHITE, np.uint8)
+            board.clear()
         if execute == "Exit":
-            release_variables()
+            if runtime is not None:
+                runtime.stop()
+            else:
+                release_variables()
 
         execute = ""
 
 
 def release_variables():
-    """ Release allocated variables """
+    """ Release allocated variables, only once """
+    global accounting
     global cam
+    global recorder
+    global released
 
-    cam.release()
-    cv.destroyAllWindows()
-
-
-def show_window(capture=None, index_coord=None, gesture="", col=color_options[0][1]):
-    """ Display image in a single window
-
-    Keyword arguments:
-        capture     - captured frame of camera device
-        index_coord - coordinate of index fingertip
-        gesture     - current gesture calculated
-        col         - current color label
-    """
-    global cleared
-    global exit_program
-    global layers
-    global loaded
-    global w_screen
-    global w_screen_cached
-    global w_screen_before_zoomed
-    global window_name
-    global zoom_factor
-
-    # Check if an image was loaded
-    if loaded is not None:
-        w_screen = copy.deepcopy(loaded)
-        w_screen_before_zoomed = copy.deepcopy(w_screen)
-        loaded = None
-        zoom_factor = 100
-
-    # Check if the image was cleared
-    if cleared is not None:
-        w_screen = copy.deepcopy(cleared)
-        w_screen_before_zoomed = copy.deepcopy(w_screen)
-        cleared = None
-        zoom_factor = 100
-
-    # Create a deep copy of the whiteboard screen
-    w_screen_cached = copy.deepcopy(w_screen)
-
-    # Modify capture frame
-    capture = cv.cvtColor(capture, cv.COLOR_RGB2BGR)
-    capture = cv.flip(capture, 1)
-    capture = cv.putText(capture, "Gesture: " + gesture, (20, 460), FONT, 0.75, color_options[0][1], 2, LINE_TYPE)
-    capture = cv.putText(capture, "Gesture: " + gesture, (20, 460), FONT, 0.75, color_options[2][1], 1, LINE_TYPE)
-    capture = cv.putText(capture, "Color: " + col, (300, 460), FONT, 0.75, color_options[0][1], 2, LINE_TYPE)
-    capture = cv.putText(capture, "Color: " + col, (300, 460), FONT, 0.75, color_options[2][1], 1, LINE_TYPE)
-    capture = cv.putText(capture, "Zoom: " + str(zoom_factor), (20, 260), FONT, 0.75, color_options[0][1], 2, LINE_TYPE)
-    capture = cv.putText(capture, "Zoom: " + str(zoom_factor), (20, 260), FONT, 0.75, color_options[2][1], 1, LINE_TYPE)
-    capture = cv.resize(capture, SCALED_CAM, 0, 0, interpolation=cv.INTER_CUBIC)
-
-    # Mark the index fingertip position on the screen if existent
-    if index_coord is not None:
-        w_screen = cv.circle(w_screen, center=index_coord, radius=3, color=color, thickness=1, lineType=LINE_TYPE)
-
-    w_screen = cv.flip(w_screen, 1)
-
-    # Lay camera and buttons above whiteboard screen
-    cap_off_y = capture.shape[0]
-    cap_off_x = capture.shape[1]
-    w_screen[0:cap_off_y, 0:cap_off_x] = capture
-    for lay in layers:
-        w_screen[cap_off_y + lay[2]:cap_off_y + lay[2] + lay[0].shape[0], lay[1]:lay[1] + lay[0].shape[1]] = lay[0]
-
-    cv.imshow(window_name, w_screen)
-
-    # Check if window has been closed by "q" or by default window close
-    if cv.waitKey(1) == ord("q"):
-        exit_program = 1
+    if released:
+        return
+    released = True
 
+    cam.release()
+    for other in cams[1:]:
+        other.release()
+    if not headless:
+        cv.destroyAllWindows()
 
-def calc_hand_rotation_angle(lmx_n, lmy_n, offset):
-    """ Calculate the hand rotation angle according to the current hand landmarks
+    # Disconnect remote viewers
+    if collab_server is not None:
+        collab_server.close()
 
-    Keyword arguments:
-        lmx_n   - hand landmark x coordinates
-        lmy_n   - hand landmark y coordinates
-        offset  - statically given offset
-    """
-    off = 21 * offset
+    # Stop serving the metrics
+    if metrics_server is not None:
+        metrics_server.close()
 
-    # Calculate angle
-    ang = math.acos(abs(lmy_n[5 + off] - lmy_n[0 + off]) / abs(
-        math.sqrt((lmy_n[5 + off] - lmy_n[0 + off]) ** 2 + (lmx_n[5 + off] - lmx_n[0 + off]) ** 2)))
+    # Report the memory before the outputs release their buffers
+    if accounting is not None:
+        accounting.report()
+        accounting.close()
+        accounting = None
 
-    # Rotation over 90°
-    if lmy_n[0 + off] < lmy_n[5 + off]:
-        ang = math.pi / 2 + (math.pi / 2 - ang)
+    # Finish the offscreen outputs
+    for output in outputs:
+        output.close()
+    outputs.clear()
 
-    # Rotation anticlockwise
-    if lmx_n[0 + off] < lmx_n[5 + off]:
-        ang *= -1
+    # Write the remaining recorded frames
+    if recorder is not None:
+        recorder.close()
+        print("Recorded {} frames to {} ({} chunks dropped)".format(
+            recorder.frames, recorder.path, recorder.dropped_chunks))
+        recorder = None
 
-    # Offset for left or right hand
+    # Report the frames skipped by the motion gates
+    for gate in gates:
+        print("Motion gate: {}".format(gate))
 
-    # Up
-    if abs(ang) <= .25 * math.pi:
-        if lmx_n[5 + off] > lmx_n[17 + off]:
-            ang += .5
-        else:
-            ang -= .5
+    # Close the warmed-up hand tracker, if it has not been used
+    if warmup is not None:
+        warmup.close()
+    print("Startup: {}".format(startup_timer))
 
-    # Right
-    elif .25 * math.pi < ang < .75 * math.pi:
-        if lmy_n[5 + off] < lmy_n[17 + off]:
-            ang += .5
-        else:
-            ang -= .5
+    # Finish pending exports
+    if exporter is not None:
+        exporter.shutdown()
 
-    # Down
-    elif abs(ang) >= .75 * math.pi:
-        if lmx_n[5 + off] < lmx_n[17 + off]:
-            ang += .5
-        else:
-            ang -= .5
-
-    # Left
-    elif -.25 * math.pi > ang > -.75 * math.pi:
-        if lmy_n[5 + off] > lmy_n[17 + off]:
-            ang += .5
-        else:
-            ang -= .5
-
-    return ang
+    # Flush the journal, a regular exit does not need to be recovered
+    board.close(discard_journal=not JOURNAL_KEEP_ON_EXIT)
 
 
-def check_user_gesture(landmarks=None):
-    """ Check the image for a hand gesture and distinguish between them
+def show_window(screen=None):
+    """ Display image in a single window and write it to the outputs, returns False if the window has been closed
 
     Keyword arguments:
-        landmarks - hand landmarks
+        screen  - composed whiteboard screen
     """
-    draw_flag = False
-    select_flag = False
-    erase_flag = False
-    color_flag = False
-    zoom_flag = False
-
-    # Split x and y coordinates into two separate arrays
-    lm = np.array(landmarks)
-    lmx_n, lmy_n = zip(*lm)
-
-    # Arrays for separate x and y coordinates
-    lmx = []
-    lmy = []
-
-    # Rotation
-    ang0 = calc_hand_rotation_angle(lmx_n, lmy_n, 0)
-
-    for i in range(21):
-        x = lmx_n[i]
-        y = lmy_n[i]
-        lmx.append(math.cos(ang0) * x - math.sin(ang0) * y)
-        lmy.append(math.sin(ang0) * x + math.cos(ang0) * y)
-
-    if len(lmx_n) > 21:
-        ang1 = calc_hand_rotation_angle(lmx_n, lmy_n, 1)
-        for i in range(21, 42):
-            x = lmx_n[i]
-            y = lmy_n[i]
-            lmx.append(math.cos(ang1) * x - math.sin(ang1) * y)
-            lmy.append(math.sin(ang1) * x + math.cos(ang1) * y)
-
-    # Check if only one hand has been listed
-    if len(lm) != 42:
-        # Gesture: DRAW
-        for e in lmy[:6] + lmy[9:HAND_INDICES]:
-            if e > lmy[6]:
-                draw_flag = True
-            else:
-                draw_flag = False
-                break
+    write_outputs(time.time(), screen)
 
-        # Gesture: SELECT
-        if draw_flag:
-            if distance(lm[4], lm[6]) > SELECT_TOL:
-                draw_flag = False
-                select_flag = True
+    # Without a window, the whiteboard screen only goes to the outputs
+    if headless:
+        return True
 
-        # Gesture SELECT COLOR
-        for e in lmy[:12] + lmy[13:HAND_INDICES]:
-            if e > lmy[12] and distance(lm[8], lm[12]) < COLOR_TOL:
-                color_flag = True
-            else:
-                color_flag = False
-                break
+    return display(screen)
 
-        # Gesture: ERASE
-        if color_flag and distance(lm[4], lm[5]) < ERASE_TOL:
-            erase_flag = True
 
-    # Otherwise, check for a two hand interaction
-    else:
-        # Gesture: ZOOM
-        if distance(lm[0], lm[HAND_INDICES]) > BUG_TOL:
-            if distance(lm[4], lm[8]) > 50 and distance(lm[HAND_INDICES + 4], lm[HAND_INDICES + 8]) > 50:
-                for e, f in zip(lmy[:6] + lmy[9:HAND_INDICES],
-                                lmy[HAND_INDICES:HAND_INDICES + 6] + lmy[HAND_INDICES + 9:]):
-                    if e > lmy[6] and f > lmy[HAND_INDICES + 6]:
-                        zoom_flag = True
-                    else:
-                        zoom_flag = False
-                        break
-
-    # Return gesture according to set flags
-    if draw_flag:
-        return "draw"
-    if select_flag:
-        return "select"
-    if erase_flag:
-        return "erase"
-    if color_flag:
-        # Gesture: SWITCH COLOR
-        if lmy[16] < lmy[14] and lmy[20] < lmy[18]:
-            return "switch color"
-        return "select color"
-    if zoom_flag:
-        return "zoom"
-
-    return "unknown"
-
-
-def determine_right_left(landmarks=None):
-    """ Rearrange the order of the hand landmarks to be right hand first
+def write_outputs(timestamp=0.0, screen=None):
+    """ Write the whiteboard screen to all offscreen outputs
 
     Keyword arguments:
-        landmarks - hand landmarks
+        timestamp   - time of the frame in seconds
+        screen      - composed whiteboard screen
     """
-    if len(landmarks) == HAND_INDICES * 2:
-        if landmarks[5][0] < landmarks[17][0]:
-            landmarks_left = landmarks[:HAND_INDICES]
-            landmarks_right = landmarks[HAND_INDICES:]
-            return landmarks_right + landmarks_left
+    for output in outputs:
+        output.write(timestamp, screen)
 
-    return landmarks
 
+def start_collaboration():
+    """ Start broadcasting the whiteboard to remote viewers, if a port has been given """
+    global collab_server
 
-def restore_screen():
-    """ Reset the screen to the latest change before adding custom layers """
-    global w_screen
-    global w_screen_cached
-    w_screen = copy.deepcopy(w_screen_cached)
+    if collab_port:
+        collab_server = co.CollaborationServer(board, port=collab_port)
+        print("Collaboration server listening on port {}".format(collab_server.port))
 
 
-def draw(coord=None, col=color, thickness=2):
-    """ Responsible for drawing the users input
+def run_command(func=None, *args):
+    """ Execute a blocking user interface action, in its own thread when the asyncio runtime is used
 
     Keyword arguments:
-        coord       - current index fingertip position
-        col         - selected color
-        thickness   - thickness of the drawn line
-
-    first_draw: flag is set to True, if the draw function has been called the first time
-    draw_start: starting point of the line
-    draw_end:   end point of the line
+        func    - function to execute
+        args    - arguments of the function
     """
-    global draw_end
-    global draw_start
-    global first_draw
-    global w_screen
-    global w_screen_before_zoomed
-    global whiteboard_width
-    global whiteboard_height
-    global zoom_factor
-
-    if first_draw:
-        first_draw = False
-        draw_start = coord
-        draw_end = None
+    if runtime is not None:
+        runtime.command(func, *args)
     else:
-        draw_end = coord
-        w_screen = cv.line(w_screen, draw_start, draw_end, col, thickness=thickness, lineType=LINE_TYPE)
-        draw_start = draw_end
-
-        if zoom_factor == 100:
-            w_screen_before_zoomed = copy.deepcopy(w_screen)
-
-
-def switch_color():
-    """ Switch the current color, if the applicable gesture is called """
-    global color
-    global color_key
-    global color_label
-    global color_options
-    global first_color_change
-
-    if first_color_change:
-        first_color_change = False
-        if color_key + 1 < COLORS_NUMBER:
-            color_key += 1
-        else:
-            color_key = 0
+        func(*args)
 
-    color = color_options[color_key][1]
-    color_label = color_options[color_key][0]
 
-
-def zoom(lm=None):
-    """ Perform a zoom on the whiteboard screen
+def run_on_compose(func=None, *args, wait=True):
+    """ Execute a function on the thread stepping the whiteboard engine and return its result
 
     Keyword arguments:
-        lm  - hand landmarks
+        func    - function to execute
+        args    - arguments of the function
+        wait    - wait for the result, False to return None without waiting under the asyncio runtime
     """
-    global first_zoom
-    global first_in_zoom
-    global in_zoom
-    global off_width
-    global off_height
-    global scale
-    global w_screen
-    global w_screen_before_zoomed
-    global whiteboard_height
-    global whiteboard_width
-    global zoom_initial_distance
-    global zoom_factor
-
-    # Calculate the distance between the two index fingertips
-    i1 = [round(a * b) for a, b in zip(lm[8], scale)]
-    i2 = [round(a * b) for a, b in zip(lm[HAND_INDICES + 8], scale)]
-    index_distance = distance(i1, i2)
-
-    # If not in zoom mode set the initial distance to index distance
-    if not in_zoom:
-        if first_zoom:
-            first_zoom = False
-            zoom_initial_distance = int(index_distance)
-
-    # Otherwise, calculate the appropriate initial distance to get the current @ref zoom_factor
-    else:
-        if first_in_zoom:
-            first_in_zoom = False
-            zoom_initial_distance = int(zoom_factor * index_distance / 100)
+    if runtime is not None:
+        return runtime.run_on_compose(func, *args, wait=wait)
+    return func(*args)
 
-    zoom_factor = int(zoom_initial_distance * 100 / index_distance)
 
-    # Cap zoom_factor for special cases
-    if zoom_factor > 100:
-        zoom_factor = 100
+def file_dialogs():
+    """ Import tkinter and create the hidden root window of the file dialogs once, returns tkinter.filedialog """
+    global dialog_root
 
-    if zoom_factor < 1:
-        zoom_factor = 1
+    import tkinter
+    from tkinter import filedialog as fd
 
-    if zoom_factor == 100:
-        in_zoom = False
-
-    factor = zoom_factor / 100
-
-    # Calculate the relative resolution according to the zoom factor
-    height = int(whiteboard_height * factor)
-    off_height = int((whiteboard_height - height) / 2)
-    width = int(whiteboard_width * factor)
-    off_width = int((whiteboard_width - width) / 2)
-
-    # Set the whiteboard screen to that specific relative resolution and resize it to the intended fullscreen resolution
-    w_screen = copy.deepcopy(
-        w_screen_before_zoomed[off_height:whiteboard_height - off_height, off_width:whiteboard_width - off_width]
-    )
-    w_screen = cv.resize(w_screen, (whiteboard_width, whiteboard_height), interpolation=cv.INTER_AREA)
+    if dialog_root is None:
+        dialog_root = tkinter.Tk()
+        dialog_root.withdraw()
+    return fd
 
 
 def save_screen():
     """ Save whiteboard screen """
-    global w_screen_cached
-
     # Create the sub folder, if it does not exist
     sub_folder = "/Saves"
     path = os.getcwd() + sub_folder
@@ -698,17 +503,60 @@ def save_screen():
         pass
 
     # Show file dialog for writing the whiteboard screen image with a valid filename
-    tkinter.Tk().withdraw()
-    filename = fd.asksaveasfilename(defaultextension="", initialdir=path, filetypes=[("Images", ".jpg")])
+    fd = file_dialogs()
+    filename = fd.asksaveasfilename(
+        parent=dialog_root,
+        defaultextension="",
+        initialdir=path,
+        filetypes=[
+            ("Images", FILE_FORMAT),
+            ("PNG", ".png"),
+            ("WebP", ".webp"),
+            ("SVG (strokes)", ".svg"),
+            ("PDF (strokes)", ".pdf"),
+            ("Whiteboard session", SESSION_FORMAT)
+        ]
+    )
+    dialog_root.update()
 
     if filename:
-        cv.imwrite(filename, cv.flip(w_screen_cached, 1))
+        start = time.perf_counter()
+        if ss.is_session_file(filename):
+            # Copy the state between two steps, the file is written while the engine keeps stepping
+            board.save_session(filename, run_on_compose(board.session_state))
+            observe_save("session", time.perf_counter() - start)
+            board.gallery.cache.refresh()
+        elif ex.format_of(filename) is not None:
+            # Encode in a worker process, the gallery is updated once the file has been written
+            image, strokes = run_on_compose(lambda: (board.snapshot(), bytes(board.strokes)))
+            for future in exporter.submit(filename, image, strokes):
+                future.add_done_callback(export_done)
+        else:
+            cv.imwrite(filename, run_on_compose(board.snapshot))
+            observe_save("image", time.perf_counter() - start)
+            board.gallery.cache.refresh()
+
+
+def export_done(future=None):
+    """ Report a finished export
+
+    Keyword arguments:
+        future  - future of the export job
+    """
+    try:
+        path, size, seconds = future.result()
+    except (OSError, ValueError, cv.error, cf.BrokenExecutor) as e:
+        # A crashed worker process breaks the pool (BrokenProcessPool), it is reported like the other errors
+        print("Export failed: " + (str(e) or type(e).__name__))
+        return
+
+    print("Exported {} ({} KiB, {:.0f} ms)".format(path, size // 1024, seconds * 1000))
+    observe_save("export", seconds)
+    board.gallery.cache.refresh()
 
 
 def backup_screen():
     """ Make a backup of the image in case of an application error """
-    global w_screen_cached
-
     # Create the sub folder, if it does not exist
     path = os.getcwd() + "/Saves/"
     try:
@@ -717,16 +565,24 @@ def backup_screen():
     except FileExistsError:
         pass
 
-    cv.imwrite(path + "BACKUP.png", cv.flip(w_screen_cached, 1))
+    start = time.perf_counter()
+    cv.imwrite(path + "BACKUP.png", board.snapshot())
+    observe_save("backup", time.perf_counter() - start)
+
+
+def observe_save(kind="", seconds=0.0):
+    """ Add the duration of a save to the metrics
+
+    Keyword arguments:
+        kind    - session, image, export or backup
+        seconds - duration of the save
+    """
+    if metrics is not None:
+        metrics.observe("whiteboard_save_seconds", seconds, kind=kind)
 
 
 def load_image():
     """ Load an image from the "Saves" subdirectory """
-    global loaded
-    global w_screen_cached
-    global whiteboard_height
-    global whiteboard_width
-
     # Create the sub folder, if it does not exist
     sub_folder = "/Saves"
     path = os.getcwd() + sub_folder
@@ -737,28 +593,307 @@ def load_image():
         pass
 
     # Show file dialog for loading an image
-    tkinter.Tk().withdraw()
-    filename = fd.askopenfilename(initialdir=path)
-    try:
-        loaded = cv.flip(cv.imread(filename), 1)
-    except TypeError:
-        pass
+    fd = file_dialogs()
+    filename = fd.askopenfilename(parent=dialog_root, initialdir=path)
+    dialog_root.update()
 
-    # Check if loaded image has the same resolution as whiteboard, if not resize the loaded image
-    if loaded is not None:
-        # Get the resolution of the loaded image
-        loaded_height, loaded_width, _ = loaded.shape
-        if loaded_height != whiteboard_height or loaded_width != whiteboard_width:
-            loaded = cv.resize(loaded, (whiteboard_width, whiteboard_height), interpolation=cv.INTER_AREA)
-            w_screen_cached = copy.deepcopy(loaded)
+    if filename:
+        run_on_compose(board.load_file, filename)
 
 
-def clear_screen():
-    """ Get a new blank whiteboard screen """
-    global w_screen
-    global w_screen_before_zoomed
-    w_screen = np.full((whiteboard_height, whiteboard_width, NUMBER_OF_COLOR_CHANNELS), WHITE, np.uint8)
-    w_screen_before_zoomed = np.full((whiteboard_height, whiteboard_width, NUMBER_OF_COLOR_CHANNELS), WHITE, np.uint8)
+def handle_gallery_action(action=None):
+    """ Execute a gallery action the whiteboard engine leaves to the user interface
+
+    Keyword arguments:
+        action  - ("browse",)
+    """
+    # There is no file dialog without a display
+    if action[0] == "browse" and not headless:
+        run_command(load_image)
+
+
+def start_journal():
+    """ Restore the whiteboard screen from an existing journal and start a new journal generation """
+    if board.start_journal(os.getcwd() + JOURNAL_SUB_FOLDER):
+        print("Whiteboard has been restored from journal!")
+
+
+def track(frame=None, hands=None, pool=None, small=None):
+    """ Get the hand landmarks of a BGR camera frame
+
+    Returns a tuple (BGR frame with drawn landmarks, landmarks, tracking results).
+
+    Keyword arguments:
+        frame   - captured frame of camera device
+        hands   - hand tracker
+        pool    - buffer pool of the calling loop, None to allocate the buffers
+        small   - downscaled frame passed to the hand tracker instead, e.g. in the idle state, the preview keeps
+                  the full frame
+    """
+    # The camera preview is already shown while the hand tracker is warming up
+    if warmup is not None and not warmup.ready:
+        return frame, None, None
+
+    # The hand tracker needs RGB, the preview stays BGR. The results are normalized, so they fit both sizes.
+    source = frame if small is None else small
+    key = "rgb" if source is frame else "idle rgb"
+    rgb = cv.cvtColor(source, cv.COLOR_BGR2RGB, dst=None if pool is None else pool.like(key, source))
+
+    # Get hand landmarks of current frame
+    results = hands.process(rgb)
+    landmarks = gs.landmarks_from_results(results, cam_width, cam_height)
+    if landmarks:
+        startup_timer.mark("first landmark")
+
+    if landmarks and draw_landmarks:
+        # The raw frame is recorded without the landmarks
+        if recorder is not None:
+            frame = frame.copy() if pool is None else pool.copy("preview", frame)
+        # Other backends do not need MediaPipe for drawing either
+        if tracker_backend != tr.BACKEND_MEDIAPIPE:
+            return tr.draw_results(frame, results), landmarks, results
+        if mp_drawing is None:
+            import_mediapipe()
+
+        # Draw the connections between the landmarks
+        for hand_landmarks in results.multi_hand_landmarks:
+            mp_drawing.draw_landmarks(
+                frame,
+                hand_landmarks,
+                mp_hands.HAND_CONNECTIONS,
+                mp_drawing_styles.get_default_hand_landmarks_style(),
+                mp_drawing_styles.get_default_hand_connections_style()
+            )
+
+    return frame, landmarks, results
+
+
+def import_mediapipe():
+    """ Import the MediaPipe drawing utilities on first use, the import takes seconds """
+    global mp_drawing
+    global mp_drawing_styles
+    global mp_hands
+
+    import mediapipe as mp
+
+    mp_drawing = mp.solutions.drawing_utils
+    mp_drawing_styles = mp.solutions.drawing_styles
+    mp_hands = mp.solutions.hands
+
+
+def create_hands(model_complexity=0, max_num_hands=2):
+    """ Create a hand tracker of the selected backend
+
+    Keyword arguments:
+        model_complexity    - complexity of the hand landmark model
+        max_num_hands       - maximum number of tracked hands
+    """
+    return tr.BACKENDS[tracker_backend](model_complexity, max_num_hands)
+
+
+def create_tracker():
+    """ Create the hand tracker, a recording provides its own hand landmarks """
+    if player is not None:
+        return player
+
+    # The adaptive quality adjusts the input resolution and the model of the tracker at runtime, the first tracker
+    # is the one warmed up in the background
+    tracker = qa.AdaptiveTracker(warmup.take if warmup is not None else create_hands,
+                                 quality.current if quality is not None else qa.LEVELS[start_level])
+    trackers.append(tracker)
+
+    # Frames without motion are not tracked at all
+    gate = mo.MotionGate(tracker, motion_threshold, max_skip)
+    gates.append(gate)
+    return gate
+
+
+def apply_quality(level=None):
+    """ Take over the settings of a quality level
+
+    Keyword arguments:
+        level   - QualityLevel chosen by the adaptive quality
+    """
+    global draw_landmarks
+
+    draw_landmarks = level.landmarks
+    board.set_preview(level.preview_size, level.preview_interpolation)
+    for tracker in trackers:
+        tracker.configure(level)
+
+
+def update_quality(timestamp=0.0):
+    """ Measure the frame time for the adaptive quality
+
+    Keyword arguments:
+        timestamp   - capture time of the composed frame in seconds
+    """
+    if quality is not None:
+        quality.update(time.time() - timestamp)
+
+
+def record_step(timestamp=0.0, raw_frame=None, results=None, engine=None):
+    """ Record the raw frame together with the tracking results
+
+    Keyword arguments:
+        timestamp   - capture time in seconds
+        raw_frame   - captured frame of camera device
+        results     - hand tracking results
+        engine      - whiteboard engine after the step
+    """
+    if recorder is not None:
+        recorder.add_results(timestamp, raw_frame, results, engine.gesture)
+
+
+def finish_step(timestamp=0.0, raw_frame=None, results=None, engine=None):
+    """ Record the step and measure its frame time, called on the compose thread of the asyncio runtime
+
+    Keyword arguments:
+        timestamp   - capture time in seconds
+        raw_frame   - captured frame of camera device
+        results     - hand tracking results
+        engine      - whiteboard engine after the step
+    """
+    record_step(timestamp, raw_frame, results, engine)
+    update_quality(timestamp)
+    frame_composed()
+
+
+def frame_composed():
+    """ Time the first camera frame and account the buffers, allocations and metrics of the finished frame """
+    startup_timer.mark("first frame")
+    if accounting is not None:
+        accounting.frame()
+    if metrics is not None:
+        metrics.frame(board.gesture)
+
+
+def observe_stage(stage="", seconds=0.0):
+    """ Add the latency of a stage of the loop to the metrics
+
+    Keyword arguments:
+        stage   - name of the stage, e.g. capture, inference, compose or display
+        seconds - time the stage took for one frame
+    """
+    if metrics is not None:
+        metrics.observe("whiteboard_stage_seconds", seconds, stage=stage)
+
+
+def collect_metrics(collected=None):
+    """ Collect the metrics of the motion gates, the runtime, the adaptive quality and the buffers on a scrape
+
+    Keyword arguments:
+        collected   - mt.Metrics
+    """
+    frames = sum(gate.frames for gate in gates)
+    if frames:
+        collected.set("whiteboard_inference_skip_ratio", sum(gate.skipped for gate in gates) / frames)
+    if runtime is not None:
+        for stage in list(runtime.stages.values()) + [output.stage for output in runtime.outputs]:
+            collected.set("whiteboard_dropped_frames_total", stage.dropped, stage=stage.name)
+    if quality is not None:
+        collected.set("whiteboard_quality_level", quality.level)
+    if accounting is not None:
+        for owner, sizes in accounting.live().items():
+            collected.set("whiteboard_buffer_bytes", sum(sizes.values()), owner=owner)
+
+
+def display(screen=None, delay=1):
+    """ Show the whiteboard screen in the main window, returns False if the window has been closed
+
+    Keyword arguments:
+        screen  - composed whiteboard screen, None to only handle the window events
+        delay   - milliseconds to wait for window events
+    """
+    global exit_program
+
+    if screen is not None:
+        cv.imshow(window_name, screen)
+
+    # Check if window has been closed by "q" or by default window close
+    if cv.waitKey(delay) == ord("q"):
+        exit_program = 1
+
+    return not exit_program
+
+
+def run_async():
+    """ Run capture, inference, compositing and display as asyncio tasks """
+    global runtime
+
+    with create_tracker() as hands:
+        runtime = rt.Runtime(board, cam, lambda frame: track(frame, hands), None if headless else display,
+                             queue_size=queue_size)
+        runtime.on_step = finish_step
+        runtime.on_stage = observe_stage
+
+        # Slow outputs drop frames instead of delaying the pen
+        for number, output in enumerate(outputs):
+            runtime.add_output("output {}".format(number), output.write)
+        runtime.run()
+
+    for stage in runtime.stages.values():
+        print(stage)
+
+    # Make a backup and keep the journal for recovery, if the camera failed
+    if runtime.capture_failed and player is None:
+        print("Could not read correctly from open cameras!")
+        backup_screen()
+        print("Backup for whiteboard has been made!")
+        board.close()
+
+    runtime = None
+
+
+def run_multi():
+    """ Run several cameras with a capture thread and hand tracker each on the shared whiteboard """
+    with contextlib.ExitStack() as stack:
+        track_funcs = []
+        for _ in cams:
+            hands = stack.enter_context(create_tracker())
+            track_funcs.append(lambda frame, hands=hands: track(frame, hands))
+
+        cameras = mc.MultiCamera(board, cams, track_funcs, camera_layout)
+        cameras.start()
+        try:
+            while not cameras.finished and not exit_program:
+                items = cameras.poll()
+                if not items:
+                    continue
+
+                # Execute the gestures of all cameras and compose the whiteboard screen with the first camera
+                screen = cameras.step(items)
+
+                # Only the first camera is recorded
+                for source, timestamp, raw_frame, _, _, results in items:
+                    if source == 0:
+                        record_step(timestamp, raw_frame, results, board)
+
+                show_window(screen)
+                update_quality(min(item[1] for item in items))
+                frame_composed()
+        finally:
+            cameras.close()
+        print(cameras)
+
+    # Make a backup and keep the journal for recovery, if a camera failed
+    if cameras.failed:
+        print("Could not read correctly from open cameras!")
+        backup_screen()
+        print("Backup for whiteboard has been made!")
+        board.close()
+
+
+def wait_idle(delay=0):
+    """ Wait until the next hand detection of the idle state, window events are still handled
+
+    Keyword arguments:
+        delay   - milliseconds to wait
+    """
+    if headless:
+        time.sleep(delay / 1000)
+    else:
+        display(None, delay)
 
 
 def run():
@@ -767,161 +902,221 @@ def run():
     Calculate the 21 hand coordinates for tracking.
     Also manage settings for different user webcam input.
     """
-    global cam
-    global color
-    global color_label
-    global first_color_change
-    global first_draw
-    global first_in_zoom
-    global first_save
-    global first_zoom
-    global in_zoom
-    global kernel_filter
-    global mp_drawing
-    global mp_drawing_styles
-    global mp_hands
-    global off_height
-    global off_width
-    global scale
-    global w_screen
-    global w_screen_before_zoomed
-    global zoom_factor
-
-    with mp_hands.Hands(
-            max_num_hands=2,
-            model_complexity=0,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-    ) as hands:
+    global screen_changed
+
+    # A recording is always played completely
+    monitor = il.IdleMonitor(idle_after if player is None else 0)
+
+    # Capture, color conversion and preview buffers reused from frame to frame
+    pool = bf.BufferPool()
+    if accounting is not None:
+        accounting.register("frames", pool)
+
+    with create_tracker() as hands:
         # If capture device has been initialized successfully and exit key "q" has not been pressed
         while cam.isOpened() and not exit_program:
-            # Read from the camera
-            success, frame = cam.read()
+            # Read from the camera into the frame of the last iteration
+            start = time.perf_counter()
+            success, frame = pool.read("capture", cam)
+            timestamp = time.time()
+            captured = time.perf_counter()
+            raw_frame = frame
+
+            # End of the played recording
+            if not success and player is not None:
+                break
 
             # Make a backup
             if not success:
                 print("Could not read correctly from open cameras!")
                 backup_screen()
                 print("Backup for whiteboard has been made!")
+
+                # Keep the journal for recovery on the next start
+                board.close()
                 break
 
-            # Convert to RGB
-            frame = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
-
-            # Get hand landmarks of current frame
-            results = hands.process(frame)
-            gesture = "unknown"
-            scaled_index_tip = None
-
-            if results.multi_hand_landmarks:
-                # Array for hand landmarks
-                landmarks = []
-                for hand_landmarks in results.multi_hand_landmarks:
-                    for lm in hand_landmarks.landmark:
-                        # Adjust hand gesture coordinates to absolute frame values instead of a value between 0 and 1
-                        lmx = int(lm.x * cam_width)
-                        lmy = int(lm.y * cam_height)
-                        landmarks.append([lmx, lmy])
-
-                    # Draw the connections between the landmarks
-                    mp_drawing.draw_landmarks(
-                        frame,
-                        hand_landmarks,
-                        mp_hands.HAND_CONNECTIONS,
-                        mp_drawing_styles.get_default_hand_landmarks_style(),
-                        mp_drawing_styles.get_default_hand_connections_style()
-                    )
-
-                # Rearrange the order of the hand landmarks
-                landmarks = determine_right_left(landmarks)
-
-                # Set index fingertip position
-                index_tip = landmarks[8]
-
-                # Scale index fingertip position according to the scaling factor
-                scaled_index_tip = [round(a * b) for a, b in zip(index_tip, scale)]
-
-                # Check gesture
-                gesture = check_user_gesture(landmarks)
-
-                # Filter function according to gesture calculation output
-                if gesture == "switch color":
-                    switch_color()
-                else:
-                    first_color_change = True
-
-                if gesture == "draw":
-                    draw(scaled_index_tip, color, 2)
-                elif gesture == "erase":
-                    draw(scaled_index_tip, WHITE, 20)
-                else:
-                    first_draw = True
-
-                if gesture == "zoom":
-                    if in_zoom:
-                        # Check if the user has edited the displayed whiteboard screen
-                        w_shown = cv.resize(
-                            w_screen,
-                            (whiteboard_width - off_width * 2, whiteboard_height - off_height * 2)
-                        )
-                        w_saved = w_screen_before_zoomed[
-                                  off_height:whiteboard_height - off_height,
-                                  off_width:whiteboard_width - off_width
-                                  ]
-
-                        # Whiteboard screen has been edited
-                        if not np.array_equal(w_shown, w_saved):
-                            w_screen_tmp = copy.deepcopy(
-                                cv.resize(
-                                    w_screen,
-                                    (whiteboard_width - int(off_width * 2), whiteboard_height - int(off_height * 2))
-                                )
-                            )
-                            w_screen_before_zoomed[
-                                off_height:whiteboard_height - off_height,
-                                off_width:whiteboard_width - off_width
-                            ] = copy.deepcopy(w_screen_tmp)
-
-                            # Put a sharpening (and smoothen) filter on the image
-                            if kernel_filter:
-                                kernel_filter = False
-
-                                # Sharpen the image
-                                w_screen_before_zoomed = copy.deepcopy(
-                                    cv.filter2D(src=w_screen_before_zoomed, ddepth=-1, kernel=kernel_s)
-                                )
-
-                                # Smoothen image
-                                # # Gaussian blur the image
-                                # w_screen_before_zoomed = copy.deepcopy(
-                                #     cv.filter2D(src=w_screen_before_zoomed, ddepth=-1, kernel=kernel_gb)
-                                # )
-
-                    # Execute the image zoom
-                    zoom(landmarks)
-                else:
-                    # Reset flags for certain scenarios
-                    first_zoom = True
-                    first_in_zoom = True
-                    if zoom_factor != 100:
-                        in_zoom = True
-                    else:
-                        kernel_filter = True
-
-            # Show the whiteboard screen, camera and all extensions in the main window
-            show_window(frame, scaled_index_tip, gesture, color_label)
-
-            # Restore the whiteboard screen after editing with different layers
-            restore_screen()
+            # Get hand landmarks of current frame, only the tracker gets a downscaled frame in the idle state
+            frame, landmarks, results = track(frame, hands, pool, monitor.prepare(frame))
+            state_changed = monitor.update(bool(landmarks))
+            tracked = time.perf_counter()
+
+            # Without hands, the idle whiteboard screen is only composed again if it changes
+            if monitor.idle and not state_changed and not screen_changed and not board.has_pending():
+                wait_idle(monitor.delay())
+                continue
+            screen_changed = False
+
+            # Execute the gesture and compose the whiteboard screen, camera and all extensions
+            screen = board.step(frame, landmarks)
+            composed = time.perf_counter()
+
+            # Record the raw frame together with the tracking results
+            record_step(timestamp, raw_frame, results, board)
+
+            # Show the whiteboard screen in the main window
+            show_window(screen)
+
+            observe_stage("capture", captured - start)
+            observe_stage("inference", tracked - captured)
+            observe_stage("compose", composed - tracked)
+            observe_stage("display", time.perf_counter() - composed)
+
+            # Adjust the quality to the measured frame time, the idle state runs at a reduced rate anyway
+            if monitor.idle:
+                wait_idle(monitor.delay())
+            else:
+                update_quality(timestamp)
+            frame_composed()
+
+    print(monitor)
 
 
 ###################################################################################################
 # MAIN FUNCTION                                                                                   #
 ###################################################################################################
+def parse_arguments():
+    """ Parse the command line and the profile, and set up recording or playback """
+    global BUTTON_SIZE
+    global SCALED_CAM
+    global cam_height
+    global cam_width
+    global capture_fps
+    global player
+    global profile
+    global queue_size
+    global start_level
+    global tracker_backend
+    global recorder
+    global camera_devices
+    global camera_layout
+    global collab_port
+    global idle_after
+    global max_skip
+    global memory_report
+    global metrics_port
+    global motion_threshold
+    global quality_log
+    global target_fps
+    global headless
+    global stream_port
+    global output_targets
+    global run_mode
+    global whiteboard_height
+    global whiteboard_width
+
+    parser = argparse.ArgumentParser(description="OpenCV-Whiteboard")
+    parser.add_argument("--profile", choices=sorted(pf.PROFILES), default=None,
+                        help="performance profile of the hardware providing the defaults of all settings "
+                             "(default: the profile of the config file or desktop)")
+    parser.add_argument("--config", metavar="PATH", default="",
+                        help="JSON file selecting a profile with \"profile\" and overriding its settings")
+    parser.add_argument("--csi", action="store_true",
+                        help="open the cameras as CSI cameras through a GStreamer pipeline (Jetson)")
+    parser.add_argument("--record", metavar="PATH", help="record frames, landmarks and gestures to a file")
+    parser.add_argument("--replay", metavar="PATH", help="use a recording instead of the camera")
+    parser.add_argument("--replay-speed", choices=[rc.SPEED_ORIGINAL, rc.SPEED_MAX], default=rc.SPEED_ORIGINAL,
+                        help="play the recording at the original speed or as fast as possible")
+    parser.add_argument("--camera", metavar="DEVICE", action="append", default=[],
+                        help="capture device index or video path/URL, can be given several times to draw with "
+                             "several cameras on one whiteboard")
+    parser.add_argument("--camera-layout", choices=[mc.LAYOUT_SHARED, mc.LAYOUT_SPLIT], default=mc.LAYOUT_SHARED,
+                        help="every camera covers the complete whiteboard or a strip of it side by side")
+    parser.add_argument("--tracker", choices=sorted(tr.BACKENDS), default=None,
+                        help="hand tracking backend: the MediaPipe model or colored fingertip markers "
+                             "(green draws, blue erases, magenta switches the color, yellow selects)")
+    parser.add_argument("--target-fps", type=int, default=None,
+                        help="adjust the tracking and preview quality at runtime to hold this frame rate")
+    parser.add_argument("--quality-log", metavar="PATH", default="",
+                        help="append every quality decision as a JSON line to this file")
+    parser.add_argument("--idle-after", type=int, default=None,
+                        help="frames without hands before the idle mode saves power, 0 to stay active")
+    parser.add_argument("--motion-threshold", type=int, default=None,
+                        help="skip the hand tracking of frames changing less than this (0-255), 0 to track all frames")
+    parser.add_argument("--max-skip", type=int, default=None,
+                        help="maximum number of frames skipped in a row by the motion gate")
+    parser.add_argument("--memory-report", metavar="SECONDS", type=float, default=0,
+                        help="report the memory of the canvas and frame buffers and the allocations per frame "
+                             "every number of seconds, 0 for none")
+    parser.add_argument("--metrics-port", metavar="PORT", type=int, default=0,
+                        help="serve runtime metrics in the Prometheus text format on http://localhost:PORT/metrics")
+    parser.add_argument("--runtime", choices=[RUNTIME_SERIAL, RUNTIME_ASYNCIO], default=None,
+                        help="run all stages in one loop or as asyncio tasks")
+    parser.add_argument("--headless", action="store_true", help="render offscreen without a window or monitor")
+    parser.add_argument("--size", type=pf.parse_size, default=None,
+                        help="canvas size of the headless mode, e.g. 1920x1080")
+    parser.add_argument("--output", metavar="TARGET", action="append", default=[],
+                        help="write the whiteboard screen to a video file (.mp4, .avi, ...), an image sequence "
+                             "directory or a shared-memory ring (shm:NAME), can be given several times")
+    parser.add_argument("--collab-port", type=int, default=0,
+                        help="broadcast the strokes to remote viewers on this TCP port")
+    parser.add_argument("--stream-port", type=int, default=0,
+                        help="stream the whiteboard screen to browsers on this HTTP port")
+    args = parser.parse_args()
+
+    # The profile provides the settings not given on the command line
+    try:
+        profile = pf.load_profile(args.profile, args.config)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    profile.csi = profile.csi or args.csi
+    print("Profile: {}".format(profile))
+
+    def given(value=None, default=None):
+        return default if value is None else value
+
+    cam_width = profile.cam_width
+    cam_height = profile.cam_height
+    capture_fps = profile.capture_fps
+    start_level = profile.level
+    SCALED_CAM = qa.LEVELS[start_level].preview_size
+    BUTTON_SIZE = profile.button_size
+    queue_size = profile.queue_size
+    camera_devices = [profile.camera]
+
+    run_mode = given(args.runtime, profile.runtime)
+    tracker_backend = given(args.tracker, profile.tracker)
+    target_fps = given(args.target_fps, profile.target_fps)
+    idle_after = given(args.idle_after, profile.idle_after)
+    motion_threshold = given(args.motion_threshold, profile.motion_threshold)
+    max_skip = given(args.max_skip, profile.max_skip)
+    memory_report = args.memory_report
+    metrics_port = args.metrics_port
+    quality_log = args.quality_log
+    camera_layout = args.camera_layout
+    if args.camera:
+        camera_devices = [int(device) if device.lstrip("-").isdigit() else device for device in args.camera]
+    collab_port = args.collab_port
+    stream_port = args.stream_port
+    headless = args.headless
+    output_targets = args.output
+
+    if headless:
+        whiteboard_width, whiteboard_height = given(args.size, pf.parse_size(profile.size))
+
+    if args.replay:
+        player = rc.Player(args.replay, args.replay_speed)
+    if args.record:
+        recorder = rc.Recorder(args.record)
+
+
 def main():
+    parse_arguments()
+    start_warmup()
     get_screen_resolution()
     setup_windows()
-    run()
+    start_journal()
+    start_collaboration()
+    try:
+        if len(cams) > 1:
+            run_multi()
+        elif run_mode == RUNTIME_ASYNCIO:
+            run_async()
+        else:
+            run()
+    except KeyboardInterrupt:
+        # The regular way to end the headless mode
+        pass
     release_variables()
 
 
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3.9
+
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" OpenCV-Whiteboard batch renderer
+
+Renders the final image, a thumbnail and a time-lapse video of many recordings, session files and journal
+directories in parallel, one worker process per core:
+
+    python3 opencv-whiteboard_batch.py Recordings/ Saves/ --out Rendered [--workers 4] [--formats png svg]
+"""
+
+__author__ = "Lukas Haupt, Stefan Weisbeck"
+__credits__ = ["Lukas Haupt", "Stefan Weisbeck"]
+__version__ = "2.0.0"
+__maintainer__ = "Lukas Haupt"
+__email__ = "luhaupt@uni-osnabrueck.de"
+__status__ = "Production"
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import argparse                         # Command line
+import sys                              # Exit code
+import time                             # Throughput
+
+from whiteboard import batch as ba      # Batch session renderer
+from whiteboard import export as ex     # Export formats
+from whiteboard import profiles as pf   # Canvas size
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def report_progress(done=0, total=0, result=None):
+    """ Print a finished session
+
+    Keyword arguments:
+        done    - number of finished sessions
+        total   - number of sessions
+        result  - result of batch.render_session
+    """
+    width = len(str(total))
+    if "error" in result:
+        print("[{:>{}}/{}] {} failed: {}".format(done, width, total, result["path"], result["error"]))
+        return
+    print("[{:>{}}/{}] {} {}: {} steps, {} files, {:.1f} s".format(
+        done, width, total, result["kind"], result["path"], result["steps"], len(result["files"]), result["seconds"]))
+
+
+###################################################################################################
+# MAIN FUNCTION                                                                                   #
+###################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Render recordings, session files and journals in parallel")
+    parser.add_argument("paths", nargs="+",
+                        help="recordings, session files, journal directories or directories containing them")
+    parser.add_argument("--out", default="Rendered", help="directory of the rendered files")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of cores)")
+    parser.add_argument("--formats", nargs="+", choices=ex.FORMATS, default=["png"],
+                        help="formats of the final image")
+    parser.add_argument("--size", type=pf.parse_size, default="{}x{}".format(*ba.DEFAULT_SIZE),
+                        help="canvas size of recordings")
+    parser.add_argument("--no-thumbnail", action="store_true", help="do not write thumbnails")
+    parser.add_argument("--timelapse-every", type=int, default=ba.TIMELAPSE_EVERY,
+                        help="frames or records per time-lapse frame, 0 for no time-lapse video")
+    parser.add_argument("--timelapse-width", type=int, default=ba.TIMELAPSE_WIDTH, help="width of the time-lapse")
+    args = parser.parse_args()
+
+    paths = ba.find_sessions(args.paths)
+    if not paths:
+        print("No recordings, session files or journals found")
+        return 1
+
+    renderer = ba.BatchRenderer(
+        args.out,
+        args.workers,
+        size=args.size,
+        formats=args.formats,
+        thumbnail=not args.no_thumbnail,
+        timelapse_every=args.timelapse_every,
+        timelapse_width=args.timelapse_width
+    )
+    print("Rendering {} sessions with {} workers to {}".format(len(paths), renderer.workers, args.out))
+
+    start = time.perf_counter()
+    results = renderer.run(paths, report_progress)
+    seconds = time.perf_counter() - start
+
+    failed = sum("error" in result for result in results)
+    steps = sum(result.get("steps", 0) for result in results)
+    print("Rendered {} of {} sessions in {:.1f} s ({:.1f} sessions/min, {:.0f} steps/s)".format(
+        len(results) - failed, len(results), seconds, len(results) / seconds * 60, steps / seconds))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
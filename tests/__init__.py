@@ -0,0 +1,4 @@
+""" OpenCV-Whiteboard tests
+
+Run from the repository root with python -m pytest
+"""
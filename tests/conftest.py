@@ -0,0 +1,14 @@
+""" Shared fixtures of the tests """
+
+import pytest
+
+from tests import scripted as sc
+from whiteboard import engine as en
+
+
+@pytest.fixture
+def board():
+    """ Blank whiteboard engine, closed after the test """
+    board = en.Whiteboard(sc.WIDTH, sc.HEIGHT)
+    yield board
+    board.close()
@@ -0,0 +1,66 @@
+""" Scripted whiteboard sessions for the tests
+
+Hand landmarks come from whiteboard.synthetic, so the tests run without a camera, display or hand tracker.
+"""
+
+import numpy as np                      # Board comparison
+
+from whiteboard import engine as en
+from whiteboard import synthetic as sy
+
+# Resolution of the whiteboard screen, the button layout needs at least the height of the camera preview
+WIDTH = 1920
+HEIGHT = 1080
+
+
+def play(board=None, script=None):
+    """ Step a whiteboard through a script of (gesture, landmarks) frames
+
+    Keyword arguments:
+        board   - whiteboard engine
+        script  - list of (gesture, landmarks) per frame, landmarks may be None
+    """
+    source = sy.SyntheticSource(script or [("unknown", None)])
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        board.step(frame, source.landmarks)
+
+
+def scribble(board=None, count=40, seed=0):
+    """ Draw a handwriting-like stroke on a whiteboard
+
+    Keyword arguments:
+        board   - whiteboard engine
+        count   - number of positions of the stroke
+        seed    - random seed
+    """
+    play(board, sy.stroke_script(sy.scribble_points(en.CAM_WIDTH, en.CAM_HEIGHT, count, seed)))
+
+
+def switch_color(board=None):
+    """ Switch to the next color with the SWITCH COLOR gesture
+
+    Keyword arguments:
+        board   - whiteboard engine
+    """
+    play(board, [("switch color", sy.hand_landmarks("switch color"))] * 3 + [("unknown", None)])
+
+
+def zoom_in(board=None):
+    """ Zoom into a whiteboard with a spreading ZOOM gesture
+
+    Keyword arguments:
+        board   - whiteboard engine
+    """
+    play(board, sy.pinch_script(steps=15))
+
+
+def ink(image=None):
+    """ Count the pixels of an image that are not white
+
+    Keyword arguments:
+        image   - BGR image
+    """
+    return int(np.count_nonzero((image != 255).any(axis=2)))
@@ -0,0 +1,64 @@
+""" Collaboration delta protocol """
+
+import time                             # Waiting for the viewers
+
+import numpy as np                      # Board comparison
+
+from tests import scripted as sc
+from whiteboard import collab as co
+
+
+def wait_for(client=None, server=None, timeout=10):
+    """ Wait until a client has received hello, keyframe and every message broadcast by a server since then
+
+    Keyword arguments:
+        client  - collaboration client connected before the first broadcast
+        server  - collaboration server
+        timeout - maximum number of seconds to wait
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline and client.messages < server.messages + 2:
+        time.sleep(0.01)
+
+
+def test_client_follows_board(board):
+    server = co.CollaborationServer(board, "127.0.0.1", 0)
+    client = co.CollaborationClient("127.0.0.1", server.port)
+    try:
+        sc.scribble(board)
+        sc.switch_color(board)
+        sc.scribble(board, seed=1)
+        wait_for(client, server)
+        assert sc.ink(board.board())
+        assert np.array_equal(client.snapshot(), board.board())
+        assert client.color_key == board.pen.color_key == 1
+
+        # Zooming is sent as a view change, the board of the viewers stays unzoomed
+        sc.zoom_in(board)
+        wait_for(client, server)
+        assert client.zoom == (board.zoom_factor, board.off_width, board.off_height)
+
+        board.clear()
+        sc.play(board)
+        wait_for(client, server)
+        assert not sc.ink(client.snapshot())
+    finally:
+        server.close()
+        client.close()
+
+
+def test_late_client_gets_keyframe(board):
+    server = co.CollaborationServer(board, "127.0.0.1", 0)
+    try:
+        sc.scribble(board)
+        client = co.CollaborationClient("127.0.0.1", server.port)
+
+        # Hello, keyframe and the delta tail since the keyframe arrive as one block
+        deadline = time.perf_counter() + 10
+        while time.perf_counter() < deadline and not np.array_equal(client.snapshot(), board.board()):
+            time.sleep(0.01)
+        assert sc.ink(board.board())
+        assert np.array_equal(client.snapshot(), board.board())
+        client.close()
+    finally:
+        server.close()
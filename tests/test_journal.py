@@ -0,0 +1,47 @@
+""" Crash recovery from the journal """
+
+import numpy as np                      # Board comparison
+
+from tests import scripted as sc
+from whiteboard import engine as en
+from whiteboard import journal as jn
+
+
+def test_recover_without_journal(tmp_path):
+    assert jn.recover(str(tmp_path / "missing"), sc.WIDTH, sc.HEIGHT) == (None, 0, None)
+
+
+def test_recover_matches_board(board, tmp_path):
+    path = str(tmp_path / "journal")
+    assert not board.start_journal(path)
+
+    sc.scribble(board)
+    sc.switch_color(board)
+    sc.scribble(board, seed=1)
+    expected = board.board().copy()
+    board.close()
+
+    recovered, generation, color_key = jn.recover(path, sc.WIDTH, sc.HEIGHT)
+    assert sc.ink(expected)
+    assert np.array_equal(recovered, expected)
+    assert generation == 1
+    assert color_key == board.pen.color_key == 1
+
+
+def test_restart_continues_journal(board, tmp_path):
+    path = str(tmp_path / "journal")
+    board.start_journal(path)
+    sc.scribble(board)
+    board.close()
+    _, first_generation, _ = jn.recover(path, sc.WIDTH, sc.HEIGHT)
+
+    # A restart restores the board, checkpoints it and records the next strokes in a new generation
+    restarted = en.Whiteboard(sc.WIDTH, sc.HEIGHT)
+    assert restarted.start_journal(path)
+    sc.scribble(restarted, seed=1)
+    expected = restarted.board().copy()
+    restarted.close()
+
+    recovered, generation, _ = jn.recover(path, sc.WIDTH, sc.HEIGHT)
+    assert np.array_equal(recovered, expected)
+    assert generation > first_generation
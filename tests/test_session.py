@@ -0,0 +1,94 @@
+""" Session file round trips """
+
+import cv2 as cv                        # Image files, thumbnails
+import numpy as np                      # Board comparison
+
+from tests import scripted as sc
+from whiteboard import engine as en
+from whiteboard import gallery as ga
+from whiteboard import session as ss
+
+
+def read_session(path=""):
+    """ Open a session file and return the reader
+
+    Keyword arguments:
+        path    - session file path
+    """
+    assert ss.is_session_file(path)
+    return ss.SessionReader(path)
+
+
+def test_raster_round_trip(board, tmp_path):
+    sc.scribble(board)
+    board.set_color(1)
+    path = str(tmp_path / "board.wbs")
+    board.save_session(path)
+
+    session = read_session(path)
+    expected = board.board()
+    assert (session.width, session.height) == (sc.WIDTH, sc.HEIGHT)
+    assert session.has_raster
+    assert session.color_key == 1
+    assert session.palette == [[label, tuple(col)] for label, col in board.color_options]
+    assert session.stroke_bytes() == bytes(board.strokes)
+    assert np.array_equal(session.board(), expected)
+
+    # Regions crossing tile edges are assembled from the overlapping tiles only
+    x, y, width, height = 100, 50, ss.TILE_SIZE + 37, ss.TILE_SIZE * 2 + 5
+    assert np.array_equal(session.region(x, y, width, height), expected[y:y + height, x:x + width])
+    session.close()
+
+
+def test_stroke_round_trip(board, tmp_path):
+    sc.scribble(board)
+    path = str(tmp_path / "strokes.wbs")
+    ss.write_session(path, raster=False, **board.session_state())
+
+    session = read_session(path)
+    expected = board.board()
+    assert not session.has_raster
+    assert np.array_equal(session.board(), expected)
+    assert np.array_equal(session.region(300, 200, 400, 300), expected[200:500, 300:700])
+    session.close()
+
+
+def test_thumbnail_is_mirrored_like_saved_images(board, tmp_path):
+    # Ink on one side only tells a mirrored thumbnail from an unmirrored one, the board is stored unmirrored
+    sc.scribble(board)
+    half = sc.WIDTH // 2
+    assert sc.ink(board.board()[:, half:]) and not sc.ink(board.board()[:, :half])
+
+    session_path = str(tmp_path / "board.wbs")
+    image_path = str(tmp_path / "board.png")
+    board.save_session(session_path)
+    cv.imwrite(image_path, board.snapshot())
+
+    from_session = ga.make_thumbnail(session_path)
+    from_image = ga.make_thumbnail(image_path)
+    assert from_session.shape == from_image.shape
+    middle = from_session.shape[1] // 2
+    assert sc.ink(from_image[:, :middle]) and not sc.ink(from_image[:, middle:])
+    assert sc.ink(from_session[:, :middle]) and not sc.ink(from_session[:, middle:])
+
+
+def test_zoomed_session_keeps_zoomed_edits(board, tmp_path):
+    sc.scribble(board)
+    sc.zoom_in(board)
+    assert board.zoom_factor < 100
+    sc.scribble(board, seed=3)
+
+    # The strokes drawn while zoomed are not merged into the unzoomed screen yet
+    expected = board.complete_board()
+    assert sc.ink(expected) > sc.ink(board.board())
+
+    path = str(tmp_path / "zoomed.wbs")
+    board.save_session(path)
+
+    loaded = en.Whiteboard(sc.WIDTH, sc.HEIGHT)
+    loaded.load_file(path)
+    sc.play(loaded)
+    assert loaded.zoom_factor == board.zoom_factor
+    assert (loaded.off_width, loaded.off_height) == (board.off_width, board.off_height)
+    assert np.array_equal(loaded.board(), expected)
+    loaded.close()
@@ -0,0 +1,4 @@
+""" OpenCV-Whiteboard support package
+
+Modules used by the whiteboard front-ends (opencv-whiteboard.py, opencv-whiteboard_jetson.py).
+"""
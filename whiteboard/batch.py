@@ -0,0 +1,326 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Batch session renderer
+
+Renders final images, thumbnails and time-lapse videos of many sessions without window, camera or hand
+tracker. Every session is rendered by one worker process of a pool, so the throughput grows with the number
+of cores. Three kinds of sessions are replayed:
+
+    recording   - recorded frames and landmarks (recorder.py), stepped through a whiteboard engine, so the
+                  drawing and zoom logic is the same as in the live session
+    session     - session file (.wbs), its strokes are replayed for the time-lapse
+    journal     - journal directory, the records of all generations are replayed from the earliest checkpoint
+
+The final image is encoded by the export pipeline (raster or vector formats) and mirrored like a saved
+whiteboard screen. A time-lapse frame is written every few steps (frames or records).
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import concurrent.futures as cf         # Process pool
+import multiprocessing as mp            # Process start method
+import os                               # Filesystem
+import time                             # Rendering time
+
+import cv2 as cv                        # Image processing
+import numpy as np                      # Blank boards
+
+from whiteboard import buffers as bf    # Time-lapse frame buffer
+from whiteboard import engine as en     # Drawing and zoom logic
+from whiteboard import export as ex     # Final image encoding
+from whiteboard import gallery as gl    # Thumbnails
+from whiteboard import gestures as gs   # Landmark conversion
+from whiteboard import journal as jn    # Stroke records
+from whiteboard import output as op     # Video files
+from whiteboard import recorder as rc   # Recordings
+from whiteboard import session as ss    # Session files
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+KIND_RECORDING = "recording"
+KIND_SESSION = "session"
+KIND_JOURNAL = "journal"
+
+# Canvas size of replayed recordings
+DEFAULT_SIZE = (1920, 1080)
+
+# Steps (frames or records) per time-lapse frame, and the width of the time-lapse video
+TIMELAPSE_EVERY = 4
+TIMELAPSE_WIDTH = 1280
+TIMELAPSE_EXTENSION = ".mp4"
+
+THUMB_SUFFIX = "_thumb.png"
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def session_kind(path=""):
+    """ Get the kind of session stored at a path, None if it is none
+
+    Keyword arguments:
+        path    - recording, session file or journal directory
+    """
+    if os.path.isdir(path):
+        return KIND_JOURNAL if jn.list_generations(path, jn.JOURNAL_PREFIX) else None
+    if ss.is_session_file(path):
+        return KIND_SESSION
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(len(rc.RECORDING_MAGIC))
+    except OSError:
+        return None
+    return KIND_RECORDING if magic == rc.RECORDING_MAGIC else None
+
+
+def find_sessions(paths=None):
+    """ Get the sessions of a list of paths, directories without journal are searched recursively
+
+    Keyword arguments:
+        paths   - recordings, session files, journal directories or directories containing them
+    """
+    sessions = []
+    for path in paths:
+        if not os.path.isdir(path) or session_kind(path) is not None:
+            sessions.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if session_kind(root) is not None:
+                sessions.append(root)
+                dirs.clear()
+                continue
+            sessions += [os.path.join(root, name) for name in sorted(files)
+                         if session_kind(os.path.join(root, name)) is not None]
+    return sessions
+
+
+def output_name(path=""):
+    """ Get the base name of the outputs of a session
+
+    Keyword arguments:
+        path    - recording, session file or journal directory
+    """
+    return os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+
+
+def replay_recording(path="", size=DEFAULT_SIZE):
+    """ Step a whiteboard engine through a recording, yields (board, strokes) after every frame
+
+    Keyword arguments:
+        path    - recording file path
+        size    - (width, height) of the canvas
+    """
+    player = rc.Player(path, rc.SPEED_MAX)
+    board = None
+    try:
+        while True:
+            success, frame = player.read()
+            if not success:
+                break
+            if board is None:
+                board = en.Whiteboard(size[0], size[1], frame.shape[1], frame.shape[0])
+            landmarks = gs.landmarks_from_results(player.process(frame), board.cam_width, board.cam_height)
+            board.step(frame, landmarks)
+
+            # While zoomed, the edits are only part of the displayed whiteboard screen
+            yield board.board() if board.zoom_factor == 100 else board.complete_board(), board.strokes
+    finally:
+        player.close()
+        if board is not None:
+            board.close()
+
+
+def replay_session(path=""):
+    """ Replay the strokes of a session file, yields (board, strokes) after every stroke and the stored board
+    at the end
+
+    Keyword arguments:
+        path    - session file path
+    """
+    session = ss.SessionReader(path)
+    try:
+        strokes = session.stroke_bytes()
+        board = np.full((session.height, session.width, session.channels), ss.WHITE, np.uint8)
+        for code, payload in jn.iter_records(strokes):
+            yield jn.apply_record(board, code, payload), strokes
+
+        # A loaded background image is only part of the raster tiles
+        yield session.board(), strokes
+    finally:
+        session.close()
+
+
+def replay_journal(directory=""):
+    """ Replay all journal generations from the earliest checkpoint, yields (board, strokes) after every record
+
+    Keyword arguments:
+        directory   - journal directory
+    """
+    journals = jn.list_generations(directory, jn.JOURNAL_PREFIX)
+    checkpoints = [gen for gen in jn.list_generations(directory, jn.CHECKPOINT_PREFIX) if gen <= journals[0]]
+
+    board = None
+    for gen in reversed(checkpoints):
+        board = cv.imread(jn.checkpoint_path(directory, gen))
+        if board is not None:
+            break
+
+    strokes = bytearray()
+    for gen in journals:
+        with open(jn.journal_path(directory, gen), "rb") as f:
+            data = f.read()
+        if len(data) < jn.HEADER.size:
+            continue
+        magic, _, width, height = jn.HEADER.unpack_from(data, 0)
+        if magic != jn.JOURNAL_MAGIC:
+            continue
+        if board is None:
+            board = np.full((height, width, 3), jn.WHITE, np.uint8)
+
+        # Map the recorded coordinates onto the board like journal.recover
+        sx = board.shape[1] / width if width else 1
+        sy = board.shape[0] / height if height else 1
+
+        for code, payload in jn.iter_records(memoryview(data)[jn.HEADER.size:]):
+            if code == jn.OP_COLOR:
+                continue
+            if code in (jn.OP_DRAW, jn.OP_ERASE):
+                (x1, y1), (x2, y2), col, thickness = payload
+                payload = ((round(x1 * sx), round(y1 * sy)), (round(x2 * sx), round(y2 * sy)), col,
+                           max(1, round(thickness * sx)))
+                strokes += jn.pack_segment(code, *payload)
+            elif code in (jn.OP_CLEAR, jn.OP_LOAD):
+                strokes.clear()
+            board = jn.apply_record(board, code, payload, en.read_board_image)
+            yield board, strokes
+
+
+def replay(path="", size=DEFAULT_SIZE):
+    """ Replay a session of any kind, yields (board, strokes) after every step
+
+    Keyword arguments:
+        path    - recording, session file or journal directory
+        size    - (width, height) of the canvas of recordings
+    """
+    kind = session_kind(path)
+    if kind == KIND_RECORDING:
+        return replay_recording(path, size)
+    if kind == KIND_SESSION:
+        return replay_session(path)
+    if kind == KIND_JOURNAL:
+        return replay_journal(path)
+    raise ValueError("Not a recording, session file or journal directory: " + path)
+
+
+def render_session(path="", out_dir="", size=DEFAULT_SIZE, formats=("png",), thumbnail=True,
+                   timelapse_every=TIMELAPSE_EVERY, timelapse_width=TIMELAPSE_WIDTH, fps=op.VIDEO_FPS):
+    """ Render the outputs of a session, executed in a worker process
+
+    Returns a dictionary with the path, kind, steps, written files and the rendering time.
+
+    Keyword arguments:
+        path            - recording, session file or journal directory
+        out_dir         - directory of the outputs
+        size            - (width, height) of the canvas of recordings
+        formats         - export formats of the final image, see export.FORMATS
+        thumbnail       - write a thumbnail of the final image
+        timelapse_every - steps per time-lapse frame, 0 for no time-lapse video
+        timelapse_width - width of the time-lapse video
+        fps             - frame rate of the time-lapse video
+    """
+    # One thread per worker, the pool provides the parallelism
+    cv.setNumThreads(1)
+    start = time.perf_counter()
+    base = os.path.join(out_dir, output_name(path))
+
+    buffers = bf.BufferPool()
+    video = None
+    video_size = None
+    steps = 0
+    board = None
+    strokes = b""
+    try:
+        for board, strokes in replay(path, size):
+            steps += 1
+            if not timelapse_every or (steps - 1) % timelapse_every:
+                continue
+            if video is None:
+                width = min(timelapse_width, board.shape[1]) // 2 * 2
+                video_size = (width, round(board.shape[0] * width / board.shape[1]) // 2 * 2)
+                video = op.VideoOutput(base + TIMELAPSE_EXTENSION, *video_size, fps)
+            frame = cv.resize(board, video_size, dst=buffers.get("timelapse", video_size[::-1] + (3,)),
+                              interpolation=cv.INTER_AREA)
+            video.write(0, cv.flip(frame, 1, dst=buffers.like("mirrored", frame)))
+
+        if board is None:
+            raise ValueError("Empty session: " + path)
+
+        # The final image is mirrored like a saved whiteboard screen
+        image = cv.flip(board, 1)
+        files = [ex.export_job(base + "." + fmt, fmt, image, bytes(strokes), ex.DEFAULT_LEVELS.get(fmt),
+                               (image.shape[1], image.shape[0]))[0] for fmt in formats]
+        if thumbnail:
+            cv.imwrite(base + THUMB_SUFFIX, gl.fit_thumbnail(image))
+            files.append(base + THUMB_SUFFIX)
+    finally:
+        if video is not None:
+            video.close()
+    if video is not None:
+        files.append(video.path)
+
+    return {"path": path, "kind": session_kind(path), "steps": steps, "files": files,
+            "seconds": time.perf_counter() - start}
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class BatchRenderer:
+    """ Process pool rendering many sessions, one session per job """
+
+    def __init__(self, out_dir="", workers=None, **options):
+        """ Configure the renderer
+
+        Keyword arguments:
+            out_dir - directory of the outputs
+            workers - number of worker processes, None for the number of CPUs
+            options - further arguments of render_session
+        """
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count()
+        self.options = options
+
+    def run(self, paths=None, on_done=None):
+        """ Render sessions and return their results in the order they finished
+
+        Keyword arguments:
+            paths   - sessions, see find_sessions
+            on_done - called with (number of finished sessions, number of sessions, result) after every session,
+                      the result holds an "error" instead of "files" if the session failed
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        results = []
+
+        # Spawned workers start without the state of the main process
+        with cf.ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = {pool.submit(render_session, path, self.out_dir, **self.options): path for path in paths}
+            for future in cf.as_completed(futures):
+                try:
+                    result = future.result()
+                except (OSError, ValueError, cv.error) as e:
+                    result = {"path": futures[future], "error": str(e)}
+                results.append(result)
+                if on_done is not None:
+                    on_done(len(results), len(paths), result)
+        return results
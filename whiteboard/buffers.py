@@ -0,0 +1,118 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Buffer pool
+
+Named arrays reused from frame to frame. The hot path passes them as dst= to the OpenCV calls (color
+conversion, flip, resize, filters) instead of allocating a new array per call, so a steady-state frame does
+not allocate any large array. A buffer is only allocated again, if the requested shape or type changes.
+Rings hand out several buffers in turn for results other threads still read while the next one is written.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import numpy as np                      # Buffers
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class BufferPool:
+    """ Named arrays reused from frame to frame, not thread-safe """
+
+    def __init__(self):
+        # Name -> array, the buffers of a ring are named "<name> <index>"
+        self.buffers = {}
+        self.allocations = 0
+
+        self._rings = {}
+
+    def get(self, name="", shape=None, dtype=np.uint8):
+        """ Get the buffer of a name, allocated on the first request and whenever the shape or type changes
+
+        The content is undefined, the buffer has to be written completely (e.g. as dst= of an OpenCV call).
+
+        Keyword arguments:
+            name    - name of the buffer
+            shape   - shape of the buffer
+            dtype   - type of the buffer
+        """
+        shape = tuple(shape)
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype)
+            self.buffers[name] = buffer
+            self.allocations += 1
+        return buffer
+
+    def like(self, name="", array=None):
+        """ Get the buffer of a name with shape and type of an array
+
+        Keyword arguments:
+            name    - name of the buffer
+            array   - array giving shape and type
+        """
+        return self.get(name, array.shape, array.dtype)
+
+    def copy(self, name="", array=None):
+        """ Copy an array into the buffer of a name and return the buffer
+
+        Keyword arguments:
+            name    - name of the buffer
+            array   - array to copy
+        """
+        buffer = self.like(name, array)
+        np.copyto(buffer, array)
+        return buffer
+
+    def read(self, name="", source=None):
+        """ Read a frame of a capture device into the buffer of a name like source.read(), which reuses the
+        buffer as long as the frame size does not change
+
+        Keyword arguments:
+            name    - name of the buffer
+            source  - capture device with read(image)
+        """
+        buffer = self.buffers.get(name)
+        success, frame = source.read(buffer)
+        if success and frame is not None and frame is not buffer:
+            self.buffers[name] = frame
+            self.allocations += 1
+        return success, frame
+
+    def ring(self, name="", shape=None, count=1, dtype=np.uint8):
+        """ Get the next buffer of a ring of buffers used in turn
+
+        A buffer returned by a ring stays untouched for the next count - 1 calls.
+
+        Keyword arguments:
+            name    - name of the ring
+            shape   - shape of the buffers
+            count   - number of buffers of the ring
+            dtype   - type of the buffers
+        """
+        index = (self._rings.get(name, -1) + 1) % max(1, count)
+        self._rings[name] = index
+        return self.get("{} {}".format(name, index), shape, dtype)
+
+    def release(self, name=""):
+        """ Free a buffer or all buffers of a ring
+
+        Keyword arguments:
+            name    - name of the buffer or the ring
+        """
+        self.buffers.pop(name, None)
+        if name in self._rings:
+            del self._rings[name]
+            prefix = name + " "
+            for key in [key for key in self.buffers if key.startswith(prefix)]:
+                del self.buffers[key]
+
+    def memory_buffers(self):
+        """ Get a dictionary name -> buffer of all pooled buffers, see memory.py """
+        return dict(self.buffers)
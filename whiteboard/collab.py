@@ -0,0 +1,551 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Live collaboration
+
+A TCP server broadcasts the changes of a whiteboard as a compact binary delta stream, so the bandwidth
+scales with the drawing activity instead of the screen resolution. Every message is encoded once and
+queued for all viewers. Late joiners receive the latest keyframe (PNG snapshot of the board) followed by
+the deltas since that keyframe. Viewers whose queue overflows are disconnected and resynchronize by
+reconnecting.
+
+Messages start with a one byte type, the payload size is fixed per type (coordinates are board coordinates,
+unzoomed and unmirrored):
+
+    MSG_HELLO           - version, board width, board height
+    MSG_SNAPSHOT        - length (uint32) + PNG encoded board
+    MSG_STROKE_BEGIN    - op (draw/erase), b, g, r, thickness, x, y
+    MSG_STROKE_APPEND   - x, y
+    MSG_STROKE_END      -
+    MSG_CLEAR           -
+    MSG_COLOR           - color key, b, g, r
+    MSG_ZOOM            - zoom factor, x-offset, y-offset
+
+The module also contains the reference client:
+
+    python -m whiteboard.collab HOST:PORT [--save board.png]
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import argparse                         # Reference client command line
+import queue                            # Per viewer send queues
+import socket                           # TCP
+import struct                           # Binary messages
+import threading                        # Accept and send threads
+
+import cv2 as cv                        # Snapshot encoding and drawing
+import numpy as np                      # Boards
+
+from whiteboard import journal as jn    # Stroke records
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 5151
+
+MSG_HELLO = 1
+MSG_SNAPSHOT = 2
+MSG_STROKE_BEGIN = 3
+MSG_STROKE_APPEND = 4
+MSG_STROKE_END = 5
+MSG_CLEAR = 6
+MSG_COLOR = 7
+MSG_ZOOM = 8
+
+PAYLOADS = {
+    MSG_HELLO: struct.Struct("<HHH"),
+    MSG_SNAPSHOT: struct.Struct("<I"),
+    MSG_STROKE_BEGIN: struct.Struct("<B3BBhh"),
+    MSG_STROKE_APPEND: struct.Struct("<hh"),
+    MSG_STROKE_END: struct.Struct("<"),
+    MSG_CLEAR: struct.Struct("<"),
+    MSG_COLOR: struct.Struct("<B3B"),
+    MSG_ZOOM: struct.Struct("<BHH")
+}
+
+WHITE = (255, 255, 255)
+
+# A new keyframe is taken at the end of a stroke, once the delta tail exceeds this size
+KEYFRAME_BYTES = 256 * 1024
+SNAPSHOT_PARAMS = [cv.IMWRITE_PNG_COMPRESSION, 1]
+
+# Messages waiting for a viewer before it is disconnected
+MAX_PENDING_MESSAGES = 4096
+
+# Messages sent with one system call
+SEND_BATCH = 256
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def pack_message(msg=0, *values):
+    """ Encode a message of fixed payload size
+
+    Keyword arguments:
+        msg     - message type
+        values  - payload values
+    """
+    return bytes((msg,)) + PAYLOADS[msg].pack(*values)
+
+
+def pack_snapshot(board=None):
+    """ Encode a board as snapshot message
+
+    Keyword arguments:
+        board   - unmirrored board image
+    """
+    data = cv.imencode(".png", board, SNAPSHOT_PARAMS)[1].tobytes()
+    return bytes((MSG_SNAPSHOT,)) + PAYLOADS[MSG_SNAPSHOT].pack(len(data)) + data
+
+
+def recv_exactly(sock=None, size=0):
+    """ Receive a number of bytes, None if the connection has been closed
+
+    Keyword arguments:
+        sock    - connected socket
+        size    - number of bytes
+    """
+    parts = []
+    while size:
+        data = sock.recv(min(size, 1 << 20))
+        if not data:
+            return None
+        parts.append(data)
+        size -= len(data)
+    return b"".join(parts)
+
+
+def read_message(sock=None):
+    """ Receive the next message as tuple (type, values, data), None if the connection has been closed
+
+    Keyword arguments:
+        sock    - connected socket
+    """
+    head = recv_exactly(sock, 1)
+    if head is None:
+        return None
+
+    msg = head[0]
+    payload = PAYLOADS.get(msg)
+    if payload is None:
+        raise ValueError("Unknown message type: " + str(msg))
+
+    values = payload.unpack(recv_exactly(sock, payload.size) or b"") if payload.size else ()
+    data = b""
+    if msg == MSG_SNAPSHOT:
+        data = recv_exactly(sock, values[0])
+        if data is None:
+            return None
+    return msg, values, data
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Viewer:
+    """ Connection of a single viewer with its send thread """
+
+    def __init__(self, sock=None, address=None, server=None):
+        self.sock = sock
+        self.address = address
+        self.server = server
+        self.queue = queue.Queue(MAX_PENDING_MESSAGES)
+        self.bytes_sent = 0
+        self.closed = False
+        self._thread = threading.Thread(target=self._sender, name="collab-viewer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def send(self, message=b""):
+        """ Queue a message, returns False if the viewer cannot keep up
+
+        Keyword arguments:
+            message - encoded message
+        """
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            # The sender ends with the failing send on the closed socket
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _sender(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+
+            # Combine all waiting messages into one system call
+            batch = [message]
+            while len(batch) < SEND_BATCH:
+                try:
+                    message = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None:
+                    self.queue.put(None)
+                    break
+                batch.append(message)
+
+            data = b"".join(batch)
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.server.remove(self)
+                return
+            self.bytes_sent += len(data)
+
+
+class CollaborationServer:
+    """ Broadcast the changes of a whiteboard engine to viewers, attached as listener of the engine """
+
+    def __init__(self, board=None, host="", port=DEFAULT_PORT, keyframe_bytes=KEYFRAME_BYTES):
+        """ Start listening for viewers
+
+        Keyword arguments:
+            board           - whiteboard engine to broadcast
+            host            - address to listen on, "" for all interfaces
+            port            - TCP port, 0 to pick a free port
+            keyframe_bytes  - size of the delta tail that triggers a new keyframe
+        """
+        self.board = board
+        self.keyframe_bytes = keyframe_bytes
+
+        self.viewers = []
+        self.messages = 0
+        self.bytes_broadcast = 0
+
+        self._lock = threading.Lock()
+        self._hello = pack_message(MSG_HELLO, PROTOCOL_VERSION, board.whiteboard_width, board.whiteboard_height)
+        self._keyframe = pack_snapshot(board.board())
+        self._tail = []
+        self._tail_bytes = 0
+        self._generation = 0
+        self._encoding = False
+
+        # State of the stroke in progress: (op, color, thickness) and the last point
+        self._stroke = None
+        self._last_point = None
+
+        self._sock = socket.create_server((host, port), reuse_port=False)
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept, name="collab-accept", daemon=True)
+        self._thread.start()
+
+        board.listeners.append(self)
+
+    # ----- Viewers -----
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self._sock.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            viewer = Viewer(sock, address, self)
+
+            # Late joiners get the keyframe and the deltas since then, before any new delta
+            with self._lock:
+                viewer.queue.put(b"".join([self._hello, self._keyframe] + self._tail))
+                self.viewers.append(viewer)
+            viewer.start()
+
+    def remove(self, viewer=None):
+        """ Disconnect a viewer
+
+        Keyword arguments:
+            viewer  - viewer to disconnect
+        """
+        with self._lock:
+            if viewer in self.viewers:
+                self.viewers.remove(viewer)
+        viewer.close()
+
+    def close(self):
+        """ Stop listening and disconnect all viewers """
+        if self in self.board.listeners:
+            self.board.listeners.remove(self)
+        self._sock.close()
+        with self._lock:
+            viewers = self.viewers
+            self.viewers = []
+        for viewer in viewers:
+            viewer.close()
+
+    # ----- Broadcast -----
+
+    def broadcast(self, message=b"", keep=True):
+        """ Send a message to all viewers
+
+        Keyword arguments:
+            message - encoded message
+            keep    - add the message to the delta tail for late joiners
+        """
+        with self._lock:
+            if keep:
+                self._tail.append(message)
+                self._tail_bytes += len(message)
+            self.messages += 1
+            self.bytes_broadcast += len(message)
+            slow = [viewer for viewer in self.viewers if not viewer.send(message)]
+
+        for viewer in slow:
+            self.remove(viewer)
+
+    def keyframe(self, board=None):
+        """ Replace keyframe and delta tail by a snapshot of the board
+
+        Keyword arguments:
+            board   - unmirrored, unzoomed board image
+        """
+        snapshot = pack_snapshot(board)
+        with self._lock:
+            self._keyframe = snapshot
+            self._tail = []
+            self._tail_bytes = 0
+            self._generation += 1
+        return snapshot
+
+    def keyframe_async(self, board=None):
+        """ Take a keyframe of the board, encoded in the background so the pen is not delayed
+
+        Keyword arguments:
+            board   - unmirrored, unzoomed board image
+        """
+        with self._lock:
+            if self._encoding:
+                return
+            self._encoding = True
+            mark = len(self._tail)
+            generation = self._generation
+
+        threading.Thread(target=self._encode_keyframe, args=(board.copy(), mark, generation),
+                         name="collab-keyframe", daemon=True).start()
+
+    def _encode_keyframe(self, board=None, mark=0, generation=0):
+        snapshot = pack_snapshot(board)
+        with self._lock:
+            self._encoding = False
+
+            # A clear or load in the meantime has replaced the keyframe already
+            if generation != self._generation:
+                return
+
+            # Keep the deltas made while encoding
+            self._keyframe = snapshot
+            self._tail = self._tail[mark:]
+            self._tail_bytes = sum(len(message) for message in self._tail)
+            self._generation += 1
+
+    # ----- Engine listener -----
+
+    def segment(self, record=b""):
+        """ Broadcast a drawn or erased line segment
+
+        Keyword arguments:
+            record  - packed journal segment record
+        """
+        op, x1, y1, x2, y2, b, g, r, thickness = jn.SEGMENT.unpack(record)
+        stroke = (op, (b, g, r), thickness)
+        if stroke != self._stroke or self._last_point != (x1, y1):
+            if self._stroke is not None:
+                self.broadcast(pack_message(MSG_STROKE_END))
+            self.broadcast(pack_message(MSG_STROKE_BEGIN, op, b, g, r, thickness, x1, y1))
+            self._stroke = stroke
+
+        self.broadcast(pack_message(MSG_STROKE_APPEND, x2, y2))
+        self._last_point = (x2, y2)
+
+    def stroke_end(self):
+        """ Broadcast the end of the stroke in progress """
+        if self._stroke is None:
+            return
+        self._stroke = None
+        self._last_point = None
+        self.broadcast(pack_message(MSG_STROKE_END))
+
+        # The board is only complete while it is not zoomed
+        if self._tail_bytes > self.keyframe_bytes and self.board.zoom_factor == 100:
+            self.keyframe_async(self.board.w_screen_before_zoomed)
+
+    def color(self, key=0, col=None):
+        """ Broadcast a color change
+
+        Keyword arguments:
+            key - index of the color in the color options
+            col - BGR color
+        """
+        b, g, r = col if col is not None else (0, 0, 0)
+        self.broadcast(pack_message(MSG_COLOR, key, b, g, r))
+
+    def zoom(self, factor=100, off_width=0, off_height=0):
+        """ Broadcast the zoomed section of the board
+
+        Keyword arguments:
+            factor      - zoom factor in percent
+            off_width   - x-offset of the section
+            off_height  - y-offset of the section
+        """
+        self.broadcast(pack_message(MSG_ZOOM, factor, off_width, off_height))
+
+    def clear(self):
+        """ Broadcast a cleared board """
+        self.stroke_end()
+        self.keyframe(np.full_like(self.board.w_screen_before_zoomed, 255))
+        self.broadcast(pack_message(MSG_CLEAR))
+
+    def load(self, board=None):
+        """ Broadcast a loaded board as new keyframe
+
+        Keyword arguments:
+            board   - unmirrored, unzoomed board image
+        """
+        self.stroke_end()
+        self.broadcast(self.keyframe(board), keep=False)
+
+
+class CollaborationClient:
+    """ Reference viewer: receives the delta stream and maintains its own copy of the board """
+
+    def __init__(self, host="localhost", port=DEFAULT_PORT):
+        """ Connect to a collaboration server and start receiving
+
+        Keyword arguments:
+            host    - server address
+            port    - server port
+        """
+        self.sock = socket.create_connection((host, port))
+        self.board = None
+        self.color_key = 0
+        self.zoom = (100, 0, 0)
+        self.messages = 0
+        self.bytes_received = 0
+        self.connected = True
+
+        self._stroke = None
+        self._last_point = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._receiver, name="collab-client", daemon=True)
+        self._thread.start()
+
+    def snapshot(self):
+        """ Get a copy of the current board, None before the first keyframe """
+        with self._lock:
+            return None if self.board is None else self.board.copy()
+
+    def close(self):
+        self.connected = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self._thread.join()
+
+    def apply(self, msg=0, values=(), data=b""):
+        """ Apply a received message to the board
+
+        Keyword arguments:
+            msg     - message type
+            values  - decoded payload
+            data    - snapshot data
+        """
+        if msg == MSG_HELLO:
+            _, width, height = values
+            self.board = np.full((height, width, 3), WHITE, np.uint8)
+        elif msg == MSG_SNAPSHOT:
+            board = cv.imdecode(np.frombuffer(data, np.uint8), cv.IMREAD_COLOR)
+            if board is not None:
+                self.board = board
+        elif msg == MSG_STROKE_BEGIN:
+            op, b, g, r, thickness, x, y = values
+            self._stroke = ((b, g, r), thickness)
+            self._last_point = (x, y)
+        elif msg == MSG_STROKE_APPEND and self._stroke is not None:
+            col, thickness = self._stroke
+            cv.line(self.board, self._last_point, values, col, thickness=thickness, lineType=cv.LINE_AA)
+            self._last_point = values
+        elif msg == MSG_STROKE_END:
+            self._stroke = None
+        elif msg == MSG_CLEAR:
+            self.board[:] = WHITE
+        elif msg == MSG_COLOR:
+            self.color_key = values[0]
+        elif msg == MSG_ZOOM:
+            self.zoom = values
+
+    def _receiver(self):
+        while self.connected:
+            try:
+                message = read_message(self.sock)
+            except (OSError, ValueError):
+                message = None
+            if message is None:
+                self.connected = False
+                return
+
+            msg, values, data = message
+            with self._lock:
+                self.apply(msg, values, data)
+            self.messages += 1
+            self.bytes_received += 1 + PAYLOADS[msg].size + len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reference viewer of a shared whiteboard")
+    parser.add_argument("server", help="HOST:PORT of the collaboration server")
+    parser.add_argument("--save", default="", help="save the board to this file on exit instead of showing it")
+    args = parser.parse_args()
+
+    host, _, port = args.server.rpartition(":")
+    client = CollaborationClient(host or "localhost", int(port or DEFAULT_PORT))
+
+    try:
+        while client.connected:
+            board = client.snapshot()
+            if args.save:
+                threading.Event().wait(0.1)
+                continue
+            if board is not None:
+                # The whiteboard is shown mirrored like on the presenter's screen
+                cv.imshow("OpenCV-Whiteboard viewer", cv.flip(board, 1))
+            if cv.waitKey(30) == ord("q"):
+                break
+    except KeyboardInterrupt:
+        pass
+
+    if args.save and client.board is not None:
+        cv.imwrite(args.save, cv.flip(client.snapshot(), 1))
+    print("{} messages, {} KiB received".format(client.messages, client.bytes_received // 1024))
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,935 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Whiteboard engine
+
+The complete state and logic of a single whiteboard: drawing, erasing, color switching, zooming, buttons,
+loading/saving and compositing of the displayed whiteboard screen. The engine neither opens windows nor
+capture devices nor runs the hand tracker, it is driven by calling step() with a camera frame and the
+hand landmarks of that frame. Several independent boards can therefore live in one process.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import copy                             # Deep copies
+
+import cv2 as cv                        # Image processing
+import numpy as np                      # Calculations
+
+from whiteboard import buffers as bf    # Frame buffer pool
+from whiteboard import gestures as gs   # Gesture recognition
+from whiteboard import journal as jn    # Crash recovery
+from whiteboard import loader as ld     # Background image decoding
+from whiteboard import session as ss    # Native session files
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# Text properties
+FONT = cv.FONT_HERSHEY_SIMPLEX
+LINE_TYPE = cv.LINE_AA
+
+# Color variables
+DARK_GRAY = (63, 63, 63)
+GRAY = (127, 127, 127)
+WHITE = (255, 255, 255)
+
+COLOR_OPTIONS = [
+    ["Black", (0, 0, 0)],
+    ["Blue", (255, 0, 0)],
+    ["Green", (0, 255, 0)],
+    ["Red", (0, 0, 255)]
+]
+NUMBER_OF_COLOR_CHANNELS = 3
+
+# Capture device and its preview
+CAM_WIDTH = 640
+CAM_HEIGHT = 480
+SCALED_CAM = (480, 360)
+
+# Buttons
+BUTTONS = ("Save", "Load", "Clear", "Exit")
+BUTTON_SIZE = (125, 50)
+
+# Image filters
+KERNEL_GB = np.array([
+    [1 / 9, 1 / 9, 1 / 9],
+    [1 / 9, 1 / 9, 1 / 9],
+    [1 / 9, 1 / 9, 1 / 9]
+])
+KERNEL_S = np.array([
+    [0, -1, 0],
+    [-1, 5, -1],
+    [0, -1, 0]
+])
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def read_board_image(path="", width=0, height=0):
+    """ Read an image or session file as mirrored whiteboard screen of the given size
+
+    Keyword arguments:
+        path    - path of the image file
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+    """
+    if ss.is_session_file(path):
+        try:
+            return ss.SessionReader(path).board(width, height)
+        except (OSError, ValueError):
+            return None
+
+    return ld.decode_board_image(path, width, height)
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Pen:
+    """ Drawing state of a single input source (camera), several pens draw on the same whiteboard """
+
+    def __init__(self, color_options=None, color_key=0, region=None):
+        """ Create a pen
+
+        Keyword arguments:
+            color_options   - color options of the whiteboard
+            color_key       - index of the initial color in the color options
+            region          - (x, y, width, height) of the whiteboard screen the capture device maps to,
+                              None for the complete whiteboard screen
+        """
+        self.region = region
+
+        # Color
+        self.color = None
+        self.color_key = color_key
+        self.color_label = color_options[color_key][0]
+        self.first_color_change = True
+
+        # Draw
+        self.draw_end = None
+        self.draw_start = None
+        self.first_draw = True
+
+    def set_color(self, color_options=None, key=0):
+        """ Set the current color
+
+        Keyword arguments:
+            color_options   - color options of the whiteboard
+            key             - index of the color in the color options
+        """
+        self.color_key = key
+        self.color = color_options[key][1]
+        self.color_label = color_options[key][0]
+
+
+class Whiteboard:
+    """ A single whiteboard driven by step(frame, landmarks) """
+
+    def __init__(self, width=0, height=0, cam_width=CAM_WIDTH, cam_height=CAM_HEIGHT, preview_size=SCALED_CAM,
+                 buttons=BUTTONS, button_size=BUTTON_SIZE):
+        """ Create a blank whiteboard
+
+        Keyword arguments:
+            width           - width of the whiteboard screen
+            height          - height of the whiteboard screen
+            cam_width       - width of the capture device, the landmarks refer to
+            cam_height      - height of the capture device, the landmarks refer to
+            preview_size    - size of the camera preview in the top left corner, None to hide it
+            buttons         - labels of the buttons below the camera preview
+            button_size     - (width, height) of the buttons
+        """
+        # Whiteboard variables
+        self.whiteboard_width = width
+        self.whiteboard_height = height
+        self.cam_width = cam_width
+        self.cam_height = cam_height
+        self.preview_size = preview_size
+        self.preview_interpolation = cv.INTER_CUBIC
+
+        # Set the scale according to width and height of whiteboard and capture device
+        self.scale = [width / cam_width, height / cam_height]
+
+        # Color variables
+        self.color_options = copy.deepcopy(COLOR_OPTIONS)
+
+        # Pens of the input sources, the first one is the primary pen, which is journaled and saved
+        self.pens = [Pen(self.color_options)]
+
+        # Image variables
+        self.w_screen = None
+        self.w_screen_cached = None
+        self.w_screen_before_zoomed = None
+
+        # Buffers reused from frame to frame, the composed screens are handed out in turn from a ring of
+        # screen_buffers, runtimes reading a screen on other threads while the next one is composed need more
+        self.buffers = bf.BufferPool()
+        self.screen_buffers = 1
+
+        # Button execution
+        self.cleared = None
+        self.loaded = None
+        self.loaded_path = ""
+        self.loaded_session = None
+
+        # Zoom
+        self.first_zoom = True
+        self.first_in_zoom = True
+        self.in_zoom = False
+        self.off_height = 0
+        self.off_width = 0
+        self.zoom_factor = 100
+        self.zoom_initial_distance = 0
+
+        # Image filters
+        self.kernel_filter = True
+
+        # Stroke data since the last clear/load as packed journal segment records
+        self.strokes = bytearray()
+
+        # Latest results of step(), gesture and index fingertip of the primary source and of all sources
+        self.gesture = "unknown"
+        self.index_tip = None
+        self.gestures = {}
+        self.index_tips = {}
+
+        # Optional extensions: journal, background image decoder, gallery overlay
+        self.journal = None
+        self.image_loader = None
+        self.gallery = None
+
+        # Take the journal checkpoints in step(), runtimes scheduling them on their own disable it
+        self.auto_checkpoint = True
+
+        # Listeners notified about changes of the board, e.g. collaboration.CollaborationServer
+        self.listeners = []
+
+        # Called for gallery actions the engine cannot handle itself, e.g. ("browse",)
+        self.on_action = None
+
+        # Buttons
+        self.layers = []
+        self.first_append = True
+        for label in buttons:
+            self.create_button(label, *button_size)
+
+        self.clear_screen()
+        self.w_screen_cached = copy.deepcopy(self.w_screen)
+
+    @property
+    def pen(self):
+        """ Get the primary pen """
+        return self.pens[0]
+
+    # ----- Setup -----
+
+    def add_pen(self, region=None, color_key=None):
+        """ Add a pen for another input source and return its source index
+
+        Keyword arguments:
+            region      - (x, y, width, height) of the whiteboard screen the capture device maps to,
+                          None for the complete whiteboard screen
+            color_key   - index of the initial color, a different color per source by default
+        """
+        if color_key is None:
+            color_key = len(self.pens) % len(self.color_options)
+
+        pen = Pen(self.color_options, color_key, region)
+        pen.set_color(self.color_options, color_key)
+        self.pens.append(pen)
+        return len(self.pens) - 1
+
+    def create_button(self, label="", size_x=BUTTON_SIZE[0], size_y=BUTTON_SIZE[1]):
+        """ Create button with label and size and append it to layers array
+
+        Keyword arguments:
+            label   - label of the button
+            size_x  - width of the button
+            size_y  - height of the button
+        """
+        # Set initial colors
+        btn = np.full((size_y, size_x, NUMBER_OF_COLOR_CHANNELS), self.color_options[0][1], np.uint8)
+        btn[2:size_y - 2, 2:size_x - 2] = GRAY
+
+        # Get boundary of text as well as x and y coordinates
+        label_size = cv.getTextSize(label, FONT, 1, 2)[0]
+        label_x = int((size_x - label_size[0]) / 2)
+        label_y = int((size_y + label_size[1]) / 2)
+
+        cv.putText(btn, label, (label_x, label_y), FONT, 1, WHITE, 2, LINE_TYPE)
+
+        # Append buttons to layer array with additional x- and y-offset according to the main window
+        if self.first_append:
+            self.first_append = False
+            self.layers.append([btn, 50, size_y, label])
+        else:
+            self.layers.append([btn, 50, self.layers[-1][2] + (size_y * 2) if self.layers else (size_y * 2), label])
+
+    def clear_screen(self):
+        """ Get a new blank whiteboard screen """
+        self.w_screen = np.full(
+            (self.whiteboard_height, self.whiteboard_width, NUMBER_OF_COLOR_CHANNELS), WHITE, np.uint8
+        )
+        self.w_screen_before_zoomed = np.full(
+            (self.whiteboard_height, self.whiteboard_width, NUMBER_OF_COLOR_CHANNELS), WHITE, np.uint8
+        )
+
+    def start_image_loader(self):
+        """ Decode loaded images on a background thread """
+        self.image_loader = ld.ImageLoader(read_board_image)
+
+    def start_journal(self, path=""):
+        """ Restore the whiteboard screen from an existing journal and start a new journal generation
+
+        Returns True, if the whiteboard screen has been restored.
+
+        Keyword arguments:
+            path    - journal directory
+        """
+        board, generation, key = jn.recover(path, self.whiteboard_width, self.whiteboard_height, read_board_image)
+
+        if board is not None:
+            self.w_screen = board
+            self.w_screen_before_zoomed = copy.deepcopy(board)
+            self.w_screen_cached = copy.deepcopy(board)
+
+        if key is not None:
+            self.set_color(key)
+
+        self.journal = jn.Journal(path, self.whiteboard_width, self.whiteboard_height, generation)
+
+        # Consolidate the restored state into the first checkpoint of the new journal
+        if board is not None:
+            self.journal.checkpoint(self.w_screen_before_zoomed)
+            if key is not None:
+                self.journal.color(self.pen.color_key)
+
+        return board is not None
+
+    def close(self, discard_journal=False):
+        """ Release the resources of the board
+
+        Keyword arguments:
+            discard_journal - remove the journal, e.g. after a regular program exit
+        """
+        if self.journal is not None:
+            self.journal.close(discard=discard_journal)
+            self.journal = None
+
+    def notify(self, event="", *args):
+        """ Notify all listeners about a change of the board
+
+        Keyword arguments:
+            event   - name of the listener method: segment, stroke_end, color, zoom, clear or load
+            args    - arguments of the listener method
+        """
+        for listener in self.listeners:
+            getattr(listener, event)(*args)
+
+    # ----- Buttons -----
+
+    def hover(self, pos=None):
+        """ Highlight the button below a position and return its label, "" if there is none
+
+        Keyword arguments:
+            pos - position on the displayed whiteboard screen
+        """
+        hovered = ""
+
+        # Check if position hovers over button
+        for lay in self.layers:
+            if gs.point_is_in_rectangle(pos, lay[1], lay[2] + self.preview_height(), lay[0].shape[1], lay[0].shape[0]):
+                # Change appearance for highlighted button
+                lay[0][2:lay[0].shape[0] - 2, 2:lay[0].shape[1] - 2] = DARK_GRAY
+                hovered = lay[3]
+            else:
+                # Set button to initial color state
+                lay[0][2:lay[0].shape[0] - 2, 2:lay[0].shape[1] - 2] = GRAY
+
+            # Put text on button again
+            label_size = cv.getTextSize(lay[3], FONT, 1, 2)[0]
+            label_x = int((lay[0].shape[1] - label_size[0]) / 2)
+            label_y = int((lay[0].shape[0] + label_size[1]) / 2)
+
+            cv.putText(lay[0], lay[3], (label_x, label_y), FONT, 1, WHITE, 2, LINE_TYPE)
+
+        return hovered
+
+    def set_preview(self, size=None, interpolation=cv.INTER_CUBIC):
+        """ Change the camera preview at runtime, the buttons move along with its height
+
+        Keyword arguments:
+            size            - size of the camera preview, None to hide it
+            interpolation   - interpolation of the preview resize
+        """
+        self.preview_size = size
+        self.preview_interpolation = interpolation
+
+    def preview_height(self):
+        """ Get the height of the camera preview, the buttons are placed below """
+        return self.preview_size[1] if self.preview_size else 0
+
+    def clear(self):
+        """ Clear the whiteboard screen with the next step """
+        self.cleared = np.full(
+            (self.whiteboard_height, self.whiteboard_width, NUMBER_OF_COLOR_CHANNELS), WHITE, np.uint8
+        )
+
+    # ----- Manipulation -----
+
+    def view_to_board(self, coord=None):
+        """ Map a coordinate of the (possibly zoomed) whiteboard screen onto the unzoomed whiteboard screen
+
+        Keyword arguments:
+            coord   - coordinate on the displayed whiteboard screen
+        """
+        if self.zoom_factor == 100:
+            return coord
+
+        x_factor = (self.whiteboard_width - self.off_width * 2) / self.whiteboard_width
+        y_factor = (self.whiteboard_height - self.off_height * 2) / self.whiteboard_height
+        return [round(self.off_width + coord[0] * x_factor), round(self.off_height + coord[1] * y_factor)]
+
+    def draw(self, coord=None, col=None, thickness=2, pen=None):
+        """ Responsible for drawing the users input
+
+        Keyword arguments:
+            coord       - current index fingertip position
+            col         - selected color
+            thickness   - thickness of the drawn line
+            pen         - pen of the input source, the primary pen by default
+
+        first_draw: flag is set to True, if the draw function has been called the first time
+        draw_start: starting point of the line
+        draw_end:   end point of the line
+        """
+        pen = pen or self.pen
+
+        if pen.first_draw:
+            pen.first_draw = False
+            pen.draw_start = coord
+            pen.draw_end = None
+        elif pen.draw_end is not None and list(coord) == list(pen.draw_start):
+            # A fingertip holding still (or reused landmarks of the motion gate) adds nothing to the stroke
+            return
+        else:
+            pen.draw_end = coord
+            self.w_screen = cv.line(self.w_screen, pen.draw_start, pen.draw_end, col, thickness=thickness,
+                                    lineType=LINE_TYPE)
+
+            # Record the segment in board coordinates, erasing is drawing in white
+            record = jn.pack_segment(
+                jn.OP_ERASE if col == WHITE else jn.OP_DRAW,
+                self.view_to_board(pen.draw_start),
+                self.view_to_board(pen.draw_end),
+                col,
+                max(1, round(thickness * self.zoom_factor / 100))
+            )
+            self.strokes.extend(record)
+            if self.journal is not None:
+                self.journal.append(record)
+            self.notify("segment", record)
+
+            pen.draw_start = pen.draw_end
+
+            if self.zoom_factor == 100:
+                np.copyto(self.w_screen_before_zoomed, self.w_screen)
+
+    def set_color(self, key=0):
+        """ Set the current color of the primary pen
+
+        Keyword arguments:
+            key - index of the color in the color options
+        """
+        self.pen.set_color(self.color_options, key)
+
+    def switch_color(self, pen=None):
+        """ Switch the current color, if the applicable gesture is called
+
+        Keyword arguments:
+            pen - pen of the input source, the primary pen by default
+        """
+        pen = pen or self.pen
+
+        if pen.first_color_change:
+            pen.first_color_change = False
+            if pen.color_key + 1 < len(self.color_options):
+                pen.color_key += 1
+            else:
+                pen.color_key = 0
+
+            # Only the color of the primary pen is restored after a crash
+            if self.journal is not None and pen is self.pen:
+                self.journal.color(pen.color_key)
+            self.notify("color", pen.color_key, self.color_options[pen.color_key][1])
+
+        pen.set_color(self.color_options, pen.color_key)
+
+    def zoom(self, lm=None):
+        """ Perform a zoom on the whiteboard screen
+
+        Keyword arguments:
+            lm  - hand landmarks
+        """
+        # Calculate the distance between the two index fingertips
+        i1 = [round(a * b) for a, b in zip(lm[8], self.scale)]
+        i2 = [round(a * b) for a, b in zip(lm[gs.HAND_INDICES + 8], self.scale)]
+        index_distance = gs.distance(i1, i2)
+
+        # If not in zoom mode set the initial distance to index distance
+        if not self.in_zoom:
+            if self.first_zoom:
+                self.first_zoom = False
+                self.zoom_initial_distance = int(index_distance)
+
+        # Otherwise, calculate the appropriate initial distance to get the current @ref zoom_factor
+        else:
+            if self.first_in_zoom:
+                self.first_in_zoom = False
+                self.zoom_initial_distance = int(self.zoom_factor * index_distance / 100)
+
+        self.zoom_factor = int(self.zoom_initial_distance * 100 / index_distance)
+
+        # Cap zoom_factor for special cases
+        if self.zoom_factor > 100:
+            self.zoom_factor = 100
+
+        if self.zoom_factor < 1:
+            self.zoom_factor = 1
+
+        if self.zoom_factor == 100:
+            self.in_zoom = False
+
+        self.update_zoom_view()
+
+    def update_zoom_view(self):
+        """ Set the whiteboard screen to the section of the unzoomed whiteboard screen given by @ref zoom_factor """
+        width = self.whiteboard_width
+        height = self.whiteboard_height
+        factor = self.zoom_factor / 100
+
+        # Calculate the relative resolution according to the zoom factor
+        self.off_height = int((height - int(height * factor)) / 2)
+        self.off_width = int((width - int(width * factor)) / 2)
+
+        # Set the whiteboard screen to that specific relative resolution and resize it to the intended fullscreen
+        # resolution
+        region = self.w_screen_before_zoomed[self.off_height:height - self.off_height,
+                                             self.off_width:width - self.off_width]
+        self.w_screen = cv.resize(region, (width, height), dst=self.w_screen, interpolation=cv.INTER_AREA)
+
+        self.notify("zoom", self.zoom_factor, self.off_width, self.off_height)
+
+    def merge_zoomed_edits(self):
+        """ Take over changes made on the zoomed whiteboard screen into the unzoomed whiteboard screen """
+        width = self.whiteboard_width
+        height = self.whiteboard_height
+        off_width = self.off_width
+        off_height = self.off_height
+
+        # Check if the user has edited the displayed whiteboard screen, the section is resized into a view of a
+        # full size buffer, which fits every zoom factor
+        shown = self.buffers.like("zoom merge", self.w_screen)[:height - off_height * 2, :width - off_width * 2]
+        w_shown = cv.resize(self.w_screen, (width - off_width * 2, height - off_height * 2), dst=shown)
+        w_saved = self.w_screen_before_zoomed[off_height:height - off_height, off_width:width - off_width]
+
+        # Whiteboard screen has been edited
+        if cv.norm(w_shown, w_saved, cv.NORM_INF):
+            w_saved[:] = w_shown
+
+            # Put a sharpening (and smoothen) filter on the image
+            if self.kernel_filter:
+                self.kernel_filter = False
+
+                # Sharpen the image
+                cv.filter2D(src=self.w_screen_before_zoomed, ddepth=-1, kernel=KERNEL_S,
+                            dst=self.w_screen_before_zoomed)
+
+                # Smoothen image
+                # # Gaussian blur the image
+                # self.w_screen_before_zoomed = copy.deepcopy(
+                #     cv.filter2D(src=self.w_screen_before_zoomed, ddepth=-1, kernel=KERNEL_GB)
+                # )
+
+    def scale_to_screen(self, coord=None, pen=None):
+        """ Scale a capture device coordinate onto the whiteboard screen, or the region of the pen
+
+        Keyword arguments:
+            coord   - coordinate in capture device coordinates
+            pen     - pen of the input source
+        """
+        if pen is None or pen.region is None:
+            return [round(a * b) for a, b in zip(coord, self.scale)]
+
+        x, y, width, height = pen.region
+        return [round(x + coord[0] * width / self.cam_width), round(y + coord[1] * height / self.cam_height)]
+
+    def handle_gesture(self, landmarks=None, source=0):
+        """ Classify the gesture of the hand landmarks and execute it
+
+        Returns a tuple (gesture, scaled index fingertip position).
+
+        Keyword arguments:
+            landmarks   - list of 21 or 42 [x, y] landmarks in capture device coordinates
+            source      - index of the input source, selects its pen
+        """
+        pen = self.pens[source]
+
+        # Rearrange the order of the hand landmarks
+        landmarks = gs.determine_right_left(landmarks)
+
+        # Set index fingertip position
+        index_tip = landmarks[8]
+
+        # Scale index fingertip position according to the scaling factor
+        scaled_index_tip = self.scale_to_screen(index_tip, pen)
+
+        # Check gesture
+        gesture = gs.check_user_gesture(landmarks)
+
+        # The gallery takes over the index fingertip (on the mirrored screen) while it is shown
+        if self.gallery is not None and self.gallery.is_open:
+            pointer = [self.whiteboard_width - 1 - scaled_index_tip[0], scaled_index_tip[1]]
+            self.handle_gallery_action(self.gallery.pointer(pointer, gesture == "select"))
+            if gesture != "select":
+                gesture = "unknown"
+
+        # Filter function according to gesture calculation output
+        if gesture == "switch color":
+            self.switch_color(pen)
+        else:
+            pen.first_color_change = True
+
+        if gesture == "draw":
+            self.draw(scaled_index_tip, pen.color, 2, pen)
+        elif gesture == "erase":
+            self.draw(scaled_index_tip, WHITE, 20, pen)
+        else:
+            if not pen.first_draw:
+                self.notify("stroke_end")
+            pen.first_draw = True
+
+        if gesture == "zoom":
+            if self.in_zoom:
+                self.merge_zoomed_edits()
+
+            # Execute the image zoom
+            self.zoom(landmarks)
+        else:
+            # Reset flags for certain scenarios
+            self.first_zoom = True
+            self.first_in_zoom = True
+            if self.zoom_factor != 100:
+                self.in_zoom = True
+            else:
+                self.kernel_filter = True
+
+        return gesture, scaled_index_tip
+
+    # ----- Loading and saving -----
+
+    def load_file(self, filename=""):
+        """ Load an image or session file
+
+        Keyword arguments:
+            filename    - path of the file
+        """
+        # Session files are stored unmirrored and keep their own state
+        if ss.is_session_file(filename):
+            try:
+                self.loaded_session = ss.SessionReader(filename)
+            except (OSError, ValueError) as e:
+                print("Could not load session: " + str(e))
+                return
+            self.loaded = self.loaded_session.board(self.whiteboard_width, self.whiteboard_height)
+            self.loaded_path = filename
+            return
+
+        # Decode the image in the background at the resolution of the whiteboard, see check_loaded_image
+        if self.image_loader is not None:
+            self.image_loader.request(filename, self.whiteboard_width, self.whiteboard_height)
+            return
+
+        image = read_board_image(filename, self.whiteboard_width, self.whiteboard_height)
+        if image is None:
+            print("Could not load image: " + filename)
+            return
+        self.loaded = image
+        self.loaded_path = filename
+
+    def check_loaded_image(self):
+        """ Take over an image, if the background decoder has finished """
+        if self.image_loader is None:
+            return
+
+        result = self.image_loader.poll()
+        if result is None:
+            return
+
+        filename, image = result
+        if image is None:
+            print("Could not load image: " + filename)
+            return
+
+        self.loaded = image
+        self.loaded_path = filename
+
+    def handle_gallery_action(self, action=None):
+        """ Execute an action returned by the gallery
+
+        Keyword arguments:
+            action  - ("load", path), ("browse",) or None
+        """
+        if action is None:
+            return
+        if action[0] == "load":
+            self.load_file(action[1])
+        elif self.on_action is not None:
+            self.on_action(action)
+
+    def restore_session_state(self):
+        """ Restore palette, color, strokes and zoom of a loaded session file """
+        session = self.loaded_session
+        self.loaded_session = None
+
+        if session.palette:
+            self.color_options[:] = session.palette
+        self.set_color(min(session.color_key, len(self.color_options) - 1))
+
+        # Strokes are only valid for the resolution they were recorded in
+        if session.width == self.whiteboard_width and session.height == self.whiteboard_height:
+            self.strokes.extend(session.stroke_bytes())
+
+        if session.zoom_factor < 100:
+            self.zoom_factor = session.zoom_factor
+            self.in_zoom = True
+            self.update_zoom_view()
+
+        session.close()
+
+    def memory_buffers(self):
+        """ Get a dictionary name -> buffer of the screens and buffers held by the whiteboard, see memory.py """
+        buffers = {
+            "w_screen": self.w_screen,
+            "w_screen_cached": self.w_screen_cached,
+            "w_screen_before_zoomed": self.w_screen_before_zoomed,
+            "cleared": self.cleared,
+            "loaded": self.loaded,
+            "strokes": self.strokes
+        }
+        for lay in self.layers:
+            buffers["button " + lay[3]] = lay[0]
+        for name, buffer in self.buffers.memory_buffers().items():
+            buffers["pool " + name] = buffer
+        return buffers
+
+    def board(self):
+        """ Get the complete (unzoomed) whiteboard screen without any layers """
+        # While zoomed, the unzoomed whiteboard screen holds the complete board
+        return self.w_screen_cached if self.zoom_factor == 100 else self.w_screen_before_zoomed
+
+    def complete_board(self):
+        """ Get a copy of the complete (unzoomed) whiteboard screen including the edits made while zoomed, which
+        are only merged into the unzoomed whiteboard screen by the next zoom gesture
+        """
+        board = self.board().copy()
+        if self.zoom_factor == 100:
+            return board
+
+        width = self.whiteboard_width
+        height = self.whiteboard_height
+        section = board[self.off_height:height - self.off_height, self.off_width:width - self.off_width]
+        shown = cv.resize(self.w_screen, (section.shape[1], section.shape[0]), interpolation=cv.INTER_AREA)
+        if cv.norm(shown, section, cv.NORM_INF):
+            section[:] = shown
+        return board
+
+    def snapshot(self):
+        """ Get the currently displayed whiteboard screen without layers, as it is saved to an image file """
+        return cv.flip(self.w_screen_cached, 1)
+
+    def session_state(self):
+        """ Get a copy of the whiteboard screen, strokes, palette and zoom state as arguments of
+        session.write_session, so the session can be written while the engine keeps stepping
+        """
+        return {
+            "board": self.complete_board(),
+            "strokes": bytes(self.strokes),
+            "palette": copy.deepcopy(self.color_options),
+            "color_key": self.pen.color_key,
+            "zoom_factor": self.zoom_factor,
+            "off_width": self.off_width,
+            "off_height": self.off_height
+        }
+
+    def save_session(self, filename="", state=None):
+        """ Save the whiteboard screen together with strokes, palette and zoom state as session file
+
+        Keyword arguments:
+            filename    - target file path
+            state       - state taken by session_state, the current state by default
+        """
+        ss.write_session(filename, **(state or self.session_state()))
+
+    # ----- Rendering -----
+
+    def has_pending(self):
+        """ True, if the whiteboard screen changes with the next step even without hands, e.g. by a loaded image """
+        if self.loaded is not None or self.cleared is not None:
+            return True
+        return self.image_loader is not None and self.image_loader.pending()
+
+    def apply_pending(self):
+        """ Take over a loaded image or a cleared whiteboard screen """
+        # Check if an image was loaded
+        if self.loaded is not None:
+            self.w_screen = copy.deepcopy(self.loaded)
+            self.w_screen_before_zoomed = copy.deepcopy(self.w_screen)
+            self.loaded = None
+            self.zoom_factor = 100
+            self.strokes.clear()
+
+            if self.journal is not None:
+                self.journal.load(self.loaded_path, self.w_screen_before_zoomed)
+            self.notify("load", self.w_screen_before_zoomed)
+
+            # Restore the state stored in a session file
+            if self.loaded_session is not None:
+                self.restore_session_state()
+
+        # Check if the image was cleared
+        if self.cleared is not None:
+            self.w_screen = copy.deepcopy(self.cleared)
+            self.w_screen_before_zoomed = copy.deepcopy(self.w_screen)
+            self.cleared = None
+            self.zoom_factor = 100
+            self.strokes.clear()
+
+            if self.journal is not None:
+                self.journal.clear()
+            self.notify("clear")
+
+    def render(self, capture=None, index_coord=None, gesture="", source=0):
+        """ Compose the displayed whiteboard screen and return it
+
+        Keyword arguments:
+            capture     - captured frame of camera device (BGR), None to leave out the preview
+            index_coord - coordinate of index fingertip
+            gesture     - current gesture calculated
+            source      - index of the input source shown in the preview
+        """
+        self.apply_pending()
+
+        # Keep the whiteboard screen without the marks of the fingertips
+        np.copyto(self.w_screen_cached, self.w_screen)
+
+        # Mark the index fingertip position on the screen if existent
+        if index_coord is not None:
+            self.w_screen = cv.circle(self.w_screen, center=index_coord, radius=3, color=self.pens[source].color,
+                                      thickness=1, lineType=LINE_TYPE)
+
+        # Mark the index fingertips of the other input sources
+        for other, tip in self.index_tips.items():
+            if other != source and tip is not None:
+                self.w_screen = cv.circle(self.w_screen, center=tip, radius=3, color=self.pens[other].color,
+                                          thickness=1, lineType=LINE_TYPE)
+
+        screen = self.buffers.ring("screen", self.w_screen.shape, self.screen_buffers)
+        cv.flip(self.w_screen, 1, dst=screen)
+
+        # Show the gallery between the camera and the right edge of the whiteboard screen
+        if self.gallery is not None and self.gallery.is_open:
+            self.gallery.render(screen)
+
+        # Lay camera and buttons above whiteboard screen
+        cap_off_y = 0
+        if capture is not None and self.preview_size:
+            cap_off_x, cap_off_y = self.preview_size
+            self.render_preview(capture, gesture, self.pens[source], screen[0:cap_off_y, 0:cap_off_x])
+        for lay in self.layers:
+            screen[cap_off_y + lay[2]:cap_off_y + lay[2] + lay[0].shape[0], lay[1]:lay[1] + lay[0].shape[1]] = lay[0]
+
+        return screen
+
+    def render_preview(self, capture=None, gesture="", pen=None, dst=None):
+        """ Modify the capture frame for the preview in the top left corner
+
+        Keyword arguments:
+            capture - captured frame of camera device (BGR)
+            gesture - current gesture calculated
+            pen     - pen of the input source shown in the preview
+            dst     - array of the preview size the preview is written to, e.g. a section of the screen
+        """
+        col = (pen or self.pen).color_label
+        black = COLOR_OPTIONS[0][1]
+        green = COLOR_OPTIONS[2][1]
+        text_y = capture.shape[0] - 20
+
+        capture = cv.flip(capture, 1, dst=self.buffers.like("preview", capture))
+        capture = cv.putText(capture, "Gesture: " + gesture, (20, text_y), FONT, 0.75, black, 2, LINE_TYPE)
+        capture = cv.putText(capture, "Gesture: " + gesture, (20, text_y), FONT, 0.75, green, 1, LINE_TYPE)
+        capture = cv.putText(capture, "Color: " + col, (300, text_y), FONT, 0.75, black, 2, LINE_TYPE)
+        capture = cv.putText(capture, "Color: " + col, (300, text_y), FONT, 0.75, green, 1, LINE_TYPE)
+        capture = cv.putText(capture, "Zoom: " + str(self.zoom_factor), (20, 260), FONT, 0.75, black, 2, LINE_TYPE)
+        capture = cv.putText(capture, "Zoom: " + str(self.zoom_factor), (20, 260), FONT, 0.75, green, 1, LINE_TYPE)
+        return cv.resize(capture, self.preview_size, dst=dst, interpolation=self.preview_interpolation)
+
+    def restore_screen(self):
+        """ Reset the screen to the latest change before adding custom layers """
+        np.copyto(self.w_screen, self.w_screen_cached)
+
+    def step(self, frame=None, landmarks=None):
+        """ Process one frame: execute the gesture of the landmarks and compose the displayed whiteboard screen
+
+        Returns the composed whiteboard screen, which stays valid for the next screen_buffers - 1 calls.
+
+        Keyword arguments:
+            frame       - captured frame of camera device (BGR), None to leave out the preview
+            landmarks   - list of 21 or 42 [x, y] landmarks in capture device coordinates, None if no hand was found
+        """
+        return self.step_sources([(0, landmarks)], frame)
+
+    def step_sources(self, inputs=None, frame=None, source=0):
+        """ Process the latest hand landmarks of several input sources and compose the displayed whiteboard screen
+
+        Returns the composed whiteboard screen, which stays valid for the next screen_buffers - 1 calls.
+
+        Keyword arguments:
+            inputs  - list of (source index, landmarks) of the sources with a new frame, None for no hand
+            frame   - captured frame (BGR) shown in the preview, None to leave out the preview
+            source  - index of the input source of the preview frame
+        """
+        for index, landmarks in inputs:
+            gesture, tip = "unknown", None
+            if landmarks:
+                gesture, tip = self.handle_gesture(landmarks, index)
+            self.gestures[index] = gesture
+            self.index_tips[index] = tip
+
+        self.gesture = self.gestures.get(source, "unknown")
+        self.index_tip = self.index_tips.get(source)
+
+        # Take over a loaded image as soon as it has been decoded
+        self.check_loaded_image()
+
+        # Compose the whiteboard screen, camera and all extensions
+        output = self.render(frame, self.index_tip, self.gesture, source)
+
+        # Keep the journal replay short, checkpoints are only taken from the unzoomed screen
+        if self.auto_checkpoint and self.journal is not None and self.zoom_factor == 100 and \
+                self.journal.checkpoint_due():
+            self.journal.checkpoint(self.w_screen_before_zoomed)
+
+        # Restore the whiteboard screen after editing with different layers
+        self.restore_screen()
+
+        return output
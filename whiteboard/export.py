@@ -0,0 +1,353 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Export pipeline
+
+Exports the whiteboard screen to raster formats (PNG, JPEG, WebP) with configurable compression levels
+and the strokes to vector formats (SVG, PDF). Encoding runs in a process pool, so several formats or
+pages are produced concurrently and the main loop is never blocked.
+
+Vector outputs contain the strokes recorded since the last clear/load only, a loaded background image
+is not part of them.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import concurrent.futures as cf         # Process pool
+import multiprocessing as mp            # Process start method
+import os                               # Filesystem
+import time                             # Encoding time
+import zlib                             # PDF content streams
+
+import cv2 as cv                        # Raster encoding
+import numpy as np                      # Stroke records
+
+from whiteboard import journal as jn    # Stroke operation codes
+from whiteboard import session as ss    # Stroke record layout
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+RASTER_FORMATS = ("png", "jpg", "webp")
+VECTOR_FORMATS = ("svg", "pdf")
+FORMATS = RASTER_FORMATS + VECTOR_FORMATS
+
+# Compression level per format: PNG 0-9 (zlib level), JPEG/WebP 1-100 (quality)
+DEFAULT_LEVELS = {
+    "png": 3,
+    "jpg": 95,
+    "webp": 90
+}
+
+RASTER_PARAMS = {
+    "png": cv.IMWRITE_PNG_COMPRESSION,
+    "jpg": cv.IMWRITE_JPEG_QUALITY,
+    "webp": cv.IMWRITE_WEBP_QUALITY
+}
+
+EXTENSION_ALIASES = {
+    "jpeg": "jpg"
+}
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def format_of(path=""):
+    """ Get the export format of a file path by its extension, None if it is not supported
+
+    Keyword arguments:
+        path    - file path
+    """
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    ext = EXTENSION_ALIASES.get(ext, ext)
+    return ext if ext in FORMATS else None
+
+
+def encode_raster(image=None, fmt="png", level=None):
+    """ Encode an image and return the encoded bytes
+
+    Keyword arguments:
+        image   - BGR image
+        fmt     - one of RASTER_FORMATS
+        level   - compression level, None for DEFAULT_LEVELS
+    """
+    level = DEFAULT_LEVELS[fmt] if level is None else level
+    ok, encoded = cv.imencode("." + fmt, image, [RASTER_PARAMS[fmt], int(level)])
+    if not ok:
+        raise ValueError("Could not encode image as " + fmt)
+    return encoded.tobytes()
+
+
+def stroke_paths(strokes=b"", width=0, mirror=True):
+    """ Merge connected segments of equal style into polylines
+
+    Returns a list of (points, (b, g, r), thickness), erased segments are white polylines.
+
+    Keyword arguments:
+        strokes - packed journal segment records
+        width   - width of the whiteboard screen, needed for mirroring
+        mirror  - mirror the x-coordinates like the exported raster images
+    """
+    records = np.frombuffer(bytes(strokes), dtype=ss.STROKE_DTYPE)
+    paths = []
+    points = None
+    style = None
+
+    for s in records:
+        if s["op"] not in (jn.OP_DRAW, jn.OP_ERASE):
+            continue
+        x1, y1, x2, y2 = int(s["x1"]), int(s["y1"]), int(s["x2"]), int(s["y2"])
+        if mirror:
+            x1 = width - 1 - x1
+            x2 = width - 1 - x2
+        seg_style = ((int(s["b"]), int(s["g"]), int(s["r"])), int(s["thickness"]))
+
+        if points is not None and seg_style == style and points[-1] == (x1, y1):
+            points.append((x2, y2))
+        else:
+            if points is not None:
+                paths.append((points, style[0], style[1]))
+            points = [(x1, y1), (x2, y2)]
+            style = seg_style
+
+    if points is not None:
+        paths.append((points, style[0], style[1]))
+
+    return paths
+
+
+def encode_svg(strokes=b"", width=0, height=0):
+    """ Encode strokes as SVG document and return the encoded bytes
+
+    Keyword arguments:
+        strokes - packed journal segment records
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+    """
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}">'.format(width, height),
+        '<rect width="100%" height="100%" fill="#ffffff"/>',
+        '<g fill="none" stroke-linecap="round" stroke-linejoin="round">'
+    ]
+    for points, (b, g, r), thickness in stroke_paths(strokes, width):
+        lines.append('<polyline stroke="#{:02x}{:02x}{:02x}" stroke-width="{}" points="{}"/>'.format(
+            r, g, b, thickness, " ".join("{},{}".format(x, y) for x, y in points)))
+    lines.append("</g>")
+    lines.append("</svg>")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def encode_pdf(pages=None, width=0, height=0):
+    """ Encode strokes as PDF document with one page per stroke list and return the encoded bytes
+
+    Keyword arguments:
+        pages   - list of packed journal segment records, one entry per page
+        width   - width of the whiteboard screen (1 px = 1 pt)
+        height  - height of the whiteboard screen
+    """
+    objects = []
+
+    # Content stream per page, PDF coordinates start at the bottom left
+    page_ids = []
+    for strokes in pages:
+        ops = ["1 J 1 j"]
+        for points, (b, g, r), thickness in stroke_paths(strokes, width):
+            ops.append("{:.3f} {:.3f} {:.3f} RG {} w".format(r / 255, g / 255, b / 255, thickness))
+            ops.append("{} {} m".format(points[0][0], height - points[0][1]))
+            ops.extend("{} {} l".format(x, height - y) for x, y in points[1:])
+            ops.append("S")
+        content = zlib.compress("\n".join(ops).encode("ascii"))
+
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(None)    # Page object, needs the id of the page tree
+        page_ids.append((len(objects), content_id))
+
+    objects.append(None)        # Page tree
+    pages_id = len(objects)
+    for page_id, content_id in page_ids:
+        objects[page_id - 1] = (b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R >>"
+                                % (pages_id, width, height, content_id))
+    objects[pages_id - 1] = (b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                             % (b" ".join(b"%d 0 R" % page_id for page_id, _ in page_ids), len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    catalog_id = len(objects)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
+
+
+def encode(fmt="png", image=None, strokes=b"", level=None, size=None):
+    """ Encode a single page in a format and return the encoded bytes
+
+    Keyword arguments:
+        fmt     - one of FORMATS
+        image   - mirrored BGR image, needed for raster formats
+        strokes - packed journal segment records, needed for vector formats
+        level   - compression level for raster formats
+        size    - (width, height) of the whiteboard screen, needed for vector formats
+    """
+    if fmt in RASTER_FORMATS:
+        return encode_raster(image, fmt, level)
+    width, height = size
+    if fmt == "svg":
+        return encode_svg(strokes, width, height)
+    if fmt == "pdf":
+        return encode_pdf([strokes], width, height)
+    raise ValueError("Unsupported export format: " + fmt)
+
+
+def _write(path="", data=b""):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def export_job(path="", fmt="png", image=None, strokes=b"", level=None, size=None):
+    """ Encode a page and write it to a file, executed in a worker process
+
+    Returns a tuple (path, size in bytes, encoding time in seconds).
+
+    Keyword arguments:
+        path    - target file path
+        fmt     - one of FORMATS
+        image   - mirrored BGR image, needed for raster formats
+        strokes - packed journal segment records, needed for vector formats
+        level   - compression level for raster formats
+        size    - (width, height) of the whiteboard screen, needed for vector formats
+    """
+    start = time.perf_counter()
+    data = encode(fmt, image, strokes, level, size)
+    seconds = time.perf_counter() - start
+    _write(path, data)
+    return path, len(data), seconds
+
+
+def export_pdf_job(path="", pages=None, size=None):
+    """ Encode several stroke lists as multi-page PDF and write it to a file, executed in a worker process
+
+    Returns a tuple (path, size in bytes, encoding time in seconds).
+
+    Keyword arguments:
+        path    - target file path
+        pages   - list of packed journal segment records, one entry per page
+        size    - (width, height) of the whiteboard screen
+    """
+    start = time.perf_counter()
+    data = encode_pdf(pages, size[0], size[1])
+    seconds = time.perf_counter() - start
+    _write(path, data)
+    return path, len(data), seconds
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Exporter:
+    """ Process pool producing exports concurrently """
+
+    def __init__(self, workers=None, levels=None):
+        """ Configure the exporter, the process pool is created on first use
+
+        Keyword arguments:
+            workers - number of worker processes, None for the number of CPUs
+            levels  - compression levels per raster format, merged into DEFAULT_LEVELS
+        """
+        self.workers = workers
+        self.levels = dict(DEFAULT_LEVELS, **(levels or {}))
+        self._pool = None
+
+    def _executor(self):
+        # Spawned workers do not inherit the threads (capture, hand tracking) of the main process
+        if self._pool is None:
+            self._pool = cf.ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+        return self._pool
+
+    def _submit(self, func=None, *args):
+        try:
+            return self._executor().submit(func, *args)
+        except cf.BrokenExecutor:
+            # A crashed worker process breaks the pool, the failed jobs have been reported by their futures
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            return self._executor().submit(func, *args)
+
+    def submit(self, path="", image=None, strokes=b"", formats=None):
+        """ Export a page to one or more formats and return the futures of all jobs
+
+        Without @ref formats, the format is taken from the extension of @ref path. Otherwise, @ref path is
+        the base path and the format extensions are appended.
+
+        Keyword arguments:
+            path    - target file path or base path
+            image   - mirrored BGR image of the whiteboard screen
+            strokes - packed journal segment records
+            formats - list of formats
+        """
+        if formats is None:
+            fmt = format_of(path)
+            if fmt is None:
+                raise ValueError("Unsupported export format: " + path)
+            jobs = [(path, fmt)]
+        else:
+            jobs = [(path + "." + fmt, fmt) for fmt in formats]
+
+        return [self._submit_page(target, fmt, image, strokes) for target, fmt in jobs]
+
+    def _submit_page(self, path="", fmt="png", image=None, strokes=b""):
+        # Only send the data a job needs to the worker process
+        if fmt in RASTER_FORMATS:
+            return self._submit(export_job, path, fmt, image, b"", self.levels.get(fmt))
+        size = (image.shape[1], image.shape[0])
+        return self._submit(export_job, path, fmt, None, bytes(strokes), None, size)
+
+    def submit_pages(self, path="", pages=None, formats=None):
+        """ Export several pages, raster formats get one file per page, PDF one file with all pages
+
+        Keyword arguments:
+            path    - base path, page numbers and format extensions are appended
+            pages   - list of (mirrored BGR image, packed journal segment records)
+            formats - list of formats
+        """
+        futures = []
+        for fmt in formats:
+            if fmt == "pdf":
+                size = (pages[0][0].shape[1], pages[0][0].shape[0])
+                futures.append(self._submit(export_pdf_job, path + ".pdf",
+                                                       [bytes(s) for _, s in pages], size))
+                continue
+            for number, (image, strokes) in enumerate(pages, start=1):
+                futures.append(self._submit_page("{}_{}.{}".format(path, number, fmt), fmt, image, strokes))
+        return futures
+
+    def shutdown(self, wait=True):
+        """ Shut down the process pool
+
+        Keyword arguments:
+            wait    - wait for pending exports to finish
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
@@ -0,0 +1,450 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Gallery of the "Saves" directory
+
+Thumbnails of all saved images and sessions are kept in an on-disk cache (Saves/.thumbs), keyed by path,
+modification time and size. A persistent index allows the gallery to be shown immediately, while a
+background worker creates missing or outdated thumbnails incrementally.
+
+The gallery overlay is navigated with the index fingertip: holding the SELECT gesture over an item for a
+moment activates it. Mouse clicks work as well.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import collections                      # Least recently used thumbnails
+import hashlib                          # Thumbnail file names
+import json                             # Persistent index
+import os                               # Filesystem
+import threading                        # Background worker
+
+import cv2 as cv                        # Thumbnail creation and drawing
+import numpy as np                      # Thumbnail buffers
+
+from whiteboard import loader as ld     # Reduced image decoding
+from whiteboard import session as ss    # Session thumbnails
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+THUMBS_SUB_FOLDER = ".thumbs"
+INDEX_FILE = "index.json"
+INDEX_SAVE_EVERY = 25
+
+# Increased when existing thumbnails have to be created again, e.g. 2 for mirrored session thumbnails
+INDEX_VERSION = 2
+
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".webp", ss.FILE_EXTENSION)
+
+THUMB_SIZE = (192, 108)
+
+# Thumbnail images kept in memory, at least one gallery page
+MAX_IMAGES = 256
+CELL_MARGIN = 24
+CONTROL_SIZE = (125, 50)
+DWELL_FRAMES = 12
+
+# Colors
+BLACK = (0, 0, 0)
+DARK_GRAY = (63, 63, 63)
+GRAY = (127, 127, 127)
+LIGHT_GRAY = (223, 223, 223)
+WHITE = (255, 255, 255)
+HIGHLIGHT = (255, 127, 0)
+
+FONT = cv.FONT_HERSHEY_SIMPLEX
+LINE_TYPE = cv.LINE_AA
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def make_thumbnail(path="", size=THUMB_SIZE):
+    """ Create a thumbnail of an image or session file, None if the file cannot be read
+
+    Keyword arguments:
+        path    - file path
+        size    - (width, height) of the thumbnail
+    """
+    if ss.is_session_file(path):
+        try:
+            session = ss.SessionReader(path)
+        except (OSError, ValueError):
+            return None
+        # Sessions store the unmirrored board, saved images and the gallery show it mirrored
+        image = cv.flip(session.thumbnail(*fit_size(session.width, session.height, size)), 1)
+        session.close()
+    else:
+        image = cv.imread(path, ld.reduced_read_flag(ld.read_image_size(path), size[0], size[1]))
+    if image is None:
+        return None
+    return fit_thumbnail(image, size)
+
+
+def fit_size(width=0, height=0, size=THUMB_SIZE):
+    """ Get the (width, height) of an image scaled into a thumbnail with the aspect ratio kept
+
+    Keyword arguments:
+        width   - width of the image
+        height  - height of the image
+        size    - (width, height) of the thumbnail
+    """
+    factor = min(size[0] / width, size[1] / height)
+    return max(1, int(width * factor)), max(1, int(height * factor))
+
+
+def fit_thumbnail(image=None, size=THUMB_SIZE):
+    """ Create a thumbnail of an image, centered on white with the aspect ratio kept
+
+    Keyword arguments:
+        image   - BGR image
+        size    - (width, height) of the thumbnail
+    """
+    thumb = np.full((size[1], size[0], 3), WHITE, np.uint8)
+    width, height = fit_size(image.shape[1], image.shape[0], size)
+    x = (size[0] - width) // 2
+    y = (size[1] - height) // 2
+    thumb[y:y + height, x:x + width] = cv.resize(image, (width, height), interpolation=cv.INTER_AREA)
+    return thumb
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class ThumbnailCache:
+    """ On-disk thumbnail cache with a persistent index and a background worker """
+
+    def __init__(self, directory="", size=THUMB_SIZE, max_images=MAX_IMAGES):
+        """ Load the persistent index
+
+        Keyword arguments:
+            directory   - directory with saved images and sessions
+            size        - (width, height) of the thumbnails
+            max_images  - number of thumbnail images kept in memory, the least recently used are dropped
+        """
+        self.directory = directory
+        self.cache_dir = os.path.join(directory, THUMBS_SUB_FOLDER)
+        self.size = size
+        self.max_images = max_images
+
+        self._lock = threading.Lock()
+        self._index = self._read_index()
+        self._images = collections.OrderedDict()
+        self._thread = None
+        self._rescan = False
+
+    # ----- Index -----
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("size") == list(self.size) and index.get("version") == INDEX_VERSION:
+                return index.get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def _write_index(self):
+        with self._lock:
+            data = {"version": INDEX_VERSION, "size": list(self.size), "entries": dict(self._index)}
+
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def entries(self):
+        """ Get all indexed file names, latest first """
+        with self._lock:
+            items = [(entry["mtime"], name) for name, entry in self._index.items() if entry.get("thumb")]
+        return [name for _, name in sorted(items, reverse=True)]
+
+    def thumbnail(self, name=""):
+        """ Get the thumbnail image of an indexed file, None if it is not available (yet)
+
+        Keyword arguments:
+            name    - file name relative to the saves directory
+        """
+        with self._lock:
+            entry = self._index.get(name)
+        if entry is None or not entry.get("thumb"):
+            return None
+
+        thumb = entry["thumb"]
+        with self._lock:
+            image = self._images.get(thumb)
+            if image is not None:
+                self._images.move_to_end(thumb)
+                return image
+
+        image = cv.imread(os.path.join(self.cache_dir, thumb))
+        if image is not None:
+            with self._lock:
+                self._images[thumb] = image
+                while len(self._images) > self.max_images:
+                    self._images.popitem(last=False)
+        return image
+
+    # ----- Background worker -----
+
+    def refresh(self):
+        """ Start the background worker updating the cache, a running worker scans the directory once more """
+        # The worker checks for a rescan and ends under the lock, so no request is lost
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._rescan = True
+                return
+
+            self._rescan = False
+            self._thread = threading.Thread(target=self._worker, name="thumbnail-cache", daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        os.makedirs(self.cache_dir, mode=0o755, exist_ok=True)
+
+        while True:
+            try:
+                files = [e for e in os.scandir(self.directory)
+                         if e.is_file() and e.name.lower().endswith(IMAGE_EXTENSIONS)]
+            except FileNotFoundError:
+                files = []
+
+            names = set()
+            changed = 0
+            for e in files:
+                names.add(e.name)
+                stat = e.stat()
+                with self._lock:
+                    entry = self._index.get(e.name)
+                if entry is not None and entry["mtime"] == stat.st_mtime_ns and entry["bytes"] == stat.st_size:
+                    continue
+
+                # Thumbnails are named after path, modification time and size
+                key = "{}|{}|{}".format(e.path, stat.st_mtime_ns, stat.st_size)
+                thumb_name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20] + ".png"
+                thumb = make_thumbnail(e.path, self.size)
+                if thumb is None or not cv.imwrite(os.path.join(self.cache_dir, thumb_name), thumb):
+                    thumb_name = ""
+
+                with self._lock:
+                    old = self._index.get(e.name)
+                    self._index[e.name] = {"mtime": stat.st_mtime_ns, "bytes": stat.st_size, "thumb": thumb_name}
+                if old and old.get("thumb") and old["thumb"] != thumb_name:
+                    self._remove_thumb(old["thumb"])
+
+                changed += 1
+                if changed % INDEX_SAVE_EVERY == 0:
+                    self._write_index()
+
+            # Drop entries of deleted files
+            with self._lock:
+                removed = [(name, entry) for name, entry in self._index.items() if name not in names]
+                for name, _ in removed:
+                    del self._index[name]
+            for _, entry in removed:
+                if entry.get("thumb"):
+                    self._remove_thumb(entry["thumb"])
+
+            if changed or removed:
+                self._write_index()
+
+            with self._lock:
+                if not self._rescan:
+                    self._thread = None
+                    return
+                self._rescan = False
+
+    def _remove_thumb(self, thumb=""):
+        with self._lock:
+            self._images.pop(thumb, None)
+        try:
+            os.remove(os.path.join(self.cache_dir, thumb))
+        except OSError:
+            pass
+
+
+class Gallery:
+    """ Overlay showing the thumbnail cache as paged grid """
+
+    def __init__(self, cache=None, width=0, height=0, off_x=0, off_y=0):
+        """ Create the gallery layout
+
+        Keyword arguments:
+            cache   - ThumbnailCache instance
+            width   - width of the area covered by the gallery
+            height  - height of the area covered by the gallery
+            off_x   - x-offset of the area on the whiteboard screen
+            off_y   - y-offset of the area on the whiteboard screen
+        """
+        self.cache = cache
+        self.is_open = False
+        self.page = 0
+
+        self._hover = None
+        self._dwell = 0
+
+        self.x = off_x
+        self.y = off_y
+        self.width = width
+        self.height = height
+
+        thumb_w, thumb_h = cache.size
+        self.cols = max(1, (width - CELL_MARGIN) // (thumb_w + CELL_MARGIN))
+        self.rows = max(1, (height - CONTROL_SIZE[1] - CELL_MARGIN * 2) // (thumb_h + CELL_MARGIN))
+
+        # A shown page never has to be read from disk again
+        cache.max_images = max(cache.max_images, self.cols * self.rows)
+
+    def open(self):
+        """ Show the gallery and update the thumbnail cache in the background """
+        self.is_open = True
+        self.page = 0
+        self._hover = None
+        self._dwell = 0
+        self.cache.refresh()
+
+    def close(self):
+        """ Hide the gallery """
+        self.is_open = False
+
+    # ----- Layout -----
+
+    def _targets(self, names=None):
+        """ Get all clickable areas of the current page as list of (target, x, y, width, height) """
+        thumb_w, thumb_h = self.cache.size
+        per_page = self.cols * self.rows
+        start = self.page * per_page
+
+        targets = []
+        for i, name in enumerate(names[start:start + per_page]):
+            col = i % self.cols
+            row = i // self.cols
+            x = self.x + CELL_MARGIN + col * (thumb_w + CELL_MARGIN)
+            y = self.y + CELL_MARGIN + row * (thumb_h + CELL_MARGIN)
+            targets.append((("load", name), x, y, thumb_w, thumb_h))
+
+        control_y = self.y + self.height - CONTROL_SIZE[1] - CELL_MARGIN
+        for i, control in enumerate(("<", ">", "Browse", "Close")):
+            x = self.x + CELL_MARGIN + i * (CONTROL_SIZE[0] + CELL_MARGIN)
+            targets.append(((control,), x, control_y, CONTROL_SIZE[0], CONTROL_SIZE[1]))
+
+        return targets
+
+    def _target_at(self, pos=None, names=None):
+        if pos is None:
+            return None
+        for target, x, y, width, height in self._targets(names):
+            if x <= pos[0] <= x + width and y <= pos[1] <= y + height:
+                return target
+        return None
+
+    # ----- Interaction -----
+
+    def _activate(self, target=None, names=None):
+        """ Execute a target and return an action for the caller: ("load", path), ("browse",) or None """
+        per_page = self.cols * self.rows
+        pages = max(1, -(-len(names) // per_page))
+
+        if target[0] == "load":
+            self.close()
+            return "load", os.path.join(self.cache.directory, target[1])
+        if target[0] == "<":
+            self.page = (self.page - 1) % pages
+        elif target[0] == ">":
+            self.page = (self.page + 1) % pages
+        elif target[0] == "Browse":
+            self.close()
+            return ("browse",)
+        elif target[0] == "Close":
+            self.close()
+        return None
+
+    def pointer(self, pos=None, selecting=False):
+        """ Update the pointer position and return an action once an item has been selected long enough
+
+        Keyword arguments:
+            pos         - pointer position on the displayed (mirrored) whiteboard screen, None if absent
+            selecting   - True if the SELECT gesture is currently shown
+        """
+        names = self.cache.entries()
+        target = self._target_at(pos, names)
+
+        if target is None or target != self._hover or not selecting:
+            self._hover = target
+            self._dwell = 0
+            return None
+
+        self._dwell += 1
+        if self._dwell < DWELL_FRAMES:
+            return None
+
+        self._dwell = 0
+        return self._activate(target, names)
+
+    def click(self, pos=None):
+        """ Activate the item at a mouse position and return the resulting action
+
+        Keyword arguments:
+            pos - mouse position on the displayed whiteboard screen
+        """
+        names = self.cache.entries()
+        target = self._target_at(pos, names)
+        if target is None:
+            return None
+        return self._activate(target, names)
+
+    # ----- Rendering -----
+
+    def render(self, screen=None):
+        """ Draw the gallery onto the displayed (mirrored) whiteboard screen
+
+        Keyword arguments:
+            screen  - displayed whiteboard screen
+        """
+        names = self.cache.entries()
+        area = screen[self.y:self.y + self.height, self.x:self.x + self.width]
+        area[:] = LIGHT_GRAY
+
+        if not names:
+            cv.putText(screen, "No saved images (yet)", (self.x + CELL_MARGIN, self.y + CELL_MARGIN * 3),
+                       FONT, 1, DARK_GRAY, 2, LINE_TYPE)
+
+        for target, x, y, width, height in self._targets(names):
+            if target[0] == "load":
+                thumb = self.cache.thumbnail(target[1])
+                if thumb is not None and thumb.shape[:2] == (height, width):
+                    screen[y:y + height, x:x + width] = thumb
+                else:
+                    screen[y:y + height, x:x + width] = GRAY
+                label = target[1] if len(target[1]) <= 24 else target[1][:21] + "..."
+                cv.putText(screen, label, (x, y + height + 16), FONT, 0.45, BLACK, 1, LINE_TYPE)
+            else:
+                screen[y:y + height, x:x + width] = DARK_GRAY if target == self._hover else GRAY
+                label_size = cv.getTextSize(target[0], FONT, 1, 2)[0]
+                cv.putText(screen, target[0], (x + (width - label_size[0]) // 2, y + (height + label_size[1]) // 2),
+                           FONT, 1, WHITE, 2, LINE_TYPE)
+
+            # Highlight the hovered item and show the selection progress
+            if target == self._hover:
+                cv.rectangle(screen, (x - 3, y - 3), (x + width + 3, y + height + 3), HIGHLIGHT, 3, LINE_TYPE)
+                if self._dwell:
+                    progress = int(width * self._dwell / DWELL_FRAMES)
+                    screen[y + height - 6:y + height, x:x + progress] = HIGHLIGHT
+
+        per_page = self.cols * self.rows
+        pages = max(1, -(-len(names) // per_page))
+        cv.putText(screen, "Page {}/{}".format(self.page % pages + 1, pages),
+                   (self.x + CELL_MARGIN + 4 * (CONTROL_SIZE[0] + CELL_MARGIN),
+                    self.y + self.height - CELL_MARGIN - CONTROL_SIZE[1] // 3),
+                   FONT, 0.75, DARK_GRAY, 2, LINE_TYPE)
@@ -0,0 +1,242 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Hand gesture recognition
+
+Classification of the 21 (or 42 for two hands) hand landmarks into the gestures of the whiteboard.
+Landmarks are given in pixel coordinates of the capture device.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import math                             # Calculations
+
+import numpy as np                      # Calculations
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# Calculations
+BUG_TOL = 50
+COLOR_TOL = 25
+ERASE_TOL = 40
+HAND_INDICES = 21
+SELECT_TOL = 40
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def distance(pos1=None, pos2=None):
+    """ Calculate the euclidean distance between two hand landmarks
+
+    Keyword arguments:
+        pos1    - hand landmark with x- and y-coordinates
+        pos2    - hand landmark with x- and y-coordinates
+    """
+    return math.sqrt((pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2)
+
+
+def point_is_in_rectangle(coord=None, x=0, y=0, width=0, height=0):
+    """ Calculate if a given point @ref coord is inside a given rectangle shaped area
+
+    Keyword arguments:
+        coord   - current mouse position
+        x       - absolute x-offset of the rectangle according to the whiteboard screen
+        y       - absolute y-offset of the rectangle according to the whiteboard screen
+        width   - width of the rectangle
+        height  - height of the rectangle
+    """
+    return (x <= coord[0] <= (x + width)) and (y <= coord[1] <= (y + height))
+
+
+def calc_hand_rotation_angle(lmx_n, lmy_n, offset):
+    """ Calculate the hand rotation angle according to the current hand landmarks
+
+    Keyword arguments:
+        lmx_n   - hand landmark x coordinates
+        lmy_n   - hand landmark y coordinates
+        offset  - statically given offset
+    """
+    off = 21 * offset
+
+    # Calculate angle
+    ang = math.acos(abs(lmy_n[5 + off] - lmy_n[0 + off]) / abs(
+        math.sqrt((lmy_n[5 + off] - lmy_n[0 + off]) ** 2 + (lmx_n[5 + off] - lmx_n[0 + off]) ** 2)))
+
+    # Rotation over 90°
+    if lmy_n[0 + off] < lmy_n[5 + off]:
+        ang = math.pi / 2 + (math.pi / 2 - ang)
+
+    # Rotation anticlockwise
+    if lmx_n[0 + off] < lmx_n[5 + off]:
+        ang *= -1
+
+    # Offset for left or right hand
+
+    # Up
+    if abs(ang) <= .25 * math.pi:
+        if lmx_n[5 + off] > lmx_n[17 + off]:
+            ang += .5
+        else:
+            ang -= .5
+
+    # Right
+    elif .25 * math.pi < ang < .75 * math.pi:
+        if lmy_n[5 + off] < lmy_n[17 + off]:
+            ang += .5
+        else:
+            ang -= .5
+
+    # Down
+    elif abs(ang) >= .75 * math.pi:
+        if lmx_n[5 + off] < lmx_n[17 + off]:
+            ang += .5
+        else:
+            ang -= .5
+
+    # Left
+    elif -.25 * math.pi > ang > -.75 * math.pi:
+        if lmy_n[5 + off] > lmy_n[17 + off]:
+            ang += .5
+        else:
+            ang -= .5
+
+    return ang
+
+
+def check_user_gesture(landmarks=None):
+    """ Check the image for a hand gesture and distinguish between them
+
+    Keyword arguments:
+        landmarks - hand landmarks
+    """
+    draw_flag = False
+    select_flag = False
+    erase_flag = False
+    color_flag = False
+    zoom_flag = False
+
+    # Split x and y coordinates into two separate arrays
+    lm = np.array(landmarks)
+    lmx_n, lmy_n = zip(*lm)
+
+    # Arrays for separate x and y coordinates
+    lmx = []
+    lmy = []
+
+    # Rotation
+    ang0 = calc_hand_rotation_angle(lmx_n, lmy_n, 0)
+
+    for i in range(21):
+        x = lmx_n[i]
+        y = lmy_n[i]
+        lmx.append(math.cos(ang0) * x - math.sin(ang0) * y)
+        lmy.append(math.sin(ang0) * x + math.cos(ang0) * y)
+
+    if len(lmx_n) > 21:
+        ang1 = calc_hand_rotation_angle(lmx_n, lmy_n, 1)
+        for i in range(21, 42):
+            x = lmx_n[i]
+            y = lmy_n[i]
+            lmx.append(math.cos(ang1) * x - math.sin(ang1) * y)
+            lmy.append(math.sin(ang1) * x + math.cos(ang1) * y)
+
+    # Check if only one hand has been listed
+    if len(lm) != 42:
+        # Gesture: DRAW
+        for e in lmy[:6] + lmy[9:HAND_INDICES]:
+            if e > lmy[6]:
+                draw_flag = True
+            else:
+                draw_flag = False
+                break
+
+        # Gesture: SELECT
+        if draw_flag:
+            if distance(lm[4], lm[6]) > SELECT_TOL:
+                draw_flag = False
+                select_flag = True
+
+        # Gesture SELECT COLOR
+        for e in lmy[:12] + lmy[13:HAND_INDICES]:
+            if e > lmy[12] and distance(lm[8], lm[12]) < COLOR_TOL:
+                color_flag = True
+            else:
+                color_flag = False
+                break
+
+        # Gesture: ERASE
+        if color_flag and distance(lm[4], lm[5]) < ERASE_TOL:
+            erase_flag = True
+
+    # Otherwise, check for a two hand interaction
+    else:
+        # Gesture: ZOOM
+        if distance(lm[0], lm[HAND_INDICES]) > BUG_TOL:
+            if distance(lm[4], lm[8]) > 50 and distance(lm[HAND_INDICES + 4], lm[HAND_INDICES + 8]) > 50:
+                for e, f in zip(lmy[:6] + lmy[9:HAND_INDICES],
+                                lmy[HAND_INDICES:HAND_INDICES + 6] + lmy[HAND_INDICES + 9:]):
+                    if e > lmy[6] and f > lmy[HAND_INDICES + 6]:
+                        zoom_flag = True
+                    else:
+                        zoom_flag = False
+                        break
+
+    # Return gesture according to set flags
+    if draw_flag:
+        return "draw"
+    if select_flag:
+        return "select"
+    if erase_flag:
+        return "erase"
+    if color_flag:
+        # Gesture: SWITCH COLOR
+        if lmy[16] < lmy[14] and lmy[20] < lmy[18]:
+            return "switch color"
+        return "select color"
+    if zoom_flag:
+        return "zoom"
+
+    return "unknown"
+
+
+def determine_right_left(landmarks=None):
+    """ Rearrange the order of the hand landmarks to be right hand first
+
+    Keyword arguments:
+        landmarks - hand landmarks
+    """
+    if len(landmarks) == HAND_INDICES * 2:
+        if landmarks[5][0] < landmarks[17][0]:
+            landmarks_left = landmarks[:HAND_INDICES]
+            landmarks_right = landmarks[HAND_INDICES:]
+            return landmarks_right + landmarks_left
+
+    return landmarks
+
+
+def landmarks_from_results(results=None, cam_width=0, cam_height=0):
+    """ Convert hand tracking results into a list of [x, y] pixel coordinates, None if no hand was found
+
+    Keyword arguments:
+        results     - results of mp.solutions.hands.Hands.process or a compatible tracker
+        cam_width   - width of the capture device
+        cam_height  - height of the capture device
+    """
+    if results is None or not results.multi_hand_landmarks:
+        return None
+
+    landmarks = []
+    for hand_landmarks in results.multi_hand_landmarks:
+        for lm in hand_landmarks.landmark:
+            # Adjust hand gesture coordinates to absolute frame values instead of a value between 0 and 1
+            landmarks.append([int(lm.x * cam_width), int(lm.y * cam_height)])
+    return landmarks
@@ -0,0 +1,133 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Multi-board host
+
+Runs several independent whiteboards in one process, e.g. one per classroom camera. Every board has its own
+capture source and hand tracker, the frames of all boards are processed on a shared worker pool. Hand
+tracking and image processing release the GIL, so the boards of one host scale with the number of cores.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import concurrent.futures as cf         # Shared inference pool
+import os                               # CPU count
+
+import cv2 as cv                        # Color conversion
+
+from whiteboard import buffers as bf    # Frame buffer pool
+from whiteboard import gestures as gs   # Landmark conversion
+from whiteboard import tracking as tr   # Hand tracking backends
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class HostedBoard:
+    """ A whiteboard together with its capture source, hand tracker and output """
+
+    def __init__(self, board=None, source=None, tracker=None, sink=None):
+        """ Bundle a board with its input and output
+
+        Keyword arguments:
+            board   - whiteboard engine
+            source  - capture device with isOpened/read/release
+            tracker - hand tracker with process, e.g. mp.solutions.hands.Hands
+            sink    - called with the composed whiteboard screen of every frame, may be None
+        """
+        self.board = board
+        self.source = source
+        self.tracker = tracker
+        self.sink = sink
+        self.buffers = bf.BufferPool()
+        self.frames = 0
+        self.finished = False
+
+    def step(self):
+        """ Read, track and render one frame, returns False at the end of the source """
+        if self.finished or not self.source.isOpened():
+            self.finished = True
+            return False
+
+        success, frame = self.buffers.read("capture", self.source)
+        if not success:
+            self.finished = True
+            return False
+
+        results = self.tracker.process(cv.cvtColor(frame, cv.COLOR_BGR2RGB, dst=self.buffers.like("rgb", frame)))
+        landmarks = gs.landmarks_from_results(results, self.board.cam_width, self.board.cam_height)
+
+        output = self.board.step(frame, landmarks)
+        if self.sink is not None:
+            self.sink(output)
+
+        self.frames += 1
+        return True
+
+
+class BoardHost:
+    """ Host several whiteboards with a shared worker pool """
+
+    def __init__(self, workers=None, backend=tr.DEFAULT_BACKEND, tracker_factory=None):
+        """ Create an empty host
+
+        Keyword arguments:
+            workers         - number of worker threads, the number of cores by default
+            backend         - hand tracking backend of boards added without a tracker, see tracking.BACKENDS
+            tracker_factory - creates the hand tracker of boards added without one with the default model
+                              settings, the factory of the backend by default
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.tracker_factory = tracker_factory or tr.BACKENDS[backend]
+        self.boards = []
+        self._pool = cf.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="board")
+
+    def add(self, board=None, source=None, sink=None, tracker=None):
+        """ Add a board and return its HostedBoard
+
+        Keyword arguments:
+            board   - whiteboard engine
+            source  - capture device with isOpened/read/release
+            sink    - called with the composed whiteboard screen of every frame, may be None
+            tracker - hand tracker with process, created by the tracker factory by default
+        """
+        # Trackers keep state between frames and are not shared between boards
+        if tracker is None:
+            tracker = self.tracker_factory()
+
+        hosted = HostedBoard(board, source, tracker, sink)
+        self.boards.append(hosted)
+        return hosted
+
+    def step(self):
+        """ Step all running boards once in parallel, returns the number of boards that processed a frame """
+        running = [b for b in self.boards if not b.finished]
+        return sum(future.result() for future in [self._pool.submit(b.step) for b in running])
+
+    def run(self, max_frames=0):
+        """ Step all boards until every source has ended
+
+        Keyword arguments:
+            max_frames  - stop after this number of steps, 0 to run until the end of all sources
+        """
+        steps = 0
+        while self.step():
+            steps += 1
+            if max_frames and steps >= max_frames:
+                break
+        return steps
+
+    def close(self):
+        """ Stop the worker pool and release all sources, trackers and boards """
+        self._pool.shutdown()
+        for hosted in self.boards:
+            hosted.source.release()
+            if hasattr(hosted.tracker, "close"):
+                hosted.tracker.close()
+            hosted.board.close()
+        self.boards = []
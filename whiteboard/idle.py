@@ -0,0 +1,111 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Idle mode
+
+Saves power while nobody is at the board. After a number of frames without hands, the whiteboard enters
+the idle state: hand detection only runs at a reduced rate on a downscaled frame, and the whiteboard screen
+is only composed and displayed again if it changes (mouse, loaded image, ...). As soon as a hand is found,
+the whiteboard wakes up and runs at the full rate again with the same frame.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import time                             # Idle rate
+
+import cv2 as cv                        # Downscaling
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# Frames without hands before the idle state is entered
+IDLE_AFTER = 300
+
+# Rate and frame scaling of the hand detection in the idle state
+IDLE_FPS = 4
+IDLE_SCALE = 0.5
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class IdleMonitor:
+    """ Track frames without hands and pace the hand detection in the idle state """
+
+    def __init__(self, idle_after=IDLE_AFTER, idle_fps=IDLE_FPS, idle_scale=IDLE_SCALE):
+        """ Create the monitor, the whiteboard starts active
+
+        Keyword arguments:
+            idle_after  - frames without hands before the idle state is entered, 0 to never enter it
+            idle_fps    - rate of the hand detection in the idle state
+            idle_scale  - scaling factor of the frames passed to the hand detection in the idle state
+        """
+        self.idle_after = idle_after
+        self.idle_fps = idle_fps
+        self.idle_scale = idle_scale
+
+        self.idle = False
+        self.frames_without_hands = 0
+
+        # Counters for the log
+        self.idle_frames = 0
+        self.active_frames = 0
+        self.wake_ups = 0
+
+        self._next = 0.0
+
+    def prepare(self, frame=None):
+        """ Get the frame to pass to the hand detection, downscaled in the idle state
+
+        Keyword arguments:
+            frame   - captured frame of camera device
+        """
+        if not self.idle or self.idle_scale >= 1:
+            return frame
+        return cv.resize(frame, None, fx=self.idle_scale, fy=self.idle_scale, interpolation=cv.INTER_AREA)
+
+    def update(self, hands_found=False):
+        """ Count the frame and switch the state, returns True if the state has changed
+
+        Keyword arguments:
+            hands_found - True, if the hand detection found a hand in the frame
+        """
+        if self.idle:
+            self.idle_frames += 1
+        else:
+            self.active_frames += 1
+
+        if hands_found:
+            self.frames_without_hands = 0
+            if self.idle:
+                # Wake up instantly with the frame the hand was found in
+                self.idle = False
+                self.wake_ups += 1
+                return True
+            return False
+
+        self.frames_without_hands += 1
+        if not self.idle and self.idle_after and self.frames_without_hands >= self.idle_after:
+            self.idle = True
+            self._next = time.perf_counter()
+            return True
+        return False
+
+    def delay(self):
+        """ Get the milliseconds until the next hand detection in the idle state, 0 while active """
+        if not self.idle:
+            return 0
+
+        self._next = max(self._next + 1 / self.idle_fps, time.perf_counter())
+        return max(1, round((self._next - time.perf_counter()) * 1000))
+
+    def __repr__(self):
+        return "{} active frames, {} idle frames, {} wake-ups".format(
+            self.active_frames, self.idle_frames, self.wake_ups)
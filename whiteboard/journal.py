@@ -0,0 +1,458 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Stroke journal
+
+Every operation on the whiteboard (draw, erase, clear, color change, load) is appended to a compact
+binary journal. A background writer thread flushes the journal and calls fsync periodically, and raster
+checkpoints are written every few thousand operations to keep the replay time bounded.
+
+Journal and checkpoint files share a generation number:
+
+    journal-<generation>.bin    - operations made after checkpoint <generation>
+    checkpoint-<generation>.png - full board at the time the generation started
+
+On startup the board is restored from the latest complete checkpoint plus all journals of the same
+or a newer generation.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import os                               # Filesystem
+import queue                            # Writer thread communication
+import struct                           # Binary records
+import threading                        # Background writer
+import time                             # Flush intervals
+
+import cv2 as cv                        # Checkpoint encoding
+import numpy as np                      # Board buffers
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# File layout
+JOURNAL_MAGIC = b"WBJ1"
+JOURNAL_PREFIX = "journal-"
+CHECKPOINT_PREFIX = "checkpoint-"
+
+# Header: magic, generation, board width, board height
+HEADER = struct.Struct("<4sIHH")
+
+# Operation codes
+OP_DRAW = 1
+OP_ERASE = 2
+OP_CLEAR = 3
+OP_COLOR = 4
+OP_LOAD = 5
+
+# Records
+SEGMENT = struct.Struct("<B4h3BB")      # op, x1, y1, x2, y2, b, g, r, thickness
+COLOR = struct.Struct("<BB")            # op, color key
+CLEAR = struct.Struct("<B")             # op
+LOAD = struct.Struct("<BH")             # op, length of the utf-8 encoded path that follows
+
+WHITE = (255, 255, 255)
+
+# Defaults
+FSYNC_INTERVAL = 1.0
+CHECKPOINT_OPS = 5000
+CHECKPOINT_INTERVAL = 60.0
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def journal_path(directory="", generation=0):
+    """ Get the path of the journal file of a generation
+
+    Keyword arguments:
+        directory   - journal directory
+        generation  - generation number
+    """
+    return os.path.join(directory, "{}{:08d}.bin".format(JOURNAL_PREFIX, generation))
+
+
+def checkpoint_path(directory="", generation=0):
+    """ Get the path of the checkpoint file of a generation
+
+    Keyword arguments:
+        directory   - journal directory
+        generation  - generation number
+    """
+    return os.path.join(directory, "{}{:08d}.png".format(CHECKPOINT_PREFIX, generation))
+
+
+def list_generations(directory="", prefix=""):
+    """ List all generation numbers of files with the given prefix in ascending order
+
+    Keyword arguments:
+        directory   - journal directory
+        prefix      - file prefix (JOURNAL_PREFIX or CHECKPOINT_PREFIX)
+    """
+    generations = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return generations
+
+    for name in names:
+        if name.startswith(prefix) and not name.endswith(".tmp"):
+            try:
+                generations.append(int(name[len(prefix):].split(".")[0]))
+            except ValueError:
+                pass
+
+    return sorted(generations)
+
+
+def pack_segment(op=OP_DRAW, start=None, end=None, col=None, thickness=2):
+    """ Pack a line segment into a binary record
+
+    Keyword arguments:
+        op          - OP_DRAW or OP_ERASE
+        start       - start point of the line in board coordinates
+        end         - end point of the line in board coordinates
+        col         - BGR color of the line, None is drawn black by OpenCV
+        thickness   - thickness of the line
+    """
+    b, g, r = col if col is not None else (0, 0, 0)
+    return SEGMENT.pack(op, int(start[0]), int(start[1]), int(end[0]), int(end[1]), b, g, r,
+                        max(1, min(255, int(thickness))))
+
+
+def iter_records(data=b""):
+    """ Iterate over the binary records of a journal body
+
+    A truncated record at the end, e.g. after a power loss, terminates the iteration.
+
+    Keyword arguments:
+        data    - journal content without header
+    """
+    pos = 0
+    size = len(data)
+    while pos < size:
+        op = data[pos]
+        if op in (OP_DRAW, OP_ERASE):
+            if pos + SEGMENT.size > size:
+                return
+            _, x1, y1, x2, y2, b, g, r, thickness = SEGMENT.unpack_from(data, pos)
+            pos += SEGMENT.size
+            yield op, ((x1, y1), (x2, y2), (b, g, r), thickness)
+        elif op == OP_COLOR:
+            if pos + COLOR.size > size:
+                return
+            yield op, COLOR.unpack_from(data, pos)[1]
+            pos += COLOR.size
+        elif op == OP_CLEAR:
+            pos += CLEAR.size
+            yield op, None
+        elif op == OP_LOAD:
+            if pos + LOAD.size > size:
+                return
+            length = LOAD.unpack_from(data, pos)[1]
+            if pos + LOAD.size + length > size:
+                return
+            path = bytes(data[pos + LOAD.size:pos + LOAD.size + length]).decode("utf-8", "replace")
+            pos += LOAD.size + length
+            yield op, path
+        else:
+            # Unknown or corrupted record
+            return
+
+
+def apply_record(board=None, op=0, payload=None, loader=None, line_type=cv.LINE_AA):
+    """ Apply a single journal record to a board and return the (possibly replaced) board
+
+    Keyword arguments:
+        board       - board image to modify
+        op          - operation code
+        payload     - decoded record payload
+        loader      - callable (path, width, height) -> board image, used for OP_LOAD
+        line_type   - line type used for drawing
+    """
+    if op in (OP_DRAW, OP_ERASE):
+        start, end, col, thickness = payload
+        cv.line(board, start, end, col, thickness=thickness, lineType=line_type)
+    elif op == OP_CLEAR:
+        board[:] = WHITE
+    elif op == OP_LOAD and loader is not None:
+        image = loader(payload, board.shape[1], board.shape[0])
+        if image is not None:
+            board = image
+    return board
+
+
+def recover(directory="", width=0, height=0, loader=None):
+    """ Restore a board from the latest checkpoint plus the journal tail
+
+    Returns a tuple (board, generation, color_key). The board is None if there is nothing to restore,
+    color_key is None if no color change has been recorded.
+
+    Keyword arguments:
+        directory   - journal directory
+        width       - width of the whiteboard screen
+        height      - height of the whiteboard screen
+        loader      - callable (path, width, height) -> board image, used for OP_LOAD
+    """
+    checkpoints = list_generations(directory, CHECKPOINT_PREFIX)
+    journals = list_generations(directory, JOURNAL_PREFIX)
+    if not checkpoints and not journals:
+        return None, 0, None
+
+    board = None
+    generation = 0
+
+    # Start with the latest readable checkpoint
+    for gen in reversed(checkpoints):
+        image = cv.imread(checkpoint_path(directory, gen))
+        if image is not None:
+            if image.shape[0] != height or image.shape[1] != width:
+                image = cv.resize(image, (width, height), interpolation=cv.INTER_AREA)
+            board = image
+            generation = gen
+            break
+
+    if board is None:
+        board = np.full((height, width, 3), WHITE, np.uint8)
+
+    # Replay the journal tail
+    color_key = None
+    replayed = False
+    for gen in journals:
+        if gen < generation:
+            continue
+        try:
+            with open(journal_path(directory, gen), "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+
+        if len(data) < HEADER.size:
+            continue
+        magic, _, j_width, j_height = HEADER.unpack_from(data, 0)
+        if magic != JOURNAL_MAGIC:
+            continue
+
+        # Map the recorded coordinates onto the current resolution
+        sx = width / j_width if j_width else 1
+        sy = height / j_height if j_height else 1
+
+        for op, payload in iter_records(memoryview(data)[HEADER.size:]):
+            replayed = True
+            if op == OP_COLOR:
+                color_key = payload
+                continue
+            if op in (OP_DRAW, OP_ERASE) and (sx != 1 or sy != 1):
+                (x1, y1), (x2, y2), col, thickness = payload
+                payload = ((round(x1 * sx), round(y1 * sy)), (round(x2 * sx), round(y2 * sy)), col,
+                           max(1, round(thickness * sx)))
+            board = apply_record(board, op, payload, loader)
+        generation = max(generation, gen)
+
+    if not checkpoints and not replayed:
+        return None, generation, None
+
+    return board, generation, color_key
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Journal:
+    """ Append-only operation journal with a background writer thread
+
+    All public methods are cheap and meant to be called from the main loop. Records are handed to the
+    writer thread, which writes them, calls fsync at most every @ref fsync_interval seconds and encodes
+    checkpoints.
+    """
+
+    def __init__(self, directory="", width=0, height=0, generation=0,
+                 fsync_interval=FSYNC_INTERVAL, checkpoint_ops=CHECKPOINT_OPS,
+                 checkpoint_interval=CHECKPOINT_INTERVAL):
+        """ Open a new journal generation
+
+        Keyword arguments:
+            directory           - journal directory, created if it does not exist
+            width               - width of the whiteboard screen
+            height              - height of the whiteboard screen
+            generation          - latest generation found on disk (see recover)
+            fsync_interval      - maximum number of seconds between two fsync calls
+            checkpoint_ops      - number of operations after which a checkpoint is due
+            checkpoint_interval - number of seconds after which a checkpoint is due (if anything changed)
+        """
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.generation = generation + 1
+        self.fsync_interval = fsync_interval
+        self.checkpoint_ops = checkpoint_ops
+        self.checkpoint_interval = checkpoint_interval
+
+        self.ops = 0
+        self.last_checkpoint = time.monotonic()
+
+        os.makedirs(directory, mode=0o755, exist_ok=True)
+
+        self._queue = queue.SimpleQueue()
+        self._file = self._open_generation(self.generation)
+        self._thread = threading.Thread(target=self._writer, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    # ----- Recording -----
+
+    def segment(self, op=OP_DRAW, start=None, end=None, col=None, thickness=2):
+        """ Record a drawn or erased line segment in board coordinates
+
+        Keyword arguments:
+            op          - OP_DRAW or OP_ERASE
+            start       - start point of the line
+            end         - end point of the line
+            col         - BGR color of the line
+            thickness   - thickness of the line
+        """
+        self.append(pack_segment(op, start, end, col, thickness))
+
+    def color(self, key=0):
+        """ Record a color change
+
+        Keyword arguments:
+            key - index of the new color in the color options
+        """
+        self.append(COLOR.pack(OP_COLOR, key))
+
+    def clear(self):
+        """ Record a cleared whiteboard screen """
+        self.append(CLEAR.pack(OP_CLEAR))
+
+    def load(self, path="", board=None):
+        """ Record a loaded image and start a new checkpoint with the loaded board
+
+        Keyword arguments:
+            path    - path of the loaded file
+            board   - board after loading
+        """
+        encoded = path.encode("utf-8")[:0xFFFF]
+        self.append(LOAD.pack(OP_LOAD, len(encoded)) + encoded)
+        if board is not None:
+            self.checkpoint(board)
+
+    def append(self, record=b""):
+        """ Record an already packed record
+
+        Keyword arguments:
+            record  - binary record, e.g. created by pack_segment
+        """
+        self.ops += 1
+        self._queue.put(("append", record))
+
+    # ----- Checkpoints -----
+
+    def checkpoint_due(self):
+        """ Check if enough operations or time have passed since the last checkpoint """
+        if not self.ops:
+            return False
+        return (self.ops >= self.checkpoint_ops or
+                time.monotonic() - self.last_checkpoint >= self.checkpoint_interval)
+
+    def checkpoint(self, board=None):
+        """ Start a new generation with a copy of the given board as checkpoint
+
+        Keyword arguments:
+            board   - unzoomed whiteboard screen
+        """
+        self.generation += 1
+        self.ops = 0
+        self.last_checkpoint = time.monotonic()
+        self._queue.put(("checkpoint", self.generation, board.copy()))
+
+    # ----- Shutdown -----
+
+    def close(self, discard=False):
+        """ Flush all pending records and stop the writer thread
+
+        Keyword arguments:
+            discard - remove all journal files, e.g. after a regular program exit
+        """
+        self._queue.put(("close", discard))
+        self._thread.join()
+
+    # ----- Writer thread -----
+
+    def _open_generation(self, generation=0):
+        f = open(journal_path(self.directory, generation), "wb")
+        f.write(HEADER.pack(JOURNAL_MAGIC, generation, self.width, self.height))
+        f.flush()
+        os.fsync(f.fileno())
+        return f
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _remove_older(self, generation=0):
+        for prefix, path in ((JOURNAL_PREFIX, journal_path), (CHECKPOINT_PREFIX, checkpoint_path)):
+            for gen in list_generations(self.directory, prefix):
+                if gen < generation:
+                    try:
+                        os.remove(path(self.directory, gen))
+                    except OSError:
+                        pass
+
+    def _write_checkpoint(self, generation=0, board=None):
+        # Everything recorded so far belongs to the previous generation
+        self._sync()
+        self._file.close()
+        self._file = self._open_generation(generation)
+
+        # Write the checkpoint atomically, so a crash never leaves a partial image behind
+        target = checkpoint_path(self.directory, generation)
+        tmp = target + ".tmp"
+        ok, encoded = cv.imencode(".png", board, [cv.IMWRITE_PNG_COMPRESSION, 1])
+        if not ok:
+            return
+        with open(tmp, "wb") as f:
+            f.write(encoded.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+
+        self._remove_older(generation)
+
+    def _writer(self):
+        dirty = False
+        last_sync = time.monotonic()
+
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                kind = item[0]
+                if kind == "append":
+                    self._file.write(item[1])
+                    dirty = True
+                elif kind == "checkpoint":
+                    self._write_checkpoint(item[1], item[2])
+                    dirty = False
+                    last_sync = time.monotonic()
+                elif kind == "close":
+                    self._sync()
+                    self._file.close()
+                    if item[1]:
+                        self._remove_older(self.generation + 1)
+                    return
+
+            if dirty and time.monotonic() - last_sync >= self.fsync_interval:
+                self._sync()
+                dirty = False
+                last_sync = time.monotonic()
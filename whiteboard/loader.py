@@ -0,0 +1,213 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Image loader
+
+Images are decoded only at the resolution the whiteboard screen needs. The image size is read from the
+file header, and JPEG/PNG/WebP files that are at least twice as large as the whiteboard are read with
+cv.IMREAD_REDUCED_COLOR_* (for JPEG this scales during the DCT and never materializes the full image).
+Decoding runs on a background thread, so the main loop keeps running while a large file is loaded.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import queue                            # Worker thread communication
+import struct                           # File headers
+import threading                        # Background decoding
+
+import cv2 as cv                        # Image decoding
+import numpy as np                      # Buffers
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+REDUCED_FLAGS = [
+    (8, cv.IMREAD_REDUCED_COLOR_8),
+    (4, cv.IMREAD_REDUCED_COLOR_4),
+    (2, cv.IMREAD_REDUCED_COLOR_2)
+]
+
+# JPEG start of frame markers (baseline, extended, progressive, lossless, ...)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def _jpeg_size(f=None):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+
+        # Skip fill bytes
+        while marker[1] == 0xFF:
+            marker = marker[1:] + f.read(1)
+            if len(marker) < 2:
+                return None
+
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+
+        if marker[1] in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+
+        f.seek(struct.unpack(">H", length)[0] - 2, 1)
+
+
+def read_image_size(path=""):
+    """ Read the width and height of an image from its file header without decoding it
+
+    Returns None for unknown formats.
+
+    Keyword arguments:
+        path    - image file path
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(30)
+
+            # PNG: IHDR is always the first chunk
+            if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+                return struct.unpack(">II", head[16:24])
+
+            # JPEG
+            if head[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+
+            # BMP
+            if head[:2] == b"BM" and len(head) >= 26:
+                width, height = struct.unpack("<ii", head[18:26])
+                return width, abs(height)
+
+            # WebP (lossy, lossless and extended)
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                chunk = head[12:16]
+                if chunk == b"VP8 " and len(head) >= 30:
+                    width, height = struct.unpack("<HH", head[26:30])
+                    return width & 0x3FFF, height & 0x3FFF
+                if chunk == b"VP8L" and len(head) >= 25:
+                    bits = int.from_bytes(head[21:25], "little")
+                    return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+                if chunk == b"VP8X" and len(head) >= 30:
+                    return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    except OSError:
+        pass
+
+    return None
+
+
+def reduced_read_flag(size=None, width=0, height=0):
+    """ Get the cv.imread flag producing the smallest image that still covers the target resolution
+
+    Keyword arguments:
+        size    - (width, height) of the image file, None if unknown
+        width   - target width
+        height  - target height
+    """
+    if size is not None:
+        for factor, flag in REDUCED_FLAGS:
+            if size[0] // factor >= width and size[1] // factor >= height:
+                return flag
+
+    return cv.IMREAD_COLOR
+
+
+def decode_board_image(path="", width=0, height=0):
+    """ Decode an image file as mirrored whiteboard screen of the given resolution
+
+    Returns None if the file cannot be read.
+
+    Keyword arguments:
+        path    - image file path
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+    """
+    image = cv.imread(path, reduced_read_flag(read_image_size(path), width, height))
+    if image is None:
+        return None
+
+    image = cv.flip(image, 1)
+    if image.shape[0] != height or image.shape[1] != width:
+        image = cv.resize(image, (width, height), interpolation=cv.INTER_AREA)
+
+    return np.ascontiguousarray(image)
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class ImageLoader:
+    """ Decode images on a background thread
+
+    Only the latest request is decoded, older pending requests are dropped.
+    """
+
+    def __init__(self, decode=decode_board_image):
+        """ Start the worker thread
+
+        Keyword arguments:
+            decode  - callable (path, width, height) -> image or None
+        """
+        self.decode = decode
+        self.busy = False
+        self._requests = queue.Queue(maxsize=1)
+        self._results = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._worker, name="image-loader", daemon=True)
+        self._thread.start()
+
+    def request(self, path="", width=0, height=0):
+        """ Request an image to be decoded
+
+        Keyword arguments:
+            path    - image file path
+            width   - width of the whiteboard screen
+            height  - height of the whiteboard screen
+        """
+        try:
+            self._requests.get_nowait()
+        except queue.Empty:
+            pass
+        self.busy = True
+        self._requests.put((path, width, height))
+
+    def pending(self):
+        """ True, if a request is being decoded or its result has not been polled yet """
+        return self.busy or not self._results.empty()
+
+    def poll(self):
+        """ Get a tuple (path, image) of a finished request without blocking, None if nothing is ready
+
+        The image is None if the file could not be decoded.
+        """
+        try:
+            return self._results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _worker(self):
+        while True:
+            path, width, height = self._requests.get()
+            try:
+                image = self.decode(path, width, height)
+            except cv.error:
+                image = None
+            self.busy = not self._requests.empty()
+            self._results.put((path, image))
@@ -0,0 +1,263 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Memory accounting
+
+Explains the resident memory of the whiteboard. Owners (the engine, the viewer stream, ...) register their
+buffers by name, the accounting sums the live bytes per owner and keeps the peak. Views share the bytes of
+their base array, which is only counted once. With tracing enabled, tracemalloc measures the transient bytes
+allocated within every frame (deep copies, color conversion, flips, resizes), the growth of the live blocks
+per frame and the allocation sites with the most live bytes. A report is printed periodically.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import collections                      # Allocation sites
+import os                               # Page size
+import resource                         # Peak resident memory
+import time                             # Report interval
+import tracemalloc                      # Allocations per frame
+
+import numpy as np                      # Buffer sizes
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+REPORT_INTERVAL = 10.0
+
+# Allocation sites shown in a report, and the traced stack depth to find the caller of copy/numpy functions
+TOP_SITES = 5
+TRACE_FRAMES = 8
+
+# Allocations within these files are attributed to their caller
+LIBRARY_PATHS = (os.path.dirname(os.__file__), os.path.dirname(np.__file__))
+
+MIB = 2 ** 20
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def resident_bytes():
+    """ Get the current resident memory of the process, 0 if unknown """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_resident_bytes():
+    """ Get the peak resident memory of the process """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def buffer_bytes(buffers=None, seen=None):
+    """ Get a dictionary name -> bytes of arrays, views of an already counted base count 0
+
+    Keyword arguments:
+        buffers - dictionary name -> numpy array, bytes-like or None
+        seen    - set of ids of counted base buffers, shared between owners
+    """
+    sizes = {}
+    for name, buffer in buffers.items():
+        if buffer is None:
+            continue
+        if isinstance(buffer, np.ndarray):
+            base = buffer
+            while isinstance(base.base, np.ndarray):
+                base = base.base
+            size = base.nbytes
+        else:
+            base = buffer
+            size = len(buffer)
+        if id(base) in seen:
+            size = 0
+        seen.add(id(base))
+        sizes[name] = size
+    return sizes
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class MemoryAccounting:
+    """ Live bytes of named buffers per owner and allocations per frame """
+
+    def __init__(self, interval=REPORT_INTERVAL, trace=True):
+        """ Create the accounting, tracing starts immediately
+
+        Keyword arguments:
+            interval    - seconds between two reports, 0 to only report on request
+            trace       - measure the allocations per frame with tracemalloc
+        """
+        self.interval = interval
+        self.trace = trace
+
+        # Owner name -> function returning a dictionary buffer name -> array
+        self.owners = {}
+
+        self.frames = 0
+        self.peak_live = 0
+        self.peak_owners = {}
+        self.transient_bytes = 0
+        self.peak_transient = 0
+
+        self._last_report = time.monotonic()
+        self._frame_base = 0
+        self._blocks_base = 0
+        if trace:
+            if tracemalloc.is_tracing():
+                self._blocks_base = len(tracemalloc.take_snapshot().traces)
+            else:
+                tracemalloc.start(TRACE_FRAMES)
+            self._frame_base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+    def register(self, owner="", buffers=None):
+        """ Register the buffers of an owner
+
+        Keyword arguments:
+            owner   - name of the owner
+            buffers - function returning a dictionary buffer name -> array, or an object with memory_buffers()
+        """
+        self.owners[owner] = buffers if callable(buffers) else buffers.memory_buffers
+
+    def unregister(self, owner=""):
+        """ Remove the buffers of an owner
+
+        Keyword arguments:
+            owner   - name of the owner
+        """
+        self.owners.pop(owner, None)
+
+    def live(self):
+        """ Get a dictionary owner -> (dictionary buffer name -> bytes) of all registered buffers """
+        seen = set()
+        return {owner: buffer_bytes(buffers(), seen) for owner, buffers in self.owners.items()}
+
+    def frame(self):
+        """ Account a finished frame, call once per frame from the thread stepping the whiteboard """
+        self.frames += 1
+
+        if self.trace:
+            current, peak = tracemalloc.get_traced_memory()
+            transient = max(0, peak - self._frame_base)
+            self.transient_bytes += transient
+            self.peak_transient = max(self.peak_transient, transient)
+            self._frame_base = current
+            tracemalloc.reset_peak()
+
+        live = self.live()
+        total = sum(sum(sizes.values()) for sizes in live.values())
+        if total > self.peak_live:
+            self.peak_live = total
+            self.peak_owners = {owner: sum(sizes.values()) for owner, sizes in live.items()}
+
+        if self.interval and time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def tracing(self):
+        """ True, if allocations are traced, tracing ends with close() """
+        return self.trace and tracemalloc.is_tracing()
+
+    def snapshot(self):
+        """ Get a tracemalloc snapshot without the allocations of tracemalloc and the accounting, None if not
+        tracing
+        """
+        if not self.tracing():
+            return None
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+
+    def summary(self, snapshot=None):
+        """ Get the current state of the accounting as a dictionary
+
+        Keyword arguments:
+            snapshot    - snapshot of the traced blocks, taken if None
+        """
+        live = self.live()
+        summary = {
+            "frames": self.frames,
+            "resident_bytes": resident_bytes(),
+            "peak_resident_bytes": peak_resident_bytes(),
+            "live": live,
+            "live_bytes": sum(sum(sizes.values()) for sizes in live.values()),
+            "peak_live_bytes": self.peak_live,
+            "peak_owners": self.peak_owners
+        }
+        if self.tracing():
+            # Blocks freed within the frame are not traced anymore, the growth of the live blocks is counted
+            blocks = len((snapshot or self.snapshot()).traces)
+            current, _ = tracemalloc.get_traced_memory()
+            summary.update({
+                "traced_bytes": current,
+                "traced_blocks": blocks,
+                "blocks_per_frame": (blocks - self._blocks_base) / self.frames if self.frames else 0.0,
+                "transient_mean_bytes": self.transient_bytes // self.frames if self.frames else 0,
+                "transient_peak_bytes": self.peak_transient
+            })
+        return summary
+
+    def sites(self, count=TOP_SITES, snapshot=None):
+        """ Get the allocation sites with the most live bytes as (location, bytes, blocks)
+
+        Allocations within the standard library and numpy (e.g. copy.deepcopy) are attributed to their caller.
+
+        Keyword arguments:
+            count       - number of sites
+            snapshot    - snapshot of the traced blocks, taken if None
+        """
+        snapshot = snapshot or self.snapshot()
+        if snapshot is None:
+            return []
+
+        sites = collections.defaultdict(lambda: [0, 0])
+        for stat in snapshot.statistics("traceback"):
+            frame = next((f for f in reversed(stat.traceback) if not f.filename.startswith(LIBRARY_PATHS)),
+                         stat.traceback[-1])
+            site = sites["{}:{}".format(frame.filename, frame.lineno)]
+            site[0] += stat.size
+            site[1] += stat.count
+        return sorted(((location, size, blocks) for location, (size, blocks) in sites.items()),
+                      key=lambda site: -site[1])[:count]
+
+    def report(self):
+        """ Print live bytes by owner, peaks and the allocations per frame """
+        # Nothing is left to report after close()
+        if self.trace and not tracemalloc.is_tracing():
+            return
+        self._last_report = time.monotonic()
+        snapshot = self.snapshot()
+        summary = self.summary(snapshot)
+
+        print("Memory after {} frames: {:.1f} MiB resident (peak {:.1f} MiB), {:.1f} MiB in buffers "
+              "(peak {:.1f} MiB)".format(summary["frames"], summary["resident_bytes"] / MIB,
+                                         summary["peak_resident_bytes"] / MIB, summary["live_bytes"] / MIB,
+                                         summary["peak_live_bytes"] / MIB))
+        for owner, sizes in summary["live"].items():
+            print("  {:<10}{:>9.1f} MiB  {}".format(owner, sum(sizes.values()) / MIB, ", ".join(
+                "{} {:.1f}".format(name, size / MIB) for name, size in sizes.items() if size)))
+
+        if snapshot is not None:
+            print("  per frame {:.1f} MiB allocated on average, {:.1f} MiB at most, {:+.1f} live blocks, "
+                  "{:.1f} MiB in {} blocks traced".format(
+                      summary["transient_mean_bytes"] / MIB, summary["transient_peak_bytes"] / MIB,
+                      summary["blocks_per_frame"], summary["traced_bytes"] / MIB, summary["traced_blocks"]))
+            for location, size, blocks in self.sites(snapshot=snapshot):
+                print("  {:>9.1f} MiB {:>7} blocks  {}".format(size / MIB, blocks, location))
+
+    def close(self):
+        """ Stop tracing """
+        if self.tracing():
+            tracemalloc.stop()
@@ -0,0 +1,312 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Runtime metrics
+
+A local HTTP endpoint in the Prometheus text format for monitoring long-running boards. The running loop
+only updates counters and histogram buckets in memory (a few microseconds per frame). Everything that is
+expensive or owned by another component (memory, motion gates, dropped frames of the runtime) is collected
+when the endpoint is scraped.
+
+    /metrics    - all metrics in the Prometheus text exposition format 0.0.4
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import bisect                           # Histogram buckets
+import threading                        # Server thread and updates from several threads
+import time                             # Frame rate
+from http import server                 # HTTP server
+
+from whiteboard import journal as jn    # Segment records
+from whiteboard import memory as me     # Resident memory
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+DEFAULT_PORT = 9464
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SAVE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Weight of the latest frame interval in the smoothed frame rate
+FPS_SMOOTHING = 0.1
+
+# Name -> (type, help, buckets of a histogram)
+METRICS = {
+    "whiteboard_frames_total": ("counter", "Composed frames", None),
+    "whiteboard_fps": ("gauge", "Composed frames per second, smoothed", None),
+    "whiteboard_stage_seconds": ("histogram", "Latency of a stage of the loop", LATENCY_BUCKETS),
+    "whiteboard_inference_skip_ratio": ("gauge", "Share of frames whose hand tracking was skipped", None),
+    "whiteboard_dropped_frames_total": ("counter", "Frames dropped by a stage of the asyncio runtime", None),
+    "whiteboard_gesture_frames_total": ("counter", "Composed frames by recognized gesture", None),
+    "whiteboard_canvas_dirty_pixels_total": ("counter", "Canvas pixels changed by strokes, clears and loads",
+                                             None),
+    "whiteboard_save_seconds": ("histogram", "Duration of saves, exports and backups", SAVE_BUCKETS),
+    "whiteboard_quality_level": ("gauge", "Index of the current level of the adaptive quality", None),
+    "whiteboard_resident_bytes": ("gauge", "Resident memory of the process", None),
+    "whiteboard_peak_resident_bytes": ("gauge", "Peak resident memory of the process", None),
+    "whiteboard_buffer_bytes": ("gauge", "Live bytes of the buffers of an owner", None)
+}
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def format_labels(labels=(), extra=""):
+    """ Get the label set of a sample like {stage="capture"}, empty without labels
+
+    Keyword arguments:
+        labels  - tuple of (name, value) pairs
+        extra   - further formatted label, e.g. le="0.5"
+    """
+    pairs = ['{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+             for name, value in labels]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value=0.0):
+    """ Get a sample value in the text format
+
+    Keyword arguments:
+        value   - number
+    """
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Histogram:
+    """ Bucket counts, sum and count of observed values """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value=0.0):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """ Get the cumulative (upper bound, count) pairs including +Inf """
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics:
+    """ Counters, gauges and histograms of the running loop, updated from any thread """
+
+    def __init__(self):
+        # (name, labels) -> value or Histogram, labels are a tuple of (name, value) pairs
+        self.values = {}
+
+        # Called before every scrape with this object to set the collected metrics
+        self.collectors = [self.collect_memory]
+
+        self._lock = threading.Lock()
+        self._last_frame = None
+        self._interval = 0.0
+
+    def inc(self, name="", value=1, **labels):
+        """ Increase a counter
+
+        Keyword arguments:
+            name    - name of the metric
+            value   - increment
+            labels  - labels of the sample
+        """
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name="", value=0, **labels):
+        """ Set a gauge, or a counter to a total counted elsewhere
+
+        Keyword arguments:
+            name    - name of the metric
+            value   - value
+            labels  - labels of the sample
+        """
+        with self._lock:
+            self.values[(name, tuple(labels.items()))] = value
+
+    def observe(self, name="", value=0.0, **labels):
+        """ Add a value to a histogram
+
+        Keyword arguments:
+            name    - name of the metric
+            value   - observed value, e.g. seconds
+            labels  - labels of the sample
+        """
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            histogram = self.values.get(key)
+            if histogram is None:
+                histogram = self.values[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def frame(self, gesture=""):
+        """ Count a composed frame and its gesture, call once per frame
+
+        Keyword arguments:
+            gesture - gesture recognized in the frame
+        """
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            interval = now - self._last_frame
+            self._interval += (interval - self._interval) * (FPS_SMOOTHING if self._interval else 1.0)
+        self._last_frame = now
+
+        self.inc("whiteboard_frames_total")
+        if gesture:
+            self.inc("whiteboard_gesture_frames_total", gesture=gesture)
+
+    def collect_memory(self, metrics=None):
+        """ Collect the resident memory of the process
+
+        Keyword arguments:
+            metrics - this object
+        """
+        self.set("whiteboard_resident_bytes", me.resident_bytes())
+        self.set("whiteboard_peak_resident_bytes", me.peak_resident_bytes())
+
+    def render(self):
+        """ Run the collectors and get all metrics in the Prometheus text format """
+        for collector in self.collectors:
+            collector(self)
+        self.set("whiteboard_fps", 1 / self._interval if self._interval else 0.0)
+
+        with self._lock:
+            samples = sorted(self.values.items(), key=lambda item: item[0])
+            samples = [(key, value if not isinstance(value, Histogram) else
+                        (list(value.samples()), value.sum, value.count)) for key, value in samples]
+
+        lines = []
+        described = set()
+        for (name, labels), value in samples:
+            if name not in described:
+                described.add(name)
+                kind, description, _ = METRICS[name]
+                lines.append("# HELP {} {}".format(name, description))
+                lines.append("# TYPE {} {}".format(name, kind))
+
+            if METRICS[name][0] != "histogram":
+                lines.append("{}{} {}".format(name, format_labels(labels), format_value(value)))
+                continue
+
+            buckets, total, count = value
+            for bound, cumulative in buckets:
+                lines.append("{}_bucket{} {}".format(name, format_labels(labels, 'le="{}"'.format(
+                    format_value(bound))), cumulative))
+            lines.append("{}_sum{} {}".format(name, format_labels(labels), format_value(total)))
+            lines.append("{}_count{} {}".format(name, format_labels(labels), count))
+        return "\n".join(lines) + "\n"
+
+
+class CanvasMetrics:
+    """ Count the canvas pixels changed by strokes, clears and loads, attached as listener of the engine """
+
+    def __init__(self, metrics=None, board=None):
+        """ Attach to a whiteboard engine
+
+        Keyword arguments:
+            metrics - Metrics
+            board   - whiteboard engine
+        """
+        self.metrics = metrics
+        self.board = board
+        board.listeners.append(self)
+
+    def close(self):
+        if self in self.board.listeners:
+            self.board.listeners.remove(self)
+
+    # ----- Engine listener -----
+
+    def segment(self, record=b""):
+        """ Count the bounding box of a drawn or erased line segment """
+        _, x1, y1, x2, y2, _, _, _, thickness = jn.SEGMENT.unpack(record)
+        self.metrics.inc("whiteboard_canvas_dirty_pixels_total",
+                         (abs(x2 - x1) + thickness + 1) * (abs(y2 - y1) + thickness + 1))
+
+    def stroke_end(self):
+        pass
+
+    def color(self, key=0, col=None):
+        pass
+
+    def zoom(self, factor=100, off_width=0, off_height=0):
+        pass
+
+    def clear(self):
+        """ Count the whole canvas """
+        self.metrics.inc("whiteboard_canvas_dirty_pixels_total", self.board.whiteboard_width *
+                         self.board.whiteboard_height)
+
+    def load(self, board=None):
+        """ Count the whole canvas """
+        self.clear()
+
+
+class MetricsHandler(server.BaseHTTPRequestHandler):
+    """ Request handler of the metrics endpoint """
+
+    def log_message(self, format="", *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        data = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer:
+    """ Serve the metrics to a Prometheus scraper """
+
+    def __init__(self, metrics=None, host="127.0.0.1", port=DEFAULT_PORT):
+        """ Start the HTTP server
+
+        Keyword arguments:
+            metrics - Metrics
+            host    - address to listen on, "" for all interfaces
+            port    - TCP port, 0 to pick a free port
+        """
+        self._server = server.ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = metrics
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """ Stop the HTTP server """
+        self._server.shutdown()
+        self._server.server_close()
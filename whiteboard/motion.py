@@ -0,0 +1,109 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Motion gate
+
+Skips the hand tracking of frames that hardly differ from the last tracked frame, e.g. a static room or a
+hand holding still between strokes. Every frame is reduced to a tiny grayscale image and compared with the
+tiny image of the last tracked frame. Below the threshold, the results of the last tracked frame are reused.
+Comparing with the last tracked frame (instead of the previous frame) lets slow movements add up until they
+are tracked, and the number of skipped frames in a row is limited for safety.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import cv2 as cv                        # Downsampling and difference
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# Size of the compared images
+GATE_SIZE = (32, 24)
+
+# Largest change of a compared pixel (0-255) that still counts as no motion
+THRESHOLD = 4
+
+# Maximum number of frames skipped in a row
+MAX_SKIP = 5
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class MotionGate:
+    """ Hand tracker reusing the results of the last tracked frame while there is no motion """
+
+    def __init__(self, tracker=None, threshold=THRESHOLD, max_skip=MAX_SKIP, size=GATE_SIZE):
+        """ Wrap a hand tracker
+
+        Keyword arguments:
+            tracker     - hand tracker with process/close
+            threshold   - largest change of a compared pixel that still counts as no motion, 0 to track all frames
+            max_skip    - maximum number of frames skipped in a row
+            size        - size of the compared images
+        """
+        self.tracker = tracker
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.size = size
+
+        self.frames = 0
+        self.skipped = 0
+
+        self._reference = None
+        self._results = None
+        self._skipped_in_row = 0
+
+    @property
+    def skip_ratio(self):
+        """ Get the share of frames whose tracking has been skipped """
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def moved(self, image=None):
+        """ Check if an RGB frame differs from the last tracked frame, the tiny image becomes the new reference
+
+        Keyword arguments:
+            image   - RGB frame
+        """
+        tiny = cv.cvtColor(cv.resize(image, self.size, interpolation=cv.INTER_AREA), cv.COLOR_RGB2GRAY)
+        if self._reference is not None and self._reference.shape == tiny.shape and \
+                self._skipped_in_row < self.max_skip and cv.absdiff(tiny, self._reference).max() <= self.threshold:
+            return False
+
+        self._reference = tiny
+        return True
+
+    def process(self, image=None):
+        """ Track the hands of an RGB frame or reuse the results of the last tracked frame
+
+        Keyword arguments:
+            image   - RGB frame
+        """
+        self.frames += 1
+        if self.threshold and not self.moved(image):
+            self.skipped += 1
+            self._skipped_in_row += 1
+            return self._results
+
+        self._skipped_in_row = 0
+        self._results = self.tracker.process(image)
+        return self._results
+
+    def close(self):
+        self.tracker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "{} frames, {} skipped ({:.0%})".format(self.frames, self.skipped, self.skip_ratio)
@@ -0,0 +1,279 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Multi-camera input
+
+Merges several capture devices into one shared whiteboard, e.g. one camera per user at a single board or
+several cameras for a wider coverage. Every source has its own capture thread and its own inference thread
+with a separate hand tracker, so the sources are tracked in parallel. Hand tracking releases the GIL, the
+total throughput scales with the number of cores. The whiteboard itself is only ever stepped from one
+thread, with the latest landmarks of every source and a separate pen (color, stroke in progress) per source.
+
+    LAYOUT_SHARED   - every camera covers the complete whiteboard screen
+    LAYOUT_SPLIT    - every camera covers a vertical strip, from left to right on the mirrored screen
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import threading                        # Capture and inference threads
+import time                             # Timestamps
+
+import cv2 as cv                        # Color conversion
+
+from whiteboard import gestures as gs   # Landmark conversion
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+LAYOUT_SHARED = "shared"
+LAYOUT_SPLIT = "split"
+
+# Seconds poll() waits for a new result of any source
+POLL_TIMEOUT = 1.0
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def split_regions(count=1, width=0, height=0):
+    """ Get the regions of side by side cameras on the whiteboard screen
+
+    The whiteboard screen is mirrored when displayed, so the first camera gets the rightmost strip of the
+    unmirrored screen to appear on the left.
+
+    Keyword arguments:
+        count   - number of cameras
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+    """
+    bounds = [round(width * i / count) for i in range(count + 1)]
+    return [(width - bounds[i + 1], 0, bounds[i + 1] - bounds[i], height) for i in range(count)]
+
+
+def open_camera(device=-1, cam_width=0, cam_height=0, fps=0, api=cv.CAP_ANY):
+    """ Open a capture device with the resolution of the whiteboard
+
+    Keyword arguments:
+        device      - device index, path/URL of a video source or GStreamer pipeline
+        cam_width   - requested frame width
+        cam_height  - requested frame height
+        fps         - requested frame rate, 0 for the default of the device
+        api         - capture API, e.g. cv.CAP_GSTREAMER for a pipeline
+    """
+    cam = cv.VideoCapture(device, api)
+    cam.set(cv.CAP_PROP_FRAME_WIDTH, cam_width)
+    cam.set(cv.CAP_PROP_FRAME_HEIGHT, cam_height)
+    if fps:
+        cam.set(cv.CAP_PROP_FPS, fps)
+    return cam
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class SourceWorker:
+    """ Capture and inference threads of one input source, keeping only the latest frame and result """
+
+    def __init__(self, index=0, cam=None, tracker=None, cam_width=0, cam_height=0, condition=None):
+        """ Create the worker, the threads are started with start()
+
+        Keyword arguments:
+            index       - index of the input source, selects its pen on the whiteboard
+            cam         - capture device with isOpened/read/release
+            tracker     - hand tracker with process, or a function (frame) -> (frame, landmarks, results)
+            cam_width   - width of the capture device coordinates
+            cam_height  - height of the capture device coordinates
+            condition   - threading.Condition notified for every new result, shared by all sources
+        """
+        self.index = index
+        self.cam = cam
+        self.tracker = tracker
+        self.cam_width = cam_width
+        self.cam_height = cam_height
+
+        self.frames = 0
+        self.tracked = 0
+        self.dropped = 0
+        self.ended = False
+        self.failed = False
+
+        # Latest captured frame (sequence number, timestamp, frame), written by the capture thread
+        self._frame = (0, 0.0, None)
+        self._frame_ready = threading.Condition()
+
+        # Latest result (sequence number, timestamp, raw frame, frame, landmarks, results) and its consumer
+        self.result = None
+        self._consumed = 0
+        self._condition = condition or threading.Condition()
+
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._capture, name="capture-{}".format(index), daemon=True),
+            threading.Thread(target=self._inference, name="inference-{}".format(index), daemon=True)
+        ]
+
+    def start(self):
+        """ Start the capture and inference threads """
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def pending(self):
+        """ True, if there is a result that has not been taken yet (check with the condition) """
+        return self.result is not None and self.result[0] != self._consumed
+
+    @property
+    def finished(self):
+        """ True, if the source ended and its last result has been taken """
+        return self.ended and not self.pending
+
+    def take(self):
+        """ Get the latest result, if it has not been taken before, otherwise None (call with the condition) """
+        if not self.pending:
+            return None
+        self._consumed = self.result[0]
+        return self.result
+
+    def close(self):
+        """ Stop the threads and release the capture device """
+        self._stop.set()
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self.cam.release()
+
+    def _capture(self):
+        sequence = 0
+        while not self._stop.is_set() and self.cam.isOpened():
+            success, frame = self.cam.read()
+            if not success:
+                self.failed = True
+                break
+
+            sequence += 1
+            with self._frame_ready:
+                # A frame the inference thread did not take yet is replaced
+                self.dropped += self._frame[2] is not None
+                self._frame = (sequence, time.time(), frame)
+                self.frames += 1
+                self._frame_ready.notify()
+
+        with self._frame_ready:
+            self._frame = (-1, 0.0, None)
+            self._frame_ready.notify()
+
+    def _track(self, frame=None):
+        if not hasattr(self.tracker, "process"):
+            return self.tracker(frame)
+
+        # The hand tracker needs RGB, the preview stays BGR
+        results = self.tracker.process(cv.cvtColor(frame, cv.COLOR_BGR2RGB))
+        return frame, gs.landmarks_from_results(results, self.cam_width, self.cam_height), results
+
+    def _inference(self):
+        sequence = 0
+        while True:
+            with self._frame_ready:
+                self._frame_ready.wait_for(lambda: self._frame[2] is not None or self._frame[0] < 0 or
+                                           self._stop.is_set())
+                if self._frame[2] is None:
+                    break
+                _, timestamp, raw = self._frame
+                self._frame = (self._frame[0], 0.0, None)
+
+            frame, landmarks, results = self._track(raw)
+            sequence += 1
+            with self._condition:
+                self.result = (sequence, timestamp, raw, frame, landmarks, results)
+                self.tracked += 1
+                self._condition.notify_all()
+
+        with self._condition:
+            self.ended = True
+            self._condition.notify_all()
+
+
+class MultiCamera:
+    """ Several input sources drawing on one shared whiteboard """
+
+    def __init__(self, board=None, cams=None, trackers=None, layout=LAYOUT_SHARED):
+        """ Create a worker per source and a pen per additional source on the whiteboard
+
+        Keyword arguments:
+            board       - whiteboard engine
+            cams        - list of capture devices with isOpened/read/release, the first one is the primary source
+            trackers    - list of hand trackers, one per capture device
+            layout      - LAYOUT_SHARED or LAYOUT_SPLIT
+        """
+        self.board = board
+        self.condition = threading.Condition()
+        self.workers = [SourceWorker(i, cam, tracker, board.cam_width, board.cam_height, self.condition)
+                        for i, (cam, tracker) in enumerate(zip(cams, trackers))]
+
+        # The first source draws with the primary pen of the whiteboard
+        regions = [None] * len(cams)
+        if layout == LAYOUT_SPLIT:
+            regions = split_regions(len(cams), board.whiteboard_width, board.whiteboard_height)
+        board.pen.region = regions[0]
+        for region in regions[1:]:
+            board.add_pen(region)
+
+        # Latest frame shown in the preview
+        self.preview = None
+
+    @property
+    def finished(self):
+        """ True, if all sources ended """
+        return all(worker.finished for worker in self.workers)
+
+    @property
+    def failed(self):
+        """ True, if any capture device could not deliver a frame anymore """
+        return any(worker.failed for worker in self.workers)
+
+    def start(self):
+        """ Start the capture and inference threads of all sources """
+        for worker in self.workers:
+            worker.start()
+
+    def poll(self, timeout=POLL_TIMEOUT):
+        """ Wait for new results and return them as a list of (source index, timestamp, raw frame, frame,
+        landmarks, results), empty at the end of all sources or on timeout
+
+        Keyword arguments:
+            timeout - seconds to wait for a new result
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.finished or any(w.pending for w in self.workers), timeout)
+            items = [(w.index,) + w.take()[1:] for w in self.workers if w.pending]
+
+        for item in items:
+            if item[0] == 0:
+                self.preview = item[3]
+        return items
+
+    def step(self, items=None):
+        """ Execute the gestures of new results and compose the whiteboard screen with the primary preview
+
+        Keyword arguments:
+            items   - results returned by poll()
+        """
+        return self.board.step_sources([(item[0], item[4]) for item in items], self.preview, 0)
+
+    def close(self):
+        """ Stop all sources """
+        for worker in self.workers:
+            worker.close()
+
+    def __repr__(self):
+        return ", ".join("source {}: {} frames, {} tracked, {} dropped".format(
+            w.index, w.frames, w.tracked, w.dropped) for w in self.workers)
@@ -0,0 +1,255 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Offscreen outputs
+
+Targets for the composed whiteboard screen when no window is shown: a video file, an image sequence or a
+shared-memory ring. All outputs provide write(timestamp, screen) and close(), so they can be used in the
+serial loop as well as runtime outputs.
+
+Shared-memory ring layout (little-endian), readable by other processes without copying:
+
+    RING_HEADER     - magic, width, height, channels, number of slots, sequence number of the latest frame
+    slots           - SLOT_HEADER (sequence number, timestamp) + width * height * channels bytes (BGR)
+
+A slot is written before the sequence number in the ring header is increased. Readers check the sequence
+number of a slot again after using it, a changed number means that the frame has been overwritten.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import os                               # Filesystem
+import struct                           # Ring header
+from multiprocessing import resource_tracker, shared_memory   # Shared-memory ring
+
+import cv2 as cv                        # Video and image encoding
+import numpy as np                      # Frame views
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+RING_MAGIC = b"WBRG"
+RING_HEADER = struct.Struct("<4sIIIIQ")
+SLOT_HEADER = struct.Struct("<Qd")
+
+# Offset of the sequence number of the latest frame in the ring header
+RING_SEQUENCE_OFFSET = RING_HEADER.size - 8
+
+RING_SLOTS = 4
+SHM_PREFIX = "shm:"
+
+VIDEO_FOURCC = "mp4v"
+VIDEO_FPS = 30.0
+SEQUENCE_PATTERN = "frame_%06d.png"
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def slot_offset(index=0, frame_bytes=0):
+    """ Get the offset of a ring slot
+
+    Keyword arguments:
+        index       - index of the slot
+        frame_bytes - size of a frame
+    """
+    return RING_HEADER.size + index * (SLOT_HEADER.size + frame_bytes)
+
+
+def open_output(target="", width=0, height=0, fps=VIDEO_FPS):
+    """ Create an output from a target description
+
+    "shm:<name>" creates a shared-memory ring, a path ending with a video extension a video file and any
+    other path (a directory, or a pattern containing "%") an image sequence.
+
+    Keyword arguments:
+        target  - output description
+        width   - width of the whiteboard screen
+        height  - height of the whiteboard screen
+        fps     - frame rate of video files
+    """
+    if target.startswith(SHM_PREFIX):
+        return SharedMemoryRing(target[len(SHM_PREFIX):], width, height)
+
+    if os.path.splitext(target)[1].lower() in (".mp4", ".avi", ".mkv", ".mov"):
+        return VideoOutput(target, width, height, fps)
+
+    return ImageSequenceOutput(target)
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class VideoOutput:
+    """ Write the whiteboard screen into a video file """
+
+    def __init__(self, path="", width=0, height=0, fps=VIDEO_FPS, fourcc=VIDEO_FOURCC):
+        """ Open the video file
+
+        Keyword arguments:
+            path    - target file path
+            width   - width of the whiteboard screen
+            height  - height of the whiteboard screen
+            fps     - frame rate of the video
+            fourcc  - codec
+        """
+        self.path = path
+        self.frames = 0
+        self._writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*fourcc), fps, (width, height))
+        if not self._writer.isOpened():
+            raise OSError("Could not open video file: " + path)
+
+    def write(self, timestamp=0.0, screen=None):
+        self._writer.write(screen)
+        self.frames += 1
+
+    def close(self):
+        self._writer.release()
+
+
+class ImageSequenceOutput:
+    """ Write the whiteboard screen as numbered images """
+
+    def __init__(self, path="", params=None):
+        """ Create the target directory
+
+        Keyword arguments:
+            path    - target directory, or a file pattern containing "%"
+            params  - encoding parameters of cv.imwrite
+        """
+        if "%" not in path:
+            path = os.path.join(path, SEQUENCE_PATTERN)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.pattern = path
+        self.params = params or [cv.IMWRITE_PNG_COMPRESSION, 1]
+        self.frames = 0
+
+    def write(self, timestamp=0.0, screen=None):
+        cv.imwrite(self.pattern % self.frames, screen, self.params)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+class SharedMemoryRing:
+    """ Publish the whiteboard screen in a shared-memory ring of frames """
+
+    def __init__(self, name="", width=0, height=0, channels=3, slots=RING_SLOTS):
+        """ Create the shared memory
+
+        Keyword arguments:
+            name        - name of the shared memory
+            width       - width of the whiteboard screen
+            height      - height of the whiteboard screen
+            channels    - number of color channels
+            slots       - number of frames in the ring
+        """
+        self.name = name
+        self.shape = (height, width, channels)
+        self.slots = slots
+        self.frame_bytes = width * height * channels
+        self.sequence = 0
+
+        size = slot_offset(slots, self.frame_bytes)
+        try:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left over by a process that has not been closed regularly
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+
+        RING_HEADER.pack_into(self._shm.buf, 0, RING_MAGIC, width, height, channels, slots, 0)
+        self._frames = [
+            np.ndarray(self.shape, np.uint8, self._shm.buf, slot_offset(i, self.frame_bytes) + SLOT_HEADER.size)
+            for i in range(slots)
+        ]
+
+    def write(self, timestamp=0.0, screen=None):
+        sequence = self.sequence + 1
+        index = sequence % self.slots
+        offset = slot_offset(index, self.frame_bytes)
+
+        # Invalidate the slot while it is written
+        SLOT_HEADER.pack_into(self._shm.buf, offset, 0, timestamp)
+        self._frames[index][:] = screen
+        SLOT_HEADER.pack_into(self._shm.buf, offset, sequence, timestamp)
+        struct.pack_into("<Q", self._shm.buf, RING_SEQUENCE_OFFSET, sequence)
+        self.sequence = sequence
+
+    def memory_buffers(self):
+        """ Get a dictionary name -> buffer of the frames of the ring, see memory.py """
+        return {"slot {}".format(i): frame for i, frame in enumerate(self._frames)}
+
+    def close(self):
+        self._frames = []
+        self._shm.close()
+        self._shm.unlink()
+
+
+class SharedMemoryReader:
+    """ Read frames of a shared-memory ring of another process without copying """
+
+    def __init__(self, name=""):
+        """ Attach to the shared memory
+
+        Keyword arguments:
+            name    - name of the shared memory
+        """
+        self._shm = shared_memory.SharedMemory(name)
+
+        # The writer owns the shared memory, it must not be removed when the reader exits
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+
+        magic, width, height, channels, slots, _ = RING_HEADER.unpack_from(self._shm.buf, 0)
+        if magic != RING_MAGIC:
+            self._shm.close()
+            raise ValueError("Not a whiteboard ring: " + name)
+
+        self.shape = (height, width, channels)
+        self.slots = slots
+        self.frame_bytes = width * height * channels
+
+    def sequence(self):
+        """ Get the sequence number of the latest frame, 0 if none has been written """
+        return struct.unpack_from("<Q", self._shm.buf, RING_SEQUENCE_OFFSET)[0]
+
+    def latest(self):
+        """ Get a tuple (sequence number, timestamp, frame view) of the latest frame, None if there is none
+
+        The view refers to the shared memory, use valid() to check that it has not been overwritten.
+        """
+        sequence = self.sequence()
+        if not sequence:
+            return None
+
+        offset = slot_offset(sequence % self.slots, self.frame_bytes)
+        slot_sequence, timestamp = SLOT_HEADER.unpack_from(self._shm.buf, offset)
+        if slot_sequence != sequence:
+            return None
+
+        frame = np.ndarray(self.shape, np.uint8, self._shm.buf, offset + SLOT_HEADER.size)
+        return sequence, timestamp, frame
+
+    def valid(self, sequence=0):
+        """ Check if the frame of a sequence number is still in its slot
+
+        Keyword arguments:
+            sequence    - sequence number returned by latest()
+        """
+        offset = slot_offset(sequence % self.slots, self.frame_bytes)
+        return SLOT_HEADER.unpack_from(self._shm.buf, offset)[0] == sequence
+
+    def close(self):
+        self._shm.close()
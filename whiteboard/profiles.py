@@ -0,0 +1,248 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Performance profiles
+
+Named settings of the whiteboard for a class of hardware, so the same implementation runs on a desktop, a
+Jetson Nano and other low-power boards:
+
+    desktop     - default camera, tracking quality and preview
+    jetson      - second camera (or a CSI camera through a GStreamer pipeline), small preview and buttons, a
+                  single tracked hand, adaptive quality holding 15 fps
+    low-power   - reduced tracking quality and capture rate, adaptive quality holding 10 fps, early idle mode
+
+A profile sets the capture (size, rate, device, CSI pipeline), the inference settings (tracking backend, the
+start level of the adaptive quality, target frame rate, motion gate), the preview and button size and the
+buffer strategy (the serial loop with pooled buffers or the asyncio runtime with queued frames). A JSON config
+file selects a profile with "profile" and overrides single settings, e.g. {"profile": "jetson", "capture_fps": 30}.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import argparse                         # Size errors of the command lines
+import copy                             # Profile overrides
+import json                             # Config files
+import os                               # CPU affinity
+
+import cv2 as cv                        # Thread count
+
+from whiteboard import idle as il       # Idle mode defaults
+from whiteboard import motion as mo     # Motion gate defaults
+from whiteboard import quality as qa    # Quality levels
+from whiteboard import tracking as tr   # Hand tracking backends
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+DEFAULT_PROFILE = "desktop"
+
+# Buffer strategies: one loop reusing its pooled buffers, or stages connected by queues of frames
+RUNTIME_SERIAL = "serial"
+RUNTIME_ASYNCIO = "asyncio"
+
+# Settings of a config file that are not part of a profile
+CONFIG_PROFILE_KEY = "profile"
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def gstreamer_pipeline(sensor_id=0, width=640, height=480, fps=30, flip_method=0):
+    """ Get the GStreamer pipeline of a CSI camera (nvarguscamerasrc) delivering BGR frames to OpenCV
+
+    Keyword arguments:
+        sensor_id   - index of the CSI camera
+        width       - frame width
+        height      - frame height
+        fps         - frame rate
+        flip_method - rotation/flip of nvvidconv (0 none, 2 rotate 180 degrees, ...)
+    """
+    return (
+        "nvarguscamerasrc sensor-id={} ! "
+        "video/x-raw(memory:NVMM), width=(int){}, height=(int){}, format=(string)NV12, framerate=(fraction){}/1 ! "
+        "nvvidconv flip-method={} ! "
+        "video/x-raw, width=(int){}, height=(int){}, format=(string)BGRx ! "
+        "videoconvert ! "
+        "video/x-raw, format=(string)BGR ! appsink drop=true max-buffers=1"
+    ).format(sensor_id, width, height, fps, flip_method, width, height)
+
+
+def level_index(name=""):
+    """ Get the index of a quality level by its name
+
+    Keyword arguments:
+        name    - name of a level of quality.LEVELS
+    """
+    for index, level in enumerate(qa.LEVELS):
+        if level.name == name:
+            return index
+    raise ValueError("Unknown quality level: {}".format(name))
+
+
+def load_profile(name=None, path=""):
+    """ Get a profile, optionally overridden by a JSON config file
+
+    Keyword arguments:
+        name    - name of the profile, None for the profile of the config file or the default profile
+        path    - JSON config file with "profile" and settings overriding the profile, empty for none
+    """
+    values = {}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            values = json.load(f)
+        if not isinstance(values, dict):
+            raise ValueError("Config file {} does not contain an object".format(path))
+
+    base = values.pop(CONFIG_PROFILE_KEY, DEFAULT_PROFILE)
+    name = name or base
+    if name not in PROFILES:
+        raise ValueError("Unknown profile: {}".format(name))
+
+    profile = copy.deepcopy(PROFILES[name])
+    profile.update(**values)
+    return profile
+
+
+def parse_size(text="1920x1080"):
+    """ Parse a size like 1920x1080 into a tuple (width, height), usable as the type of a command line option
+
+    Keyword arguments:
+        text    - size string
+    """
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        width = height = 0
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError("invalid size {!r}, expected WIDTHxHEIGHT like 1920x1080".format(text))
+    return width, height
+
+
+def restrict_cpus(cpus=0):
+    """ Restrict the process and OpenCV to a number of cores, e.g. to run a profile on a faster machine
+
+    Keyword arguments:
+        cpus    - number of cores, 0 for all
+    """
+    if not cpus:
+        return
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:cpus])
+    cv.setNumThreads(cpus)
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Profile:
+    """ Settings of the whiteboard for a class of hardware """
+
+    def __init__(self, name="", cam_width=640, cam_height=480, capture_fps=0, camera=-1, csi=False, flip_method=0,
+                 tracker=tr.DEFAULT_BACKEND, quality="default", target_fps=0, motion_threshold=mo.THRESHOLD,
+                 max_skip=mo.MAX_SKIP, idle_after=il.IDLE_AFTER, button_size=(125, 50), runtime=RUNTIME_SERIAL,
+                 queue_size=1, size="1920x1080", cpus=0):
+        """ Create a profile
+
+        Keyword arguments:
+            name                - name of the profile
+            cam_width           - requested width of the capture device
+            cam_height          - requested height of the capture device
+            capture_fps         - requested frame rate of the capture device, 0 for its default
+            camera              - capture device index or video path/URL
+            csi                 - open the CSI camera with the index camera through a GStreamer pipeline
+            flip_method         - rotation/flip of the CSI camera, see gstreamer_pipeline
+            tracker             - hand tracking backend, one of tracking.BACKENDS
+            quality             - name of the start level of quality.LEVELS (inference and preview settings)
+            target_fps          - frame rate held by the adaptive quality, 0 to keep the start level
+            motion_threshold    - threshold of the motion gate, 0 to track every frame
+            max_skip            - maximum number of frames skipped in a row by the motion gate
+            idle_after          - frames without hands before the idle mode, 0 to stay active
+            button_size         - (width, height) of the buttons below the preview
+            runtime             - buffer strategy, RUNTIME_SERIAL or RUNTIME_ASYNCIO
+            queue_size          - frames waiting between two stages of the asyncio runtime
+            size                - canvas size of the headless mode, e.g. 1920x1080
+            cpus                - cores of the hardware, benchmarks restrict themselves to them, 0 for all
+        """
+        self.name = name
+        self.cam_width = cam_width
+        self.cam_height = cam_height
+        self.capture_fps = capture_fps
+        self.camera = camera
+        self.csi = csi
+        self.flip_method = flip_method
+        self.tracker = tracker
+        self.quality = quality
+        self.target_fps = target_fps
+        self.motion_threshold = motion_threshold
+        self.max_skip = max_skip
+        self.idle_after = idle_after
+        self.button_size = tuple(button_size)
+        self.runtime = runtime
+        self.queue_size = queue_size
+        self.size = size
+        self.cpus = cpus
+
+    @property
+    def level(self):
+        """ Get the index of the start level in quality.LEVELS """
+        return level_index(self.quality)
+
+    def update(self, **values):
+        """ Override settings, unknown settings raise a ValueError
+
+        Keyword arguments:
+            values  - settings by name
+        """
+        for key, value in values.items():
+            if key == "name" or key not in self.settings():
+                raise ValueError("Unknown profile setting: {}".format(key))
+            setattr(self, key, tuple(value) if isinstance(value, list) else value)
+
+        # Fail early on an unknown backend, level or buffer strategy
+        if self.tracker not in tr.BACKENDS:
+            raise ValueError("Unknown tracker: {}".format(self.tracker))
+        level_index(self.quality)
+        if self.runtime not in (RUNTIME_SERIAL, RUNTIME_ASYNCIO):
+            raise ValueError("Unknown runtime: {}".format(self.runtime))
+        try:
+            parse_size(self.size)
+        except argparse.ArgumentTypeError as e:
+            raise ValueError(str(e)) from None
+
+    def capture_source(self, device=None):
+        """ Get the capture device argument and API of cv.VideoCapture for a device of this profile
+
+        Keyword arguments:
+            device  - device index or path/URL, None for the camera of the profile
+        """
+        device = self.camera if device is None else device
+        if self.csi and isinstance(device, int):
+            pipeline = gstreamer_pipeline(max(device, 0), self.cam_width, self.cam_height, self.capture_fps or 30,
+                                          self.flip_method)
+            return pipeline, cv.CAP_GSTREAMER
+        return device, cv.CAP_ANY
+
+    def settings(self):
+        """ Get the settings as a dictionary, e.g. for a config file """
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in vars(self).items()}
+
+    def __repr__(self):
+        return "{} ({}x{} capture, {} tracker, {} quality, {} runtime)".format(
+            self.name, self.cam_width, self.cam_height, self.tracker, self.quality, self.runtime)
+
+
+PROFILES = {
+    "desktop": Profile("desktop"),
+    "jetson": Profile("jetson", camera=1, quality="minimal", target_fps=15, button_size=(80, 30),
+                      size="1280x720", cpus=4),
+    "low-power": Profile("low-power", capture_fps=15, quality="low", target_fps=10, motion_threshold=6,
+                         idle_after=90, button_size=(80, 30), size="1280x720", cpus=1)
+}
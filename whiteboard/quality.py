@@ -0,0 +1,246 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Adaptive quality
+
+Holds a target frame rate by adjusting the quality settings at runtime. The controller measures the frame
+time (from capture to the composed screen) over a window of frames and steps through a list of quality
+levels, from the best to the cheapest settings: inference resolution, model complexity, number of tracked
+hands, preview size and interpolation and the landmark overlay. A level is lowered as soon as the frames
+are too slow and raised again only with a clear headroom, so the settings do not oscillate. Every decision
+is logged.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import json                             # Decision log
+import time                             # Frame time
+
+import cv2 as cv                        # Downscaling, interpolation flags
+
+from whiteboard import buffers as bf    # Frame buffer pool
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# Frames measured before a decision
+WINDOW = 30
+
+# A level is lowered above budget * DOWN_MARGIN and raised below budget * UP_MARGIN
+DOWN_MARGIN = 1.1
+UP_MARGIN = 0.7
+
+# Seconds without a change after a decision, new settings need some frames to take effect
+COOLDOWN = 2.0
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class QualityLevel:
+    """ Quality settings of the hand tracking and the preview """
+
+    def __init__(self, name="", inference_scale=1.0, model_complexity=0, max_num_hands=2, preview_size=(480, 360),
+                 preview_interpolation=cv.INTER_CUBIC, landmarks=True):
+        """ Create a quality level
+
+        Keyword arguments:
+            name                    - name used in the log
+            inference_scale         - scaling factor of the frame passed to the hand tracker
+            model_complexity        - complexity of the hand landmark model (0 or 1)
+            max_num_hands           - maximum number of tracked hands
+            preview_size            - size of the camera preview
+            preview_interpolation   - interpolation of the preview resize
+            landmarks               - draw the landmark overlay on the preview
+        """
+        self.name = name
+        self.inference_scale = inference_scale
+        self.model_complexity = model_complexity
+        self.max_num_hands = max_num_hands
+        self.preview_size = preview_size
+        self.preview_interpolation = preview_interpolation
+        self.landmarks = landmarks
+
+    def settings(self):
+        """ Get the settings as a dictionary for the log """
+        return {
+            "inference_scale": self.inference_scale,
+            "model_complexity": self.model_complexity,
+            "max_num_hands": self.max_num_hands,
+            "preview_size": list(self.preview_size),
+            "preview_interpolation": self.preview_interpolation,
+            "landmarks": self.landmarks
+        }
+
+
+# From the best to the cheapest settings, the whiteboard starts with the default level
+LEVELS = [
+    QualityLevel("high", 1.0, 1, 2, (480, 360), cv.INTER_CUBIC, True),
+    QualityLevel("default", 1.0, 0, 2, (480, 360), cv.INTER_CUBIC, True),
+    QualityLevel("reduced", 0.75, 0, 2, (480, 360), cv.INTER_LINEAR, True),
+    QualityLevel("low", 0.5, 0, 1, (320, 240), cv.INTER_LINEAR, False),
+    QualityLevel("minimal", 0.375, 0, 1, (240, 160), cv.INTER_NEAREST, False)
+]
+DEFAULT_LEVEL = 1
+
+
+class QualityController:
+    """ Adjust the quality level to hold a target frame rate """
+
+    def __init__(self, target_fps=30, levels=None, level=DEFAULT_LEVEL, on_change=None, log_path="", window=WINDOW,
+                 cooldown=COOLDOWN):
+        """ Create the controller, the settings of the start level are applied immediately
+
+        Keyword arguments:
+            target_fps  - frame rate to hold
+            levels      - list of QualityLevel from the best to the cheapest settings
+            level       - index of the start level
+            on_change   - called with the new QualityLevel after every decision
+            log_path    - file the decisions are appended to as JSON lines, empty to only print them
+            window      - number of frames measured before a decision
+            cooldown    - seconds without a change after a decision
+        """
+        self.target_fps = target_fps
+        self.budget = 1 / target_fps
+        self.levels = levels or LEVELS
+        self.level = min(level, len(self.levels) - 1)
+        self.on_change = on_change
+        self.log_path = log_path
+        self.window = window
+        self.cooldown = cooldown
+
+        # List of all decisions as dictionaries
+        self.decisions = []
+
+        self._times = []
+        self._last_change = time.perf_counter()
+
+        self.decide(self.level, 0.0, "start")
+
+    @property
+    def current(self):
+        """ Get the current QualityLevel """
+        return self.levels[self.level]
+
+    def update(self, frame_time=0.0):
+        """ Add a measured frame time and change the level, if the window is too slow or fast enough
+
+        Returns the new QualityLevel or None, if the level has not changed.
+
+        Keyword arguments:
+            frame_time  - seconds from the capture of the latest frame to its composed screen
+        """
+        self._times.append(frame_time)
+        if len(self._times) < self.window:
+            return None
+
+        mean = sum(self._times) / len(self._times)
+        self._times.clear()
+        if time.perf_counter() - self._last_change < self.cooldown:
+            return None
+
+        if mean > self.budget * DOWN_MARGIN and self.level + 1 < len(self.levels):
+            return self.decide(self.level + 1, mean, "frame time {:.1f} ms above budget {:.1f} ms".format(
+                mean * 1000, self.budget * 1000))
+        if mean < self.budget * UP_MARGIN and self.level > 0:
+            return self.decide(self.level - 1, mean, "frame time {:.1f} ms below budget {:.1f} ms".format(
+                mean * 1000, self.budget * 1000))
+        return None
+
+    def decide(self, level=0, frame_time=0.0, reason=""):
+        """ Switch to a level, apply and log it
+
+        Keyword arguments:
+            level       - index of the new level
+            frame_time  - measured mean frame time in seconds
+            reason      - reason of the decision
+        """
+        previous = self.levels[self.level].name
+        self.level = level
+        self._last_change = time.perf_counter()
+        current = self.current
+
+        decision = {
+            "time": time.time(),
+            "from": previous,
+            "to": current.name,
+            "fps": round(1 / frame_time, 1) if frame_time else 0.0,
+            "target_fps": self.target_fps,
+            "reason": reason,
+            "settings": current.settings()
+        }
+        self.decisions.append(decision)
+        print("Quality {} -> {}: {}".format(previous, current.name, reason))
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision) + "\n")
+
+        if self.on_change is not None:
+            self.on_change(current)
+        return current
+
+
+class AdaptiveTracker:
+    """ Hand tracker with adjustable input resolution, model complexity and number of hands """
+
+    def __init__(self, factory=None, level=None):
+        """ Create the tracker
+
+        Keyword arguments:
+            factory - called with (model_complexity, max_num_hands) to create a tracker with process/close
+            level   - QualityLevel of the start settings
+        """
+        self.factory = factory
+        self.inference_scale = 1.0
+        self.buffers = bf.BufferPool()
+        self._model = None
+        self._tracker = None
+        self._pending = None
+        self.configure(level or LEVELS[DEFAULT_LEVEL])
+
+    def configure(self, level=None):
+        """ Take over the settings of a level, a changed model is created before the next frame
+
+        Keyword arguments:
+            level   - QualityLevel
+        """
+        self.inference_scale = level.inference_scale
+        model = (level.model_complexity, level.max_num_hands)
+        self._pending = model if model != self._model else None
+
+    def process(self, image=None):
+        """ Track the hands of an RGB frame, the landmarks are normalized to the original frame
+
+        Keyword arguments:
+            image   - RGB frame
+        """
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self.close()
+            self._tracker = self.factory(*pending)
+            self._model = pending
+
+        if self.inference_scale < 1:
+            height, width = image.shape[:2]
+            size = (round(width * self.inference_scale), round(height * self.inference_scale))
+            scaled = self.buffers.get("scaled", (size[1], size[0]) + image.shape[2:], image.dtype)
+            image = cv.resize(image, size, dst=scaled, interpolation=cv.INTER_AREA)
+        return self._tracker.process(image)
+
+    def close(self):
+        if self._tracker is not None:
+            self._tracker.close()
+            self._tracker = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,368 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Session recorder and player
+
+The recorder captures the raw camera frames, timestamps, hand landmarks/handedness and the classified
+gesture of every loop iteration. Frames are collected into chunks, which are compressed and written by a
+background thread, so the live loop only copies the frame. If the writer cannot keep up, chunks are
+dropped (and counted) instead of blocking the loop.
+
+The player reads a recording back and acts as capture device (isOpened/read/release) as well as hand
+tracker (process), either at the original speed or as fast as possible.
+
+File layout (little-endian):
+
+    FILE_HEADER     - magic, version
+    chunks          - CHUNK_HEADER (compressed size, frame count) + zlib compressed frame records
+
+Frame record:
+
+    FRAME_HEADER    - timestamp, width, height, channels, number of hands
+    hands           - HAND_HEADER (right hand flag, score) + 21 * (x, y, z) float32, normalized coordinates
+    gesture         - GESTURE_HEADER (length) + utf-8 encoded gesture
+    frame           - width * height * channels bytes
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import queue                            # Writer thread communication
+import struct                           # Binary records
+import threading                        # Background compression
+import time                             # Timestamps and playback speed
+import zlib                             # Chunk compression
+
+import numpy as np                      # Frames and landmarks
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+FILE_EXTENSION = ".wbr"
+RECORDING_MAGIC = b"WBR1"
+RECORDING_VERSION = 1
+
+FILE_HEADER = struct.Struct("<4sH")
+CHUNK_HEADER = struct.Struct("<II")
+FRAME_HEADER = struct.Struct("<dHHBB")
+HAND_HEADER = struct.Struct("<Bf")
+GESTURE_HEADER = struct.Struct("<B")
+
+HAND_INDICES = 21
+LANDMARK_BYTES = HAND_INDICES * 3 * 4
+
+CHUNK_FRAMES = 30
+COMPRESSION_LEVEL = 1
+MAX_PENDING_CHUNKS = 8
+
+SPEED_ORIGINAL = "original"
+SPEED_MAX = "max"
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def hands_from_results(results=None):
+    """ Extract a list of (is_right, score, 21 x 3 float32 array) from hand tracking results
+
+    Keyword arguments:
+        results - results of mp.solutions.hands.Hands.process or Player.process
+    """
+    hands = []
+    if results is None or not results.multi_hand_landmarks:
+        return hands
+
+    handedness = results.multi_handedness or [None] * len(results.multi_hand_landmarks)
+    for hand_landmarks, hand in zip(results.multi_hand_landmarks, handedness):
+        points = np.array([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark], np.float32)
+        if hand is not None:
+            classification = hand.classification[0]
+            hands.append((classification.label == "Right", classification.score, points))
+        else:
+            hands.append((True, 0.0, points))
+    return hands
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Recorder:
+    """ Record frames, landmarks and gestures into a chunked, compressed file """
+
+    def __init__(self, path="", chunk_frames=CHUNK_FRAMES, level=COMPRESSION_LEVEL,
+                 max_pending=MAX_PENDING_CHUNKS):
+        """ Create the recording and start the writer thread
+
+        Keyword arguments:
+            path            - target file path
+            chunk_frames    - number of frames per chunk
+            level           - zlib compression level
+            max_pending     - number of chunks waiting for compression before chunks are dropped
+        """
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.level = level
+
+        self.frames = 0
+        self.dropped_chunks = 0
+
+        self._chunk = []
+        self._count = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION))
+        self._thread = threading.Thread(target=self._writer, name="recorder", daemon=True)
+        self._thread.start()
+
+    def add(self, timestamp=0.0, frame=None, hands=None, gesture=""):
+        """ Add a frame to the recording
+
+        Keyword arguments:
+            timestamp   - capture time in seconds
+            frame       - raw BGR camera frame
+            hands       - list of (is_right, score, 21 x 3 float32 array), see hands_from_results
+            gesture     - classified gesture
+        """
+        hands = hands or []
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        encoded = gesture.encode("utf-8")[:255]
+
+        parts = self._chunk
+        parts.append(FRAME_HEADER.pack(timestamp, width, height, channels, len(hands)))
+        for is_right, score, points in hands:
+            parts.append(HAND_HEADER.pack(int(is_right), score))
+            parts.append(np.ascontiguousarray(points, np.float32).tobytes())
+        parts.append(GESTURE_HEADER.pack(len(encoded)))
+        parts.append(encoded)
+        parts.append(frame.tobytes())
+
+        self.frames += 1
+        self._count += 1
+        if self._count >= self.chunk_frames:
+            self._flush_chunk()
+
+    def add_results(self, timestamp=0.0, frame=None, results=None, gesture=""):
+        """ Add a frame together with hand tracking results to the recording
+
+        Keyword arguments:
+            timestamp   - capture time in seconds
+            frame       - raw BGR camera frame
+            results     - hand tracking results
+            gesture     - classified gesture
+        """
+        self.add(timestamp, frame, hands_from_results(results), gesture)
+
+    def _flush_chunk(self):
+        if not self._count:
+            return
+        try:
+            self._queue.put_nowait((self._count, self._chunk))
+        except queue.Full:
+            self.dropped_chunks += 1
+        self._chunk = []
+        self._count = 0
+
+    def close(self):
+        """ Write the remaining frames and close the file """
+        self._flush_chunk()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            count, parts = item
+            data = zlib.compress(b"".join(parts), self.level)
+            self._file.write(CHUNK_HEADER.pack(len(data), count))
+            self._file.write(data)
+
+
+class RecordedLandmark:
+    """ Normalized landmark of a recording, compatible with mp_drawing.draw_landmarks """
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def HasField(self, name=""):
+        return False
+
+
+class RecordedHand:
+    """ Landmarks of a single hand, compatible with the MediaPipe landmark list """
+
+    def __init__(self, points=None):
+        self.landmark = [RecordedLandmark(float(x), float(y), float(z)) for x, y, z in points]
+
+
+class RecordedClassification:
+    """ Handedness of a single hand, compatible with the MediaPipe classification list """
+
+    def __init__(self, is_right=True, score=0.0):
+        self.label = "Right" if is_right else "Left"
+        self.score = score
+        self.classification = [self]
+
+
+class RecordedResults:
+    """ Hand tracking results of a recorded frame, compatible with mp.solutions.hands results """
+
+    def __init__(self, hands=None, gesture=""):
+        self.gesture = gesture
+        self.multi_hand_landmarks = [RecordedHand(points) for _, _, points in hands] or None
+        self.multi_handedness = [RecordedClassification(r, s) for r, s, _ in hands] or None
+
+
+class Player:
+    """ Play back a recording as capture device and hand tracker """
+
+    def __init__(self, path="", speed=SPEED_ORIGINAL, loop=False):
+        """ Open a recording
+
+        Keyword arguments:
+            path    - recording file path
+            speed   - SPEED_ORIGINAL to keep the recorded timing, SPEED_MAX to play as fast as possible
+            loop    - start over at the end of the recording
+        """
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+        self._file = open(path, "rb")
+        magic, version = FILE_HEADER.unpack(self._file.read(FILE_HEADER.size))
+        if magic != RECORDING_MAGIC:
+            raise ValueError("Not a whiteboard recording: " + path)
+        if version > RECORDING_VERSION:
+            raise ValueError("Unsupported recording version: " + str(version))
+
+        self._frames = []
+        self._results = None
+        self._first_timestamp = None
+        self._start = None
+        self._open = True
+
+    # ----- Frame source -----
+
+    def _read_chunk(self):
+        header = self._file.read(CHUNK_HEADER.size)
+        if len(header) < CHUNK_HEADER.size:
+            return False
+        size, count = CHUNK_HEADER.unpack(header)
+        data = self._file.read(size)
+        if len(data) < size:
+            return False
+
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            return False
+        pos = 0
+        for _ in range(count):
+            timestamp, width, height, channels, hand_count = FRAME_HEADER.unpack_from(data, pos)
+            pos += FRAME_HEADER.size
+
+            hands = []
+            for _ in range(hand_count):
+                is_right, score = HAND_HEADER.unpack_from(data, pos)
+                pos += HAND_HEADER.size
+                points = np.frombuffer(data, np.float32, HAND_INDICES * 3, pos).reshape((HAND_INDICES, 3))
+                pos += LANDMARK_BYTES
+                hands.append((bool(is_right), score, points))
+
+            length = GESTURE_HEADER.unpack_from(data, pos)[0]
+            pos += GESTURE_HEADER.size
+            gesture = data[pos:pos + length].decode("utf-8", "replace")
+            pos += length
+
+            frame_bytes = width * height * channels
+            frame = np.frombuffer(data, np.uint8, frame_bytes, pos)
+            frame = frame.reshape((height, width, channels) if channels > 1 else (height, width))
+            pos += frame_bytes
+
+            self._frames.append((timestamp, frame, hands, gesture))
+        return True
+
+    def next(self):
+        """ Get the next recorded tuple (timestamp, frame, hands, gesture), None at the end """
+        if not self._frames and not self._read_chunk():
+            if not self.loop:
+                return None
+            self._file.seek(FILE_HEADER.size)
+            self._first_timestamp = None
+            if not self._read_chunk():
+                return None
+
+        timestamp, frame, hands, gesture = self._frames.pop(0)
+
+        # Keep the recorded timing
+        if self.speed == SPEED_ORIGINAL:
+            if self._first_timestamp is None:
+                self._first_timestamp = timestamp
+                self._start = time.perf_counter()
+            delay = (timestamp - self._first_timestamp) - (time.perf_counter() - self._start)
+            if delay > 0:
+                time.sleep(delay)
+
+        return timestamp, frame, hands, gesture
+
+    def isOpened(self):
+        return self._open
+
+    def read(self, image=None):
+        """ Read the next frame like cv.VideoCapture.read
+
+        Keyword arguments:
+            image   - buffer to copy the frame into, like cv.VideoCapture.read
+        """
+        item = self.next() if self._open else None
+        if item is None:
+            self._open = False
+            self._results = None
+            return False, None
+
+        _, frame, hands, gesture = item
+        self._results = RecordedResults(hands, gesture)
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def set(self, prop_id=0, value=0):
+        return False
+
+    def release(self):
+        self._open = False
+        self._file.close()
+
+    # ----- Hand tracker -----
+
+    def process(self, image=None):
+        """ Get the recorded hand tracking results of the frame returned by the latest read
+
+        Keyword arguments:
+            image   - ignored, for compatibility with mp.solutions.hands.Hands.process
+        """
+        return self._results if self._results is not None else RecordedResults([])
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,392 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" asyncio runtime
+
+Runs the stages of the whiteboard as separate asyncio tasks instead of one serial loop:
+
+    capture     - reads frames from the capture device in its own thread
+    inference   - converts the frame and runs the hand tracker in the inference executor
+    compose     - steps the whiteboard engine in a single thread, so the board state is never shared
+    display     - shows the composed whiteboard screen on the event loop thread (imshow/waitKey)
+    outputs     - further consumers of the composed screen (network, files, ...) in the I/O executor
+    autosave    - takes the journal checkpoints of the board
+    commands    - blocking user interface actions (file dialogs, saving) in a dedicated thread
+
+Stages are connected by bounded queues. A stage that falls behind only ever sees the latest item, older
+items are dropped and counted, so slow I/O never delays the pen. At the end of the capture device, the
+frames still in the queues are processed before the runtime stops. The rate of capture, display and every
+output can be limited independently.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import asyncio                          # Task scheduling
+import concurrent.futures as cf         # Executors for blocking stages
+import time                             # Rates and timestamps
+
+import cv2 as cv                        # Color conversion
+
+from whiteboard import gestures as gs   # Landmark conversion
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+QUEUE_SIZE = 1
+AUTOSAVE_INTERVAL = 1.0
+
+# Seconds the outputs may take to finish after the end of the capture device
+DRAIN_TIMEOUT = 5.0
+
+# Passed through all queues after the last frame, it is never dropped
+END = None
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def put_latest(q=None, item=None):
+    """ Put an item into a bounded queue, dropping the oldest item if it is full
+
+    Returns True, if an item has been dropped.
+
+    Keyword arguments:
+        q       - asyncio.Queue
+        item    - item to put
+    """
+    dropped = False
+    if q.full():
+        q.get_nowait()
+        dropped = True
+    q.put_nowait(item)
+    return dropped
+
+
+async def limit_rate(last=0.0, fps=0):
+    """ Sleep until the next period of a rate limited stage starts and return its start time
+
+    Keyword arguments:
+        last    - start time of the previous period
+        fps     - rate of the stage, 0 for no limit
+    """
+    if fps:
+        delay = last + 1 / fps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    return time.perf_counter()
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class Stage:
+    """ Counters of a runtime stage """
+
+    def __init__(self, name="", fps=0):
+        """ Create the counters
+
+        Keyword arguments:
+            name    - name of the stage
+            fps     - rate limit of the stage, 0 for no limit
+        """
+        self.name = name
+        self.fps = fps
+        self.items = 0
+        self.dropped = 0
+        self.busy = 0.0
+
+    def __repr__(self):
+        return "{}: {} items, {} dropped, {:.1f} s busy".format(self.name, self.items, self.dropped, self.busy)
+
+
+class Output:
+    """ Consumer of the composed whiteboard screen running in the I/O executor """
+
+    def __init__(self, name="", func=None, fps=0, queue_size=QUEUE_SIZE):
+        """ Create the output
+
+        Keyword arguments:
+            name        - name of the output
+            func        - called with (timestamp, screen) of composed frames
+            fps         - rate limit of the output, 0 for no limit
+            queue_size  - number of frames waiting for the output
+        """
+        self.name = name
+        self.func = func
+        self.stage = Stage(name, fps)
+        self.queue_size = queue_size
+        self.queue = None
+
+
+class Runtime:
+    """ Run a whiteboard engine with capture, inference, compositing, display and I/O as asyncio tasks """
+
+    def __init__(self, board=None, cam=None, tracker=None, display=None, capture_fps=0, display_fps=0,
+                 autosave_interval=AUTOSAVE_INTERVAL, queue_size=QUEUE_SIZE):
+        """ Create the runtime
+
+        Keyword arguments:
+            board               - whiteboard engine
+            cam                 - capture device with isOpened/read
+            tracker             - hand tracker with process, or a function (frame) -> (frame, landmarks, results)
+            display             - called with the composed screen on the event loop thread, returns False to stop
+            capture_fps         - rate limit of the capture stage, 0 for no limit
+            display_fps         - rate limit of the display stage, 0 for no limit
+            autosave_interval   - seconds between checks for a due journal checkpoint
+            queue_size          - number of items waiting between two stages
+        """
+        self.board = board
+        self.cam = cam
+        self.tracker = tracker
+        self.display = display
+        self.autosave_interval = autosave_interval
+        self.queue_size = queue_size
+
+        # Called on the compose thread after every step with (timestamp, raw frame, results, board)
+        self.on_step = None
+
+        # Called on the event loop thread after every item of a stage with (stage name, seconds)
+        self.on_stage = None
+
+        self.outputs = []
+        self.stages = {
+            "capture": Stage("capture", capture_fps),
+            "inference": Stage("inference"),
+            "compose": Stage("compose"),
+            "display": Stage("display", display_fps)
+        }
+
+        self._capture_pool = cf.ThreadPoolExecutor(1, thread_name_prefix="capture")
+        # Hand trackers keep state between frames and are not thread-safe, one frame is tracked at a time
+        self._inference_pool = cf.ThreadPoolExecutor(1, thread_name_prefix="inference")
+        self._compose_pool = cf.ThreadPoolExecutor(1, thread_name_prefix="compose")
+        self._io_pool = cf.ThreadPoolExecutor(4, thread_name_prefix="output")
+        self._command_pool = cf.ThreadPoolExecutor(1, thread_name_prefix="command")
+
+        # Set when the capture device could not deliver a frame anymore
+        self.capture_failed = False
+
+        self._loop = None
+        self._stop = None
+        self._running = False
+        self._ended = False
+
+    # ----- Control -----
+
+    def add_output(self, name="", func=None, fps=0, queue_size=QUEUE_SIZE):
+        """ Add a consumer of the composed whiteboard screen, must be called before run()
+
+        Keyword arguments:
+            name        - name of the output
+            func        - called with (timestamp, screen) in the I/O executor
+            fps         - rate limit of the output, 0 for no limit
+            queue_size  - number of frames waiting for the output
+        """
+        output = Output(name, func, fps, queue_size)
+        self.outputs.append(output)
+        return output
+
+    def command(self, func=None, *args):
+        """ Execute a blocking user interface action without delaying the pen, callable from any thread
+
+        Keyword arguments:
+            func    - function to execute
+            args    - arguments of the function
+        """
+        if self._loop is None or not self._running:
+            func(*args)
+            return
+        self._loop.call_soon_threadsafe(self._command_pool.submit, func, *args)
+
+    def run_on_compose(self, func=None, *args, wait=True):
+        """ Execute a function on the compose thread and return its result, callable from any thread but the
+        compose thread itself
+
+        The whiteboard engine is only modified on the compose thread, so this gives consistent access to its
+        state, e.g. to copy the board for saving. Functions run in the order they were passed.
+
+        Keyword arguments:
+            func    - function to execute
+            args    - arguments of the function
+            wait    - wait for the result, False to return None immediately, e.g. on the event loop thread
+        """
+        if not self._running:
+            return func(*args)
+        future = self._compose_pool.submit(func, *args)
+        return future.result() if wait else None
+
+    def stop(self):
+        """ Stop all tasks, callable from any thread """
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def run(self):
+        """ Run until the capture device ends, the display returns False or stop() is called """
+        asyncio.run(self.main())
+
+    async def main(self):
+        """ Run all stages as tasks of the current event loop """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._running = True
+
+        # The runtime takes the journal checkpoints itself
+        self.board.auto_checkpoint = False
+
+        # Every queue and every consumer may still hold a composed screen while the next one is composed
+        screen_buffers = self.board.screen_buffers
+        self.board.screen_buffers = 2 + self.queue_size + sum(output.queue_size + 1 for output in self.outputs)
+
+        frames = asyncio.Queue(self.queue_size)
+        tracked = asyncio.Queue(self.queue_size)
+        composed = asyncio.Queue(self.queue_size)
+        for output in self.outputs:
+            output.queue = asyncio.Queue(output.queue_size)
+
+        tasks = [
+            asyncio.create_task(self._capture(frames)),
+            asyncio.create_task(self._inference(frames, tracked)),
+            asyncio.create_task(self._compose(tracked, composed)),
+            asyncio.create_task(self._display(composed)),
+            asyncio.create_task(self._autosave())
+        ]
+        outputs = [asyncio.create_task(self._output(output)) for output in self.outputs]
+        tasks += outputs
+
+        try:
+            await self._stop.wait()
+
+            # Let the outputs write the last frames at the end of the capture device
+            if outputs and self._ended:
+                await asyncio.wait(outputs, timeout=DRAIN_TIMEOUT)
+        finally:
+            self._running = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.board.auto_checkpoint = True
+            self.board.screen_buffers = screen_buffers
+            for pool in (self._capture_pool, self._inference_pool, self._compose_pool, self._io_pool,
+                         self._command_pool):
+                pool.shutdown(wait=True)
+
+    # ----- Stages -----
+
+    async def _blocking(self, stage=None, pool=None, func=None, *args):
+        start = time.perf_counter()
+        result = await self._loop.run_in_executor(pool, func, *args)
+        self._finish_item(stage, time.perf_counter() - start)
+        return result
+
+    def _finish_item(self, stage=None, seconds=0.0):
+        stage.busy += seconds
+        stage.items += 1
+        if self.on_stage is not None:
+            self.on_stage(stage.name, seconds)
+
+    async def _capture(self, frames=None):
+        stage = self.stages["capture"]
+        last = 0.0
+        while self.cam.isOpened():
+            last = await limit_rate(last, stage.fps)
+            success, frame = await self._blocking(stage, self._capture_pool, self.cam.read)
+            if not success:
+                self.capture_failed = True
+                break
+            stage.dropped += put_latest(frames, (time.time(), frame))
+        await frames.put(END)
+
+    def _track(self, frame=None):
+        if not hasattr(self.tracker, "process"):
+            return self.tracker(frame)
+
+        # The hand tracker needs RGB, the preview stays BGR
+        results = self.tracker.process(cv.cvtColor(frame, cv.COLOR_BGR2RGB))
+        return frame, gs.landmarks_from_results(results, self.board.cam_width, self.board.cam_height), results
+
+    async def _inference(self, frames=None, tracked=None):
+        stage = self.stages["inference"]
+        while True:
+            item = await frames.get()
+            if item is END:
+                await tracked.put(END)
+                return
+
+            timestamp, frame = item
+            item = await self._blocking(stage, self._inference_pool, self._track, frame)
+            stage.dropped += put_latest(tracked, (timestamp, frame) + tuple(item))
+
+    def _step(self, timestamp=0.0, raw=None, frame=None, landmarks=None, results=None):
+        screen = self.board.step(frame, landmarks)
+        if self.on_step is not None:
+            self.on_step(timestamp, raw, results, self.board)
+        return screen
+
+    async def _compose(self, tracked=None, composed=None):
+        stage = self.stages["compose"]
+        while True:
+            item = await tracked.get()
+            if item is END:
+                await composed.put(END)
+                for output in self.outputs:
+                    await output.queue.put(END)
+                return
+
+            screen = await self._blocking(stage, self._compose_pool, self._step, *item)
+            stage.dropped += put_latest(composed, (item[0], screen))
+            for output in self.outputs:
+                output.stage.dropped += put_latest(output.queue, (item[0], screen))
+
+    async def _display(self, composed=None):
+        stage = self.stages["display"]
+        last = 0.0
+        while True:
+            item = await composed.get()
+            if item is END:
+                self._ended = True
+                self._stop.set()
+                return
+
+            last = await limit_rate(last, stage.fps)
+            if self.display is None:
+                continue
+
+            # imshow/waitKey have to run on the thread that owns the window
+            start = time.perf_counter()
+            keep_running = self.display(item[1])
+            self._finish_item(stage, time.perf_counter() - start)
+            if keep_running is False:
+                self._stop.set()
+                return
+
+    async def _output(self, output=None):
+        stage = output.stage
+        last = 0.0
+        while True:
+            item = await output.queue.get()
+            if item is END:
+                return
+
+            timestamp, screen = item
+            last = await limit_rate(last, stage.fps)
+            await self._blocking(stage, self._io_pool, output.func, timestamp, screen)
+
+    async def _autosave(self):
+        while True:
+            await asyncio.sleep(self.autosave_interval)
+            journal = self.board.journal
+            if journal is not None and journal.checkpoint_due():
+                await self._loop.run_in_executor(self._compose_pool, self._checkpoint)
+
+    def _checkpoint(self):
+        # Checkpoints are only taken from the unzoomed screen
+        if self.board.journal is not None and self.board.zoom_factor == 100:
+            self.board.journal.checkpoint(self.board.w_screen_before_zoomed)
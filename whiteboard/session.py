@@ -0,0 +1,318 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Native session file format (.wbs)
+
+A session file contains the stroke data, the color palette, the zoom/viewport state and optionally the
+whiteboard screen as raster tiles. Nothing is compressed and every section is aligned to the page size,
+so a session can be memory-mapped and opened without decoding anything.
+
+Layout (little-endian):
+
+    header          - HEADER, padded to SECTION_ALIGNMENT
+    palette         - palette_count * PALETTE_ENTRY
+    strokes         - stroke_count * STROKE_DTYPE (same layout as the journal segment records)
+    tile index      - tile_rows * tile_cols * int32, slot of each tile or -1 for a blank (white) tile
+    tile data       - slots * tile_size * tile_size * channels bytes, edge tiles are padded
+
+Tiles are materialized lazily: SessionReader.tile and SessionReader.region only read the tiles they need
+from the mapping, and thumbnails are scaled tile by tile without allocating the stored resolution.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import os                               # Filesystem
+import struct                           # Binary header
+
+import cv2 as cv                        # Stroke replay
+import numpy as np                      # Memory mapping
+
+from whiteboard import journal as jn    # Stroke records
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+FILE_EXTENSION = ".wbs"
+SESSION_MAGIC = b"WBS1"
+SESSION_VERSION = 1
+
+SECTION_ALIGNMENT = 4096
+TILE_SIZE = 256
+BLANK_TILE = -1
+WHITE = 255
+
+# Flags
+FLAG_RASTER = 1
+
+# magic, version, flags, width, height, tile size, channels, zoom factor, color key, off_width, off_height,
+# palette count, stroke count, palette offset, stroke offset, tile index offset, tile data offset
+HEADER = struct.Struct("<4sHHIIHHHHIIHIQQQQ")
+
+# name, b, g, r
+PALETTE_ENTRY = struct.Struct("<16s3B")
+
+# Same layout as journal.SEGMENT
+STROKE_DTYPE = np.dtype([
+    ("op", "u1"),
+    ("x1", "<i2"),
+    ("y1", "<i2"),
+    ("x2", "<i2"),
+    ("y2", "<i2"),
+    ("b", "u1"),
+    ("g", "u1"),
+    ("r", "u1"),
+    ("thickness", "u1")
+])
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def _align(offset=0):
+    return (offset + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+
+def is_session_file(path=""):
+    """ Check if a path refers to a session file by its extension
+
+    Keyword arguments:
+        path    - file path
+    """
+    return os.path.splitext(path)[1].lower() == FILE_EXTENSION
+
+
+def write_session(path="", board=None, strokes=b"", palette=None, color_key=0, zoom_factor=100,
+                  off_width=0, off_height=0, raster=True, tile_size=TILE_SIZE):
+    """ Write a session file
+
+    Keyword arguments:
+        path        - target file path
+        board       - unzoomed whiteboard screen (height x width x channels, uint8)
+        strokes     - packed journal segment records since the last clear/load
+        palette     - list of [label, (b, g, r)] color options
+        color_key   - index of the current color
+        zoom_factor - current zoom factor in percent
+        off_width   - current horizontal zoom offset
+        off_height  - current vertical zoom offset
+        raster      - store the whiteboard screen as raster tiles
+        tile_size   - edge length of a raster tile
+    """
+    height, width, channels = board.shape
+    palette = palette or []
+    stroke_count = len(strokes) // STROKE_DTYPE.itemsize
+
+    tile_rows = -(-height // tile_size)
+    tile_cols = -(-width // tile_size)
+    tile_index = np.full(tile_rows * tile_cols, BLANK_TILE, np.int32)
+    tiles = []
+
+    # Only tiles containing something other than white are stored
+    if raster:
+        for ty in range(tile_rows):
+            for tx in range(tile_cols):
+                tile = board[ty * tile_size:(ty + 1) * tile_size, tx * tile_size:(tx + 1) * tile_size]
+                if not (tile == WHITE).all():
+                    tile_index[ty * tile_cols + tx] = len(tiles)
+                    tiles.append(tile)
+
+    palette_offset = _align(HEADER.size)
+    stroke_offset = _align(palette_offset + len(palette) * PALETTE_ENTRY.size)
+    tile_index_offset = _align(stroke_offset + stroke_count * STROKE_DTYPE.itemsize)
+    tile_data_offset = _align(tile_index_offset + tile_index.nbytes)
+
+    header = HEADER.pack(
+        SESSION_MAGIC, SESSION_VERSION, FLAG_RASTER if raster else 0, width, height, tile_size, channels,
+        zoom_factor, color_key, off_width, off_height, len(palette), stroke_count,
+        palette_offset, stroke_offset, tile_index_offset, tile_data_offset
+    )
+
+    # Write to a temporary file first, so an existing session is never left half written
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+
+        f.seek(palette_offset)
+        for label, col in palette:
+            f.write(PALETTE_ENTRY.pack(label.encode("utf-8")[:16], *col))
+
+        f.seek(stroke_offset)
+        f.write(bytes(strokes[:stroke_count * STROKE_DTYPE.itemsize]))
+
+        f.seek(tile_index_offset)
+        f.write(tile_index.tobytes())
+
+        f.seek(tile_data_offset)
+        padded = np.full((tile_size, tile_size, channels), WHITE, np.uint8)
+        for tile in tiles:
+            if tile.shape[0] == tile_size and tile.shape[1] == tile_size:
+                f.write(np.ascontiguousarray(tile).tobytes())
+            else:
+                padded[:] = WHITE
+                padded[:tile.shape[0], :tile.shape[1]] = tile
+                f.write(padded.tobytes())
+        f.truncate()
+
+    os.replace(tmp, path)
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class SessionReader:
+    """ Memory-mapped view on a session file
+
+    Opening a session only parses the header. Palette, strokes and tiles are views on the mapping and are
+    read from disk when they are accessed.
+    """
+
+    def __init__(self, path=""):
+        """ Open and map a session file
+
+        Keyword arguments:
+            path    - session file path
+        """
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+
+        (magic, version, flags, self.width, self.height, self.tile_size, self.channels, self.zoom_factor,
+         self.color_key, self.off_width, self.off_height, palette_count, stroke_count, palette_offset,
+         stroke_offset, tile_index_offset, tile_data_offset) = HEADER.unpack_from(self._map, 0)
+
+        if magic != SESSION_MAGIC:
+            raise ValueError("Not a whiteboard session file: " + path)
+        if version > SESSION_VERSION:
+            raise ValueError("Unsupported session file version: " + str(version))
+
+        self.has_raster = bool(flags & FLAG_RASTER)
+        self.tile_rows = -(-self.height // self.tile_size)
+        self.tile_cols = -(-self.width // self.tile_size)
+
+        self.palette = []
+        for i in range(palette_count):
+            label, b, g, r = PALETTE_ENTRY.unpack_from(self._map, palette_offset + i * PALETTE_ENTRY.size)
+            self.palette.append([label.rstrip(b"\0").decode("utf-8", "replace"), (b, g, r)])
+
+        self.strokes = self._map[stroke_offset:stroke_offset + stroke_count * STROKE_DTYPE.itemsize] \
+            .view(STROKE_DTYPE)
+        self.tile_index = self._map[tile_index_offset:tile_index_offset + self.tile_rows * self.tile_cols * 4] \
+            .view(np.int32)
+
+        tile_bytes = self.tile_size * self.tile_size * self.channels
+        slots = (len(self._map) - tile_data_offset) // tile_bytes
+        self.tile_data = self._map[tile_data_offset:tile_data_offset + slots * tile_bytes] \
+            .reshape((slots, self.tile_size, self.tile_size, self.channels))
+
+    def tile(self, ty=0, tx=0):
+        """ Get a tile of the whiteboard screen as read-only view, None for a blank tile
+
+        Keyword arguments:
+            ty  - tile row
+            tx  - tile column
+        """
+        slot = self.tile_index[ty * self.tile_cols + tx]
+        if slot == BLANK_TILE:
+            return None
+        return self.tile_data[slot]
+
+    def region(self, x=0, y=0, width=0, height=0, line_type=cv.LINE_AA):
+        """ Materialize a region of the whiteboard screen, only the tiles overlapping it are read
+
+        Without raster tiles, the region is reconstructed from the strokes.
+
+        Keyword arguments:
+            x           - left edge of the region
+            y           - top edge of the region
+            width       - width of the region, 0 up to the right edge
+            height      - height of the region, 0 up to the bottom edge
+            line_type   - line type used for replaying strokes
+        """
+        width = width or self.width - x
+        height = height or self.height - y
+
+        # Strokes are drawn on the complete board, clipped lines would be anti-aliased differently
+        if not self.has_raster:
+            board = np.full((self.height, self.width, self.channels), WHITE, np.uint8)
+            for s in self.strokes:
+                cv.line(board, (int(s["x1"]), int(s["y1"])), (int(s["x2"]), int(s["y2"])),
+                        (int(s["b"]), int(s["g"]), int(s["r"])), thickness=int(s["thickness"]), lineType=line_type)
+            if (x, y, width, height) == (0, 0, self.width, self.height):
+                return board
+            return board[y:y + height, x:x + width].copy()
+
+        region = np.full((height, width, self.channels), WHITE, np.uint8)
+
+        ts = self.tile_size
+        for ty in range(y // ts, min(self.tile_rows, -(-(y + height) // ts))):
+            for tx in range(x // ts, min(self.tile_cols, -(-(x + width) // ts))):
+                tile = self.tile(ty, tx)
+                if tile is None:
+                    continue
+                # Intersection of the tile with the region in board coordinates
+                x0, x1 = max(x, tx * ts), min(x + width, (tx + 1) * ts, self.width)
+                y0, y1 = max(y, ty * ts), min(y + height, (ty + 1) * ts, self.height)
+                region[y0 - y:y1 - y, x0 - x:x1 - x] = tile[y0 - ty * ts:y1 - ty * ts, x0 - tx * ts:x1 - tx * ts]
+        return region
+
+    def board(self, width=0, height=0, line_type=cv.LINE_AA):
+        """ Materialize the whiteboard screen, optionally resized to the given resolution
+
+        Without raster tiles, the whiteboard screen is reconstructed from the strokes.
+
+        Keyword arguments:
+            width       - target width, 0 for the stored width
+            height      - target height, 0 for the stored height
+            line_type   - line type used for replaying strokes
+        """
+        board = self.region(line_type=line_type)
+        if (width and width != self.width) or (height and height != self.height):
+            board = cv.resize(board, (width or self.width, height or self.height), interpolation=cv.INTER_AREA)
+        return board
+
+    def thumbnail(self, width=0, height=0):
+        """ Get a small version of the whiteboard screen, scaled tile by tile without materializing the stored
+        resolution, the tile edges are not blended
+
+        Keyword arguments:
+            width   - target width
+            height  - target height
+        """
+        if not self.has_raster:
+            return self.board(width, height)
+
+        thumb = np.full((height, width, self.channels), WHITE, np.uint8)
+        ts = self.tile_size
+        fx = width / self.width
+        fy = height / self.height
+        for ty in range(self.tile_rows):
+            y0, y1 = round(ty * ts * fy), round(min((ty + 1) * ts, self.height) * fy)
+            for tx in range(self.tile_cols):
+                x0, x1 = round(tx * ts * fx), round(min((tx + 1) * ts, self.width) * fx)
+                tile = self.tile(ty, tx)
+                if tile is None or x1 <= x0 or y1 <= y0:
+                    continue
+                tile = tile[:min(ts, self.height - ty * ts), :min(ts, self.width - tx * ts)]
+                cv.resize(tile, (x1 - x0, y1 - y0), dst=thumb[y0:y1, x0:x1], interpolation=cv.INTER_AREA)
+        return thumb
+
+    def stroke_bytes(self):
+        """ Get the strokes as packed journal segment records """
+        return self.strokes.tobytes()
+
+    def close(self):
+        """ Release the memory mapping """
+        self._map = None
+        self.strokes = None
+        self.tile_index = None
+        self.tile_data = None
+
+
+# Keep the record layouts in sync
+assert STROKE_DTYPE.itemsize == jn.SEGMENT.size
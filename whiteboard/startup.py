@@ -0,0 +1,168 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Startup
+
+Gets the whiteboard on the screen before the hand tracker is ready. The hand tracker model is created and
+warmed up with dummy frames on a background thread, while the window already shows the blank canvas and the
+camera preview. The first tracker requested with the warmed-up settings is handed over without delay. The
+milestones of the startup (first screen, first camera frame, first landmark) are timed from the start of the
+process.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import os                               # Clock ticks
+import threading                        # Background warm-up
+import time                             # Milestones
+
+import numpy as np                      # Dummy frames
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# Dummy frames processed by a new hand tracker before the first camera frame
+WARMUP_FRAMES = 2
+
+# Milestones of the startup in the order they are reached
+MILESTONES = ("first screen", "model ready", "first frame", "first landmark")
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def process_age():
+    """ Get the seconds since the start of the process including the interpreter startup, None if unknown """
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class StartupTimer:
+    """ Seconds from the start of the process to the milestones of the startup """
+
+    def __init__(self, verbose=True):
+        """ Start timing, the time the process ran before counts as well
+
+        Keyword arguments:
+            verbose - print every milestone when it is reached
+        """
+        self.verbose = verbose
+        self.origin = time.perf_counter() - (process_age() or 0.0)
+
+        # Milestone -> seconds since the start of the process
+        self.milestones = {}
+
+        self._lock = threading.Lock()
+
+    def mark(self, name=""):
+        """ Record a milestone, only the first time it is reached counts, callable from any thread
+
+        Keyword arguments:
+            name    - name of the milestone, e.g. one of MILESTONES
+        """
+        with self._lock:
+            if name in self.milestones:
+                return
+            self.milestones[name] = time.perf_counter() - self.origin
+        if self.verbose:
+            print("Startup: {} after {:.2f} s".format(name, self.milestones[name]))
+
+    def __repr__(self):
+        return ", ".join("{} {:.2f} s".format(name, seconds) for name, seconds in
+                         sorted(self.milestones.items(), key=lambda item: item[1])) or "no milestone reached"
+
+
+class ModelWarmup:
+    """ Hand tracker created and warmed up on a background thread """
+
+    def __init__(self, factory=None, args=(), frame_size=(640, 480), timer=None):
+        """ Start the warm-up
+
+        Keyword arguments:
+            factory     - called with args to create a tracker with process/close, may import the model
+            args        - arguments of the warmed-up tracker, e.g. (model_complexity, max_num_hands)
+            frame_size  - (width, height) of the dummy frames
+            timer       - StartupTimer marked with "model ready", may be None
+        """
+        self.factory = factory
+        self.args = tuple(args)
+        self.frame_size = frame_size
+        self.timer = timer
+        self.seconds = 0.0
+        self.error = None
+
+        self._tracker = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._warm_up, name="model-warmup", daemon=True)
+        self._thread.start()
+
+    @property
+    def ready(self):
+        """ True, if the warmed-up tracker is available (or the warm-up failed) """
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """ Wait for the end of the warm-up, returns True if it has ended
+
+        Keyword arguments:
+            timeout - seconds to wait, None to wait without limit
+        """
+        return self._ready.wait(timeout)
+
+    def take(self, *args):
+        """ Get a tracker, the warmed-up one if the arguments match and it has not been taken yet
+
+        The function can be used as factory of quality.AdaptiveTracker.
+
+        Keyword arguments:
+            args    - arguments of the tracker
+        """
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        if tuple(args) == self.args and self._tracker is not None:
+            tracker, self._tracker = self._tracker, None
+            return tracker
+        return self.factory(*args)
+
+    def close(self):
+        """ Close the warmed-up tracker, if it has not been taken """
+        self._ready.wait()
+        if self._tracker is not None:
+            self._tracker.close()
+            self._tracker = None
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        try:
+            tracker = self.factory(*self.args)
+            frame = np.zeros((self.frame_size[1], self.frame_size[0], 3), np.uint8)
+            for _ in range(WARMUP_FRAMES):
+                tracker.process(frame)
+            self._tracker = tracker
+        except Exception as e:
+            # Any error of the tracker is raised again in take() on the thread requesting the tracker
+            self.error = e
+        finally:
+            # take() and close() wait for the warm-up, so it has to end in every case
+            self.seconds = time.perf_counter() - start
+            self._ready.set()
+        if self.timer is not None and self.error is None:
+            self.timer.mark("model ready")
@@ -0,0 +1,332 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" HTTP viewer stream
+
+A local HTTP endpoint for read-only viewers of the composed whiteboard screen. Every written frame is
+compared tile by tile with the previous one. Only if a tile changed, the version of the canvas (and of the
+changed tiles) is increased. JPEG encoding is done on demand, at most once per version, and the encoded
+data is shared by all connected viewers, so the CPU cost does not grow with the number of viewers.
+
+    /               - viewer page, loads only the changed tiles
+    /stream.mjpg    - MJPEG stream of full frames
+    /frame.jpg      - latest full frame
+    /tiles?since=N  - JSON list of the tiles changed after version N, waits for the next change
+    /tile/Y/X.jpg   - latest version of a single tile
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import json                             # Tile lists
+import threading                        # Server thread and frame notification
+import time                             # Frame rate
+import urllib.parse                     # Query strings
+from http import server                 # HTTP server
+
+import cv2 as cv                        # JPEG encoding
+import numpy as np                      # Dirty tile detection
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+DEFAULT_PORT = 8080
+TILE_SIZE = 128
+JPEG_QUALITY = 80
+STREAM_FPS = 15
+
+# Seconds a viewer waits for a new version before the request is answered anyway
+WAIT_TIMEOUT = 10.0
+
+BOUNDARY = "whiteboardframe"
+
+VIEWER_PAGE = """<!DOCTYPE html>
+<html><head><title>OpenCV-Whiteboard</title>
+<style>body{margin:0;background:#333}canvas{display:block;max-width:100vw;max-height:100vh;margin:auto}</style>
+</head><body><canvas id="board"></canvas><script>
+const canvas = document.getElementById("board");
+const context = canvas.getContext("2d");
+let version = 0;
+async function update() {
+    try {
+        const info = await (await fetch("/tiles?since=" + version)).json();
+        if (canvas.width !== info.width || canvas.height !== info.height) {
+            // Resizing clears the canvas, so all tiles are requested again
+            canvas.width = info.width;
+            canvas.height = info.height;
+            version = 0;
+            info.tiles = [];
+        } else {
+            version = info.version;
+        }
+        for (const [y, x, v] of info.tiles) {
+            const tile = new Image();
+            tile.onload = () => context.drawImage(tile, x * info.tile, y * info.tile);
+            tile.src = "/tile/" + y + "/" + x + ".jpg?v=" + v;
+        }
+    } catch (e) {
+        await new Promise(r => setTimeout(r, 1000));
+    }
+    update();
+}
+update();
+</script></body></html>
+"""
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class StreamHandler(server.BaseHTTPRequestHandler):
+    """ Request handler of the viewer stream """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format="", *args):
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        stream = self.server.stream
+
+        if not parts:
+            self._send(VIEWER_PAGE.encode("utf-8"), "text/html; charset=utf-8")
+        elif parts == ["stream.mjpg"]:
+            self._send_mjpeg(stream)
+        elif parts == ["frame.jpg"]:
+            data = stream.frame_jpeg()[1]
+            if data is None:
+                self.send_error(503)
+            else:
+                self._send(data, "image/jpeg")
+        elif parts == ["tiles"]:
+            try:
+                since = int(urllib.parse.parse_qs(url.query).get("since", ["0"])[0])
+            except ValueError:
+                self.send_error(400)
+                return
+            self._send(json.dumps(stream.changed_tiles(since)).encode("utf-8"), "application/json")
+        elif len(parts) == 3 and parts[0] == "tile" and parts[2].endswith(".jpg"):
+            try:
+                y, x = int(parts[1]), int(parts[2][:-4])
+            except ValueError:
+                self.send_error(400)
+                return
+            data = stream.tile_jpeg(y, x)
+            if data is None:
+                self.send_error(404)
+            else:
+                self._send(data, "image/jpeg", "max-age=3600")
+        else:
+            self.send_error(404)
+
+    def _send(self, data=b"", content_type="", cache="no-store"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", cache)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_mjpeg(self, stream=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=" + BOUNDARY)
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        stream.connect(1)
+        version = 0
+        try:
+            while not stream.closed:
+                if not stream.wait(version):
+                    continue
+                version, data = stream.frame_jpeg()
+                if data is None:
+                    continue
+                self.wfile.write("--{}\r\nContent-Type: image/jpeg\r\nContent-Length: {}\r\n\r\n".format(
+                    BOUNDARY, len(data)).encode("ascii") + data + b"\r\n")
+        except OSError:
+            pass
+        finally:
+            stream.connect(-1)
+
+
+class ViewerStream:
+    """ Serve the composed whiteboard screen to HTTP viewers, written like an offscreen output """
+
+    def __init__(self, host="", port=DEFAULT_PORT, tile_size=TILE_SIZE, quality=JPEG_QUALITY, fps=STREAM_FPS):
+        """ Start the HTTP server
+
+        Keyword arguments:
+            host        - address to listen on, "" for all interfaces
+            port        - TCP port, 0 to pick a free port
+            tile_size   - size of the tiles compared and encoded separately
+            quality     - JPEG quality
+            fps         - maximum rate of frames taken over, 0 for no limit
+        """
+        self.tile_size = tile_size
+        self.fps = fps
+        self.params = [cv.IMWRITE_JPEG_QUALITY, quality]
+
+        self.version = 0
+        self.viewers = 0
+        self.encoded_frames = 0
+        self.encoded_tiles = 0
+        self.closed = False
+
+        self._frame = None
+        self._diff = None
+        self._last_write = 0.0
+        self._tile_versions = None
+        self._frame_cache = (0, None)
+        self._tile_cache = {}
+        self._condition = threading.Condition()
+        self._encode_lock = threading.Lock()
+
+        self._server = server.ThreadingHTTPServer((host, port), StreamHandler)
+        self._server.daemon_threads = True
+        self._server.stream = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="viewer-stream", daemon=True)
+        self._thread.start()
+
+    # ----- Frames -----
+
+    def write(self, timestamp=0.0, screen=None):
+        """ Take over a frame, the version only changes if any tile differs from the previous frame
+
+        Keyword arguments:
+            timestamp   - time of the frame in seconds
+            screen      - composed whiteboard screen
+        """
+        # Frames faster than the stream rate are not compared at all
+        now = time.monotonic()
+        if self.fps and now - self._last_write < 1 / self.fps:
+            return
+        self._last_write = now
+
+        height, width = screen.shape[:2]
+        size = self.tile_size
+        rows = -(-height // size)
+        cols = -(-width // size)
+
+        if self._frame is None or self._frame.shape != screen.shape:
+            dirty = np.ones((rows, cols), bool)
+            self._diff = np.zeros((rows * size, cols * size * screen.shape[2]), np.uint8)
+        else:
+            # Compare per tile, the difference is padded to full tiles
+            diff = self._diff[:height, :width * screen.shape[2]].reshape(screen.shape)
+            cv.absdiff(self._frame, screen, dst=diff)
+            dirty = self._diff.reshape(rows, size, cols, -1).max(axis=(1, 3)) > 0
+            if not dirty.any():
+                return
+
+        # Published frames are never modified, viewers encode them without holding the lock
+        frame = screen.copy()
+        with self._condition:
+            self._frame = frame
+            self.version += 1
+            if self._tile_versions is None or self._tile_versions.shape != dirty.shape:
+                self._tile_versions = np.zeros(dirty.shape, np.int64)
+            self._tile_versions[dirty] = self.version
+            self._condition.notify_all()
+
+    def memory_buffers(self):
+        """ Get a dictionary name -> buffer of the frames held by the stream, see memory.py """
+        buffers = {"frame": self._frame, "diff": self._diff, "jpeg": self._frame_cache[1]}
+        buffers.update({"tile {} {}".format(*key): value[1] for key, value in list(self._tile_cache.items())})
+        return buffers
+
+    def connect(self, count=1):
+        """ Count connected MJPEG viewers
+
+        Keyword arguments:
+            count   - 1 for a new viewer, -1 for a disconnected one
+        """
+        with self._condition:
+            self.viewers += count
+
+    def wait(self, version=0, timeout=WAIT_TIMEOUT):
+        """ Wait for a version newer than the given one, returns False on timeout
+
+        Keyword arguments:
+            version - latest version known to the viewer
+            timeout - seconds to wait
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version > version or self.closed, timeout)
+
+    def frame_jpeg(self):
+        """ Get a tuple (version, JPEG data) of the latest frame, encoded once per version """
+        with self._encode_lock:
+            with self._condition:
+                version, frame = self.version, self._frame
+            if self._frame_cache[0] == version or frame is None:
+                return self._frame_cache
+
+            self._frame_cache = (version, cv.imencode(".jpg", frame, self.params)[1].tobytes())
+            self.encoded_frames += 1
+            return self._frame_cache
+
+    def changed_tiles(self, since=0, timeout=WAIT_TIMEOUT):
+        """ Get the tiles changed after a version, waits for a change if there is none
+
+        Keyword arguments:
+            since   - latest version known to the viewer
+            timeout - seconds to wait
+        """
+        self.wait(since, timeout)
+        with self._condition:
+            if self._frame is None:
+                return {"version": 0, "width": 0, "height": 0, "tile": self.tile_size, "tiles": []}
+
+            rows, cols = np.nonzero(self._tile_versions > since)
+            return {
+                "version": self.version,
+                "width": self._frame.shape[1],
+                "height": self._frame.shape[0],
+                "tile": self.tile_size,
+                "tiles": [[int(y), int(x), int(self._tile_versions[y, x])] for y, x in zip(rows, cols)]
+            }
+
+    def tile_jpeg(self, y=0, x=0):
+        """ Get the JPEG data of the latest version of a tile, encoded once per tile version
+
+        Keyword arguments:
+            y   - tile row
+            x   - tile column
+        """
+        with self._encode_lock:
+            with self._condition:
+                frame = self._frame
+                if frame is None or not (0 <= y < self._tile_versions.shape[0] and
+                                         0 <= x < self._tile_versions.shape[1]):
+                    return None
+                version = self._tile_versions[y, x]
+
+            cached = self._tile_cache.get((y, x))
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            size = self.tile_size
+            data = cv.imencode(".jpg", frame[y * size:(y + 1) * size, x * size:(x + 1) * size], self.params)[1]
+            self._tile_cache[(y, x)] = (version, data.tobytes())
+            self.encoded_tiles += 1
+            return self._tile_cache[(y, x)][1]
+
+    def close(self):
+        """ Stop the HTTP server and end all streams """
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,290 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Synthetic hand landmarks
+
+Hand poses which are classified as the whiteboard gestures by gestures.check_user_gesture, and a scripted
+frame/landmark source. Used to drive the whiteboard without camera and hand tracker, e.g. for benchmarks.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import math                             # Rotations
+import time                             # Frame rate
+
+import cv2 as cv                        # Hand rendering
+import numpy as np                      # Poses and frames
+
+from whiteboard import recorder as rc   # Hand tracking result objects
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+# Canonical right hand: wrist at the origin, y pointing down, one unit is the hand size (wrist to middle MCP)
+THUMBS = {
+    "pip": [(-0.35, -0.2), (-0.55, -0.45), (-0.5, -0.8), (-0.38, -1.05)],
+    "out": [(-0.35, -0.2), (-0.6, -0.4), (-0.8, -0.6), (-1.0, -0.75)],
+    "mcp": [(-0.35, -0.2), (-0.5, -0.4), (-0.45, -0.6), (-0.32, -0.72)],
+    "fold": [(-0.35, -0.2), (-0.4, -0.4), (-0.2, -0.5), (0.0, -0.5)]
+}
+FINGER_MCPS = [(-0.3, -0.9), (-0.05, -0.95), (0.18, -0.9), (0.38, -0.8)]
+FINGER_LENGTHS = [0.85, 0.95, 0.85, 0.65]
+
+# Thumb position, extended fingers (index, middle, ring, pinky) and index finger lean per gesture
+POSES = {
+    "draw": ("pip", (True, False, False, False), 0.0),
+    "select": ("out", (True, False, False, False), 0.0),
+    "erase": ("mcp", (True, True, False, False), 0.26),
+    "select color": ("fold", (True, True, False, False), 0.26),
+    "switch color": ("fold", (True, True, True, True), 0.26),
+    "zoom": ("out", (True, False, False, False), 0.0),
+    "unknown": ("fold", (False, False, False, False), 0.0)
+}
+
+HAND_SIZE = 100
+INDEX_TIP = 8
+
+# Bones drawn by render_hand, pairs of landmark indices
+BONES = [(0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 8), (5, 9), (9, 10), (10, 11), (11, 12),
+         (9, 13), (13, 14), (14, 15), (15, 16), (13, 17), (0, 17), (17, 18), (18, 19), (19, 20)]
+SKIN = (120, 160, 210)
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def canonical_pose(gesture="draw"):
+    """ Get the 21 x 2 landmarks of a gesture in canonical hand coordinates
+
+    Keyword arguments:
+        gesture - one of POSES
+    """
+    thumb, extended, lean = POSES[gesture]
+    points = [(0.0, 0.0)] + THUMBS[thumb]
+
+    for finger, ((x, y), length, ext) in enumerate(zip(FINGER_MCPS, FINGER_LENGTHS, extended)):
+        finger_lean = lean if finger == 0 else 0.0
+        length += 0.05 if finger_lean else 0.0
+        points.append((x, y))
+        if ext:
+            points += [(x + finger_lean * f, y - length * f) for f in (0.45, 0.75, 1.0)]
+        else:
+            points += [(x, y - 0.25), (x, y - 0.05), (x, y + 0.1)]
+
+    return np.array(points)
+
+
+def hand_landmarks(gesture="draw", tip=(320, 240), size=HAND_SIZE, angle=0.0, mirrored=False):
+    """ Get 21 [x, y] pixel landmarks of a gesture with the index fingertip at a given position
+
+    Keyword arguments:
+        gesture     - one of POSES
+        tip         - position of the index fingertip
+        size        - hand size in pixels
+        angle       - rotation of the hand in radians
+        mirrored    - mirror the hand (other hand)
+    """
+    points = canonical_pose(gesture)
+    if mirrored:
+        points[:, 0] *= -1
+
+    c = math.cos(angle)
+    s = math.sin(angle)
+    points = points @ np.array([[c, -s], [s, c]]).T * size
+    points += np.array(tip) - points[INDEX_TIP]
+    return [[int(round(x)), int(round(y))] for x, y in points]
+
+
+def zoom_landmarks(center=(320, 240), spread=200, size=HAND_SIZE):
+    """ Get 42 [x, y] pixel landmarks of the two hand ZOOM gesture
+
+    Keyword arguments:
+        center  - center between both index fingertips
+        spread  - distance between both index fingertips
+        size    - hand size in pixels
+    """
+    left = hand_landmarks("zoom", (center[0] - spread / 2, center[1]), size)
+    right = hand_landmarks("zoom", (center[0] + spread / 2, center[1]), size, mirrored=True)
+    return left + right
+
+
+def to_results(landmarks=None, cam_width=640, cam_height=480):
+    """ Convert pixel landmarks into hand tracking results (see recorder.RecordedResults)
+
+    Keyword arguments:
+        landmarks   - list of 21 or 42 [x, y] pixel landmarks, None for no hand
+        cam_width   - width of the capture device
+        cam_height  - height of the capture device
+    """
+    hands = []
+    if landmarks:
+        for start in range(0, len(landmarks), 21):
+            points = np.array([((x + 0.5) / cam_width, (y + 0.5) / cam_height, 0.0)
+                               for x, y in landmarks[start:start + 21]], np.float32)
+            hands.append((start == 0, 1.0, points))
+    return rc.RecordedResults(hands)
+
+
+def render_hand(frame=None, landmarks=None, col=SKIN):
+    """ Draw the bones of hand landmarks into a frame, so image based components see a moving hand
+
+    Keyword arguments:
+        frame       - BGR frame, modified in place
+        landmarks   - list of 21 or 42 [x, y] pixel landmarks, None for no hand
+        col         - color of the hand
+    """
+    if not landmarks:
+        return frame
+
+    for start in range(0, len(landmarks), 21):
+        points = [(round(x), round(y)) for x, y in landmarks[start:start + 21]]
+        for a, b in BONES:
+            cv.line(frame, points[a], points[b], col, 12, cv.LINE_AA)
+    return frame
+
+
+def stroke_script(points=None, gesture="draw", size=HAND_SIZE):
+    """ Get a script that moves the index fingertip along a list of points with a gesture
+
+    Keyword arguments:
+        points  - list of (x, y) fingertip positions in capture coordinates
+        gesture - gesture shown while moving
+        size    - hand size in pixels
+    """
+    return [(gesture, hand_landmarks(gesture, p, size)) for p in points]
+
+
+def pinch_script(center=(320, 240), start=150, end=400, steps=30, size=HAND_SIZE):
+    """ Get a script of a ZOOM gesture changing the distance between both index fingertips
+
+    Keyword arguments:
+        center  - center between both index fingertips
+        start   - initial distance
+        end     - final distance
+        steps   - number of frames
+        size    - hand size in pixels
+    """
+    return [("zoom", zoom_landmarks(center, start + (end - start) * i / max(1, steps - 1), size))
+            for i in range(steps)]
+
+
+def scribble_points(cam_width=640, cam_height=480, count=60, seed=0):
+    """ Get a handwriting-like list of fingertip positions inside the capture frame
+
+    Keyword arguments:
+        cam_width   - width of the capture device
+        cam_height  - height of the capture device
+        count       - number of positions
+        seed        - random seed
+    """
+    rnd = np.random.default_rng(seed)
+    x = cam_width / 2
+    y = cam_height / 2
+    angle = 0.0
+    points = []
+    for _ in range(count):
+        angle += rnd.uniform(-0.7, 0.7)
+        x = min(cam_width - 140, max(140, x + math.cos(angle) * 6))
+        y = min(cam_height - 40, max(200, y + math.sin(angle) * 6))
+        points.append((int(x), int(y)))
+    return points
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class SyntheticSource:
+    """ Scripted frame and landmark source, usable as capture device and hand tracker like recorder.Player """
+
+    def __init__(self, script=None, cam_width=640, cam_height=480, fps=0, loop=False, frame=None, draw_hands=False):
+        """ Create the source
+
+        Keyword arguments:
+            script      - list of (gesture, landmarks) per frame, landmarks may be None
+            cam_width   - width of the capture device
+            cam_height  - height of the capture device
+            fps         - frame rate to emulate, 0 to deliver frames as fast as possible
+            loop        - start over at the end of the script
+            frame       - BGR frame returned for every step, a gray frame by default
+            draw_hands  - draw the scripted hands into the returned frames
+        """
+        self.script = script or []
+        self.cam_width = cam_width
+        self.cam_height = cam_height
+        self.fps = fps
+        self.loop = loop
+        self.frame = frame if frame is not None else np.full((cam_height, cam_width, 3), 127, np.uint8)
+        self.draw_hands = draw_hands
+
+        self.position = 0
+        self.gesture = "unknown"
+        self.landmarks = None
+        self._results = None
+        self._next_time = None
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def read(self, image=None):
+        """ Read the next frame like cv.VideoCapture.read
+
+        Keyword arguments:
+            image   - buffer to copy the frame into, like cv.VideoCapture.read
+        """
+        if self.position >= len(self.script):
+            if not self.loop or not self.script:
+                self._open = False
+                return False, None
+            self.position = 0
+
+        if self.fps:
+            now = time.perf_counter()
+            if self._next_time is not None and self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time = max(now, self._next_time or now) + 1 / self.fps
+
+        self.gesture, self.landmarks = self.script[self.position]
+        self.position += 1
+        self._results = None
+
+        if image is not None and image.shape == self.frame.shape:
+            image[:] = self.frame
+        else:
+            image = self.frame.copy()
+        if self.draw_hands:
+            render_hand(image, self.landmarks)
+        return True, image
+
+    def process(self, image=None):
+        """ Get the scripted hand tracking results of the frame returned by the latest read
+
+        Keyword arguments:
+            image   - ignored, for compatibility with mp.solutions.hands.Hands.process
+        """
+        if self._results is None:
+            self._results = to_results(self.landmarks, self.cam_width, self.cam_height)
+        return self._results
+
+    def set(self, prop_id=0, value=0):
+        return False
+
+    def release(self):
+        self._open = False
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
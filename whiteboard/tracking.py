@@ -0,0 +1,191 @@
+###################################################################################################
+# HEADER                                                                                          #
+###################################################################################################
+
+""" Hand tracking backends
+
+A hand tracker takes an RGB frame and returns results compatible with mp.solutions.hands (normalized
+multi_hand_landmarks of 21 landmarks per hand and multi_handedness), so the gesture recognition, recording and
+preview do not depend on the backend:
+
+    mediapipe   - MediaPipe hand landmark model (imported on first use)
+    marker      - colored fingertip markers found by HSV thresholding and contours, without any model
+
+The marker tracker shows one marker color per gesture at the fingertip, e.g. a green cap draws and a blue cap
+erases. The position of the largest marker becomes the index fingertip of a hand pose classified as that
+gesture by gestures.check_user_gesture. It reaches high frame rates on weak devices and runs where MediaPipe
+is not available, but it tracks a single hand, so the two hand ZOOM gesture is not supported.
+"""
+
+
+###################################################################################################
+# IMPORTS                                                                                         #
+###################################################################################################
+
+import cv2 as cv                        # Color conversion, thresholds and contours
+
+from whiteboard import buffers as bf    # Reused frame buffers
+from whiteboard import synthetic as sy  # Hand poses of the gestures
+
+
+###################################################################################################
+# GLOBALS                                                                                         #
+###################################################################################################
+
+BACKEND_MEDIAPIPE = "mediapipe"
+BACKEND_MARKER = "marker"
+DEFAULT_BACKEND = BACKEND_MEDIAPIPE
+
+# Gesture -> (lower, upper) HSV bounds of its marker color, OpenCV hues range from 0 to 179
+MARKERS = {
+    "draw": ((40, 80, 60), (85, 255, 255)),             # Green
+    "erase": ((95, 120, 60), (130, 255, 255)),          # Blue
+    "switch color": ((140, 80, 60), (170, 255, 255)),   # Magenta
+    "select": ((20, 120, 100), (35, 255, 255))          # Yellow
+}
+
+# Width of the downscaled frame searched for markers
+MARKER_WIDTH = 320
+
+# Smallest marker as share of the frame area
+MIN_MARKER_AREA = 0.0005
+
+# The poses are built in the coordinates of a 640 x 480 frame, where the synthetic hand size fits the gestures
+POSE_SIZE = (640, 480)
+
+
+###################################################################################################
+# FUNCTIONS                                                                                       #
+###################################################################################################
+
+def create_mediapipe(model_complexity=0, max_num_hands=2):
+    """ Create a MediaPipe hand tracker, MediaPipe is imported on first use since the import takes seconds
+
+    Keyword arguments:
+        model_complexity    - complexity of the hand landmark model
+        max_num_hands       - maximum number of tracked hands
+    """
+    import mediapipe as mp
+
+    return mp.solutions.hands.Hands(
+        max_num_hands=max_num_hands,
+        model_complexity=model_complexity,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def create_marker(model_complexity=0, max_num_hands=2):
+    """ Create a marker tracker, the model settings of the adaptive quality do not apply
+
+    Keyword arguments:
+        model_complexity    - ignored
+        max_num_hands       - ignored, a single hand is tracked
+    """
+    return MarkerTracker()
+
+
+def draw_results(frame=None, results=None, col=(0, 255, 0)):
+    """ Draw the bones of hand tracking results into a frame without MediaPipe
+
+    Keyword arguments:
+        frame   - BGR frame, modified in place
+        results - hand tracking results
+        col     - color of the bones
+    """
+    height, width = frame.shape[:2]
+    for hand in results.multi_hand_landmarks or []:
+        points = [(round(lm.x * width), round(lm.y * height)) for lm in hand.landmark]
+        for a, b in sy.BONES:
+            cv.line(frame, points[a], points[b], col, 2, cv.LINE_AA)
+        for point in points:
+            cv.circle(frame, point, 3, col, -1, cv.LINE_AA)
+    return frame
+
+
+###################################################################################################
+# CLASSES                                                                                         #
+###################################################################################################
+
+class MarkerTracker:
+    """ Hand tracker following a colored fingertip marker, one marker color per gesture """
+
+    def __init__(self, markers=None, width=MARKER_WIDTH, min_area=MIN_MARKER_AREA):
+        """ Create the tracker
+
+        Keyword arguments:
+            markers     - dictionary gesture -> (lower, upper) HSV bounds, MARKERS by default
+            width       - width of the downscaled frame searched for markers
+            min_area    - smallest marker as share of the frame area
+        """
+        self.markers = markers or MARKERS
+        self.width = width
+        self.min_area = min_area
+        self.gesture = "unknown"
+        self.buffers = bf.BufferPool()
+
+    def find(self, image=None):
+        """ Get (gesture, (x, y)) of the largest marker of an RGB frame with the position normalized to 0-1, None
+        if there is no marker
+
+        Keyword arguments:
+            image   - RGB frame
+        """
+        height, width = image.shape[:2]
+        if width > self.width:
+            size = (self.width, round(height * self.width / width))
+            small = self.buffers.get("small", (size[1], size[0], 3))
+            image = cv.resize(image, size, dst=small, interpolation=cv.INTER_AREA)
+            height, width = size[1], size[0]
+
+        hsv = cv.cvtColor(image, cv.COLOR_RGB2HSV, dst=self.buffers.like("hsv", image))
+        mask = self.buffers.get("mask", (height, width))
+        min_pixels = self.min_area * width * height
+
+        best = None
+        for gesture, (lower, upper) in self.markers.items():
+            cv.inRange(hsv, lower, upper, dst=mask)
+            if cv.countNonZero(mask) < min_pixels:
+                continue
+
+            contours = cv.findContours(mask, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)[0]
+            contour = max(contours, key=cv.contourArea)
+            area = cv.contourArea(contour)
+            if area < min_pixels or (best is not None and area <= best[0]):
+                continue
+
+            moments = cv.moments(contour)
+            best = (area, gesture, (moments["m10"] / moments["m00"] / width, moments["m01"] / moments["m00"] / height))
+
+        return None if best is None else best[1:]
+
+    def process(self, image=None):
+        """ Get hand tracking results with the pose of the marker gesture at the marker position
+
+        Keyword arguments:
+            image   - RGB frame
+        """
+        found = self.find(image)
+        if found is None:
+            self.gesture = "unknown"
+            return sy.to_results(None)
+
+        self.gesture, (x, y) = found
+        landmarks = sy.hand_landmarks(self.gesture, (x * POSE_SIZE[0], y * POSE_SIZE[1]))
+        return sy.to_results(landmarks, *POSE_SIZE)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Backend name -> factory called with (model_complexity, max_num_hands)
+BACKENDS = {
+    BACKEND_MEDIAPIPE: create_mediapipe,
+    BACKEND_MARKER: create_marker
+}